@@ -2,24 +2,46 @@
 FastAPI Application — Enhanced RAG API with incremental chunk diffing.
 
 Endpoints:
-- POST /ingest: Ingest a document with deduplication and incremental updates
+- POST /ingest: Queue a document for ingestion (deduplication, incremental updates)
+- GET /jobs/{job_id}: Ingestion job status, stage and progress
+- GET /jobs: A user's recent ingestion jobs
 - POST /chat: Chat with documents using RAG
 - POST /search: Search documents without generation
 - GET /documents: Get user's documents
-- GET /health: Health check
+- GET /health/live: Liveness probe (no I/O)
+- GET /health/ready: Readiness probe (database ping, cached vector store connectivity)
+- GET /stats: Index statistics from a background-refreshed cache, rerank cache usage
+- GET /health: Health check (readiness + cached index statistics)
+
+Request handlers never block the event loop: Pinecone queries, reranking and
+LLM calls are awaited on asyncio clients, SQLite reads run on worker threads
+(asyncio.to_thread) and ingestion runs on the IngestionWorker pool.
+
+Index statistics are fetched by one background task every
+STATS_CACHE_TTL_SECONDS (StatsCache); probes and /stats only read the cache.
+
+Search, rerank and stats go through pipeline.vector_store, so the API can be
+load-tested offline against the fake or replay store (VECTOR_STORE=fake|replay).
 """
 
+import time
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-import tempfile
 import os
+import hashlib
+import json
 
 from app.core.config import settings
 from app.pipeline.processing_pipeline import ProcessingPipeline
-from app.vectorstore.reranker import Reranker
+from app.pipeline.ingestion_worker import IngestionWorker
+from app.db.compaction import Compactor, CompactionScheduler
+from app.vectorstore.search_filter import resolve_filter
+from app.vectorstore.stats_cache import StatsCache
 from app.generation import Generator
 
 # Configure logging
@@ -47,13 +69,64 @@ app.add_middleware(
 )
 
 # Initialize components
-pipeline = ProcessingPipeline()
-reranker = Reranker(
-    api_key=settings.PINECONE_API_KEY,
-    index_name=settings.PINECONE_INDEX_NAME,
-    rerank_model=settings.RERANKER_MODEL
-)
+pipeline = ProcessingPipeline()  # vector store chosen by VECTOR_STORE (Pinecone or offline fake/replay)
 generator = Generator()
+ingestion_worker = IngestionWorker(
+    pipeline,
+    workers=settings.INGEST_WORKERS,
+    spool_dir=settings.UPLOAD_SPOOL_DIR,
+    lease_seconds=settings.INGESTION_LEASE_SECONDS
+)
+stats_cache = StatsCache(
+    pipeline.vector_store.aget_stats,
+    ttl_seconds=settings.STATS_CACHE_TTL_SECONDS,
+    max_staleness_seconds=settings.STATS_MAX_STALENESS_SECONDS,
+    timeout_seconds=settings.STATS_TIMEOUT_SECONDS
+)
+STARTED_AT = time.monotonic()
+compaction_scheduler = CompactionScheduler(
+    Compactor(pipeline.db_manager, retention_days=settings.RETENTION_DAYS),
+    interval_hours=settings.COMPACTION_INTERVAL_HOURS
+)
+
+
+@app.on_event("startup")
+def recover_ingestions():
+    # Other workers may already be ingesting: versions they hold a live lease on are skipped
+    pipeline.recover_incomplete_ingestions()
+
+
+@app.on_event("startup")
+def start_ingestion_worker():
+    # After recovery: re-queued jobs resume their journaled versions
+    ingestion_worker.start()
+
+
+@app.on_event("startup")
+def start_compaction():
+    compaction_scheduler.start()
+
+
+@app.on_event("startup")
+async def start_stats_refresh():
+    # First refresh runs immediately, so readiness turns true once the index answers
+    stats_cache.start()
+
+
+@app.on_event("shutdown")
+def stop_ingestion_worker():
+    ingestion_worker.stop()
+
+
+@app.on_event("shutdown")
+def stop_compaction():
+    compaction_scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def close_async_clients():
+    await stats_cache.stop()
+    await pipeline.vector_store.aclose()
 
 
 # ── Pydantic Models ──────────────────────────────────────────────────────────
@@ -68,18 +141,62 @@ class IngestResponse(BaseModel):
     new_version: Optional[int] = None
     doc_id: Optional[int] = None
     total_chunks: Optional[int] = None
+    total_pages: Optional[int] = None
     text_chunks: Optional[int] = None
     table_chunks: Optional[int] = None
     chunks_added: Optional[int] = None
     chunks_deleted: Optional[int] = None
+    chunks_updated: Optional[int] = None
     unchanged_chunks: Optional[int] = None
+    chunks_resumed: Optional[int] = None
+    existing_chunks: Optional[int] = None
+    cleanup_pending: Optional[bool] = None
     diff_report: Optional[Dict[str, Any]] = None
+    filter_stats: Optional[Dict[str, Any]] = None
+    stage_metrics: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: Optional[str] = None
+    progress: float = 0.0
+    filename: str
+    username: str
+    pages_done: int = 0
+    pages_total: int = 0
+    chunks_upserted: int = 0
+    chunks_total: int = 0
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[IngestResponse] = None
+
+
+class JobsResponse(BaseModel):
+    username: str
+    jobs: List[JobResponse]
+    total: int
+
+
+class SearchFilters(BaseModel):
+    source: Optional[List[str]] = Field(default=None, description="Restrict to these filenames")
+    version: Optional[int] = Field(default=None, description="Active version of the document")
+    content_type: Optional[str] = Field(default=None, description="'text' or 'table'")
+    date_from: Optional[str] = Field(default=None, description="Earliest upload date of the active version (ISO, inclusive)")
+    date_to: Optional[str] = Field(default=None, description="Latest upload date of the active version (ISO, inclusive)")
+    page_from: Optional[int] = Field(default=None, description="First page (inclusive)")
+    page_to: Optional[int] = Field(default=None, description="Last page (inclusive)")
+    latest_only: bool = Field(default=False, description="Only the processed, active version of each document")
 
 
 class SearchRequest(BaseModel):
     query: str = Field(..., description="Search query")
     username: str = Field(..., description="Username for namespace isolation")
     top_k: int = Field(default=10, description="Number of results to return")
+    filters: Optional[SearchFilters] = Field(default=None, description="Server-side metadata filters")
+    hybrid: bool = Field(default=False, description="Fuse dense and lexical (BM25) results")
 
 
 class SearchResult(BaseModel):
@@ -105,6 +222,13 @@ class ChatRequest(BaseModel):
     use_reranker: bool = Field(default=True, description="Whether to use reranking")
     top_k: int = Field(default=10, description="Number of candidates to retrieve")
     top_n: int = Field(default=5, description="Number of results after reranking")
+    filters: Optional[SearchFilters] = Field(default=None, description="Server-side metadata filters")
+    hybrid: bool = Field(
+        default=False, description="Fuse dense and lexical (BM25) retrieval; the fused candidates are reranked if use_reranker"
+    )
+    context_window: Optional[int] = Field(
+        default=None, description="Neighbouring chunks added around each hit (default CONTEXT_WINDOW; 0 disables)"
+    )
 
 
 class Citation(BaseModel):
@@ -136,10 +260,18 @@ class DocumentRecord(BaseModel):
     uploaded_at: str
 
 
+class DocumentCounts(BaseModel):
+    total: int
+    active: int
+    by_status: Dict[str, int]
+
+
 class DocumentsResponse(BaseModel):
     username: str
     documents: List[DocumentRecord]
     total: int
+    next_cursor: Optional[str] = None
+    counts: Optional[DocumentCounts] = None
 
 
 # ── API Endpoints ────────────────────────────────────────────────────────────
@@ -153,53 +285,128 @@ async def root():
         "description": "Document ingestion and retrieval with deduplication and versioning",
         "endpoints": {
             "ingest": "POST /ingest",
+            "job": "GET /jobs/{job_id}",
+            "jobs": "GET /jobs?username=...",
             "chat": "POST /chat",
             "search": "POST /search",
             "documents": "GET /documents/{username}",
-            "health": "GET /health"
+            "stats": "GET /stats",
+            "health": "GET /health",
+            "liveness": "GET /health/live",
+            "readiness": "GET /health/ready"
         }
     }
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: answers from the event loop without any I/O."""
+    return {"status": "alive", "uptime_seconds": round(time.monotonic() - STARTED_AT, 1)}
+
+
+async def _readiness() -> Dict[str, Any]:
     try:
-        # Check Pinecone connection
-        stats = pipeline.pinecone_manager.get_stats()
-
-        # Ensure stats is JSON-serializable (convert non-serializable parts to strings)
-        import json
-
-        def safe_serialize(obj):
-            try:
-                return json.loads(json.dumps(obj))
-            except Exception:
-                return str(obj)
-
-        try:
-            index_stats = json.loads(json.dumps(stats, default=lambda o: str(o)))
-        except Exception:
-            index_stats = safe_serialize(stats)
-
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "pinecone": "connected",
-            "index_stats": index_stats
-        }
+        database = await asyncio.to_thread(pipeline.db_manager.ping)
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
+        logger.error(f"Database check failed: {e}")
+        database = False
+    
+    snapshot = await stats_cache.get()  # waits only for the first refresh after startup
+    vector_store_ready = stats_cache.is_ready()
+    return {
+        "status": "ready" if database and vector_store_ready else "not ready",
+        "database": "connected" if database else "unavailable",
+        "pinecone": "connected" if vector_store_ready else "unavailable",
+        "vector_store": settings.VECTOR_STORE,
+        "stats_age_seconds": snapshot["age_seconds"],
+        "last_error": snapshot["last_error"],
+    }
+
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """
+    Readiness probe: local database ping and the cached vector store connectivity.
+    
+    Vector store connectivity is that of the last background stats refresh,
+    so probes never call the index. Returns 503 while not ready.
+    """
+    result = await _readiness()
+    if result["status"] != "ready":
+        response.status_code = 503
+    return result
+
+
+@app.get("/stats")
+async def index_stats():
+    """Index statistics from the background-refreshed cache (see STATS_CACHE_TTL_SECONDS), and rerank cache usage."""
+    result = await stats_cache.get()
+    if pipeline.rerank_cache:
+        result["rerank_cache"] = await asyncio.to_thread(pipeline.rerank_cache.stats)
+    return result
+
+
+@app.get("/health")
+async def health_check():
+    """Health check: readiness plus cached index statistics (no index call per request)."""
+    result = await _readiness()
+    if result["status"] != "ready":
+        logger.error(f"Health check failed: {result}")
+        raise HTTPException(status_code=503, detail=f"Service unhealthy: {result['last_error'] or result}")
+    
+    return {
+        "status": "healthy",
+        "database": result["database"],
+        "pinecone": result["pinecone"],
+        "vector_store": settings.VECTOR_STORE,
+        "index_stats": stats_cache.stats,
+        "stats_age_seconds": result["stats_age_seconds"]
+    }
+
+
+async def _metadata_filter(filters: Optional[SearchFilters], username: str) -> Optional[Dict[str, Any]]:
+    """Pinecone metadata filter for a request's filters (ValueError on invalid values).
+    
+    Version, date and latest-only criteria are resolved from SQLite, off the event loop.
+    """
+    if not filters:
+        return None
+    return await asyncio.to_thread(resolve_filter, pipeline.db_manager, username, **filters.model_dump())
+
+
+def _job_response(job: Dict[str, Any]) -> JobResponse:
+    """Convert a job row to its API model (the pipeline result only once completed)."""
+    result = job["result"] if job["status"] == "completed" else None
+    return JobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        stage=job["stage"],
+        progress=job["progress"],
+        filename=job["filename"],
+        username=job["username"],
+        pages_done=job["pages_done"],
+        pages_total=job["pages_total"],
+        chunks_upserted=job["chunks_upserted"],
+        chunks_total=job["chunks_total"],
+        error=job["error"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        result=IngestResponse(**result) if result else None
+    )
 
 
-@app.post("/ingest", response_model=IngestResponse)
+@app.post("/ingest", response_model=JobResponse, status_code=202)
 async def ingest_document(
+    response: Response,
     file: UploadFile = File(..., description="PDF document to ingest"),
     username: str = Form(..., description="Username for namespace isolation")
 ):
     """
-    Ingest a document with automatic deduplication, versioning, and incremental updates.
+    Queue a document for ingestion with automatic deduplication, versioning, and incremental updates.
+    
+    Returns immediately (202) with a job; poll `GET /jobs/{job_id}` (also in
+    the Location header) for stage, progress and, once completed, the result:
     
     - Computes SHA256 hash for document-level deduplication
     - Computes SHA256 hash for each chunk
@@ -218,48 +425,62 @@ async def ingest_document(
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    # Save uploaded file temporarily
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
-        # Process document through pipeline (with incremental diff support)
-        # Pass the original uploaded filename so metadata `source` is correct
-        result = pipeline.process_document(temp_path, username, original_filename=file.filename)
-        
-        # Clean up temporary file
-        os.unlink(temp_path)
-        
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["message"])
+        # Spool the upload and queue the job off the event loop; the pipeline
+        # itself runs on the ingestion worker pool
+        content = await file.read()
+        spooled_path = await run_in_threadpool(ingestion_worker.spool, content)
+        job_id = await run_in_threadpool(ingestion_worker.submit, spooled_path, username, file.filename)
+        job = await run_in_threadpool(ingestion_worker.get_job, job_id)
         
-        return IngestResponse(**result)
+        response.headers["Location"] = f"/jobs/{job_id}"
+        return _job_response(job)
         
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error in ingestion: {e}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
+        logger.error(f"Error queueing ingestion: {e}")
+        if 'spooled_path' in locals() and os.path.exists(spooled_path):
+            os.unlink(spooled_path)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    """Get the status, stage and progress of an ingestion job (result once completed)."""
+    job = ingestion_worker.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return _job_response(job)
+
+
+@app.get("/jobs", response_model=JobsResponse)
+def list_jobs(username: str, limit: int = 20, status: Optional[str] = None):
+    """Get a user's most recent ingestion jobs, newest first."""
+    jobs = ingestion_worker.list_jobs(username, limit=max(1, min(limit, 200)), status=status)
+    return JobsResponse(
+        username=username,
+        jobs=[_job_response(job) for job in jobs],
+        total=len(jobs)
+    )
+
+
 @app.post("/search", response_model=SearchResponse)
 async def search_documents(request: SearchRequest):
     """
     Search documents without answer generation.
     
-    Returns relevant chunks from user's namespace.
+    Returns relevant chunks from user's namespace, optionally restricted by
+    metadata `filters` (applied by Pinecone, before top_k). With `hybrid`,
+    dense and lexical (BM25) results are fused by reciprocal rank.
     """
     logger.info(f"Search request: '{request.query}' from user '{request.username}'")
     
     try:
-        results = pipeline.search_documents(
+        results = await pipeline.asearch_documents(
             query=request.query,
             username=request.username,
-            top_k=request.top_k
+            top_k=request.top_k,
+            metadata_filter=await _metadata_filter(request.filters, request.username),
+            hybrid=request.hybrid
         )
         
         search_results = [
@@ -282,6 +503,8 @@ async def search_documents(request: SearchRequest):
             total=len(search_results)
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -293,29 +516,41 @@ async def chat(request: ChatRequest):
     Chat with documents using RAG.
     
     - Retrieves relevant chunks from user's namespace
-    - Optionally reranks results for better relevance
+    - Optionally restricts retrieval with metadata `filters`
+    - Optionally fuses dense and lexical retrieval (`hybrid`)
+    - Optionally reranks the candidates for better relevance (hybrid
+      candidates are reranked as retrieved, without a second search)
     - Generates answer using LLM with citations
     """
     logger.info(
         f"Chat request: '{request.question}' from user '{request.username}' "
-        f"(rerank: {request.use_reranker})"
+        f"(rerank: {request.use_reranker}, hybrid: {request.hybrid})"
     )
+    reranked = request.use_reranker
     
     try:
+        metadata_filter = await _metadata_filter(request.filters, request.username)
+        
         # Retrieve or rerank
-        if request.use_reranker:
-            chunks = reranker.rerank(
+        if reranked:
+            chunks = await pipeline.asearch_reranked(
                 query=request.question,
-                namespace=request.username.lower(),
+                username=request.username,
                 top_k=request.top_k,
-                top_n=request.top_n
+                top_n=request.top_n,
+                metadata_filter=metadata_filter,
+                hybrid=request.hybrid
             )
         else:
-            chunks = pipeline.search_documents(
+            chunks = await pipeline.asearch_documents(
                 query=request.question,
                 username=request.username,
-                top_k=request.top_k
+                top_k=request.top_k,
+                metadata_filter=metadata_filter,
+                hybrid=request.hybrid
             )
+            if request.hybrid:
+                chunks = chunks[:request.top_n]
         
         if not chunks:
             return ChatResponse(
@@ -323,11 +558,14 @@ async def chat(request: ChatRequest):
                 answer="I couldn't find any relevant information in your documents.",
                 username=request.username,
                 citations=[],
-                reranked=request.use_reranker
+                reranked=reranked
             )
         
+        # Widen hits to their neighbouring chunks (local reads only)
+        chunks = await pipeline.aexpand_context(chunks, request.username, request.context_window)
+        
         # Generate answer
-        result = generator.generate_with_citations(request.question, chunks)
+        result = await generator.agenerate_with_citations(request.question, chunks)
         
         # Format citations
         citations = [
@@ -348,25 +586,49 @@ async def chat(request: ChatRequest):
             answer=result["answer"],
             username=request.username,
             citations=citations,
-            reranked=request.use_reranker
+            reranked=reranked
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/documents/{username}", response_model=DocumentsResponse)
-async def get_user_documents(username: str, limit: int = 50):
+async def get_user_documents(
+    username: str,
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    active_only: bool = False,
+    status: Optional[str] = None,
+    filename_prefix: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None)
+):
     """
-    Get all documents for a user.
+    Get a page of documents for a user (newest first).
     
-    Returns document metadata including versions, status, and upload dates.
+    Pass `next_cursor` from the previous response as `cursor` to fetch the
+    next page. The response carries an ETag; send it back in `If-None-Match`
+    to get `304 Not Modified` when the page and counts are unchanged.
     """
     logger.info(f"Documents request for user '{username}'")
     
+    limit = max(1, min(limit, 500))
+    
     try:
-        documents = pipeline.get_user_documents(username, limit)
+        page = await asyncio.to_thread(
+            pipeline.list_user_documents,
+            username,
+            limit=limit,
+            cursor=cursor,
+            active_only=active_only,
+            status=status,
+            filename_prefix=filename_prefix
+        )
+        counts = await asyncio.to_thread(pipeline.get_document_counts, username)
         
         doc_records = [
             DocumentRecord(
@@ -379,15 +641,29 @@ async def get_user_documents(username: str, limit: int = 50):
                 is_active=doc["is_active"],
                 uploaded_at=doc["uploaded_at"]
             )
-            for doc in documents
+            for doc in page["documents"]
         ]
         
-        return DocumentsResponse(
+        body = DocumentsResponse(
             username=username,
             documents=doc_records,
-            total=len(doc_records)
+            total=len(doc_records),
+            next_cursor=page["next_cursor"],
+            counts=DocumentCounts(**counts)
         )
         
+        etag = 'W/"' + hashlib.sha1(
+            json.dumps(body.model_dump(), sort_keys=True, default=str).encode()
+        ).hexdigest() + '"'
+        
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        response.headers["ETag"] = etag
+        return body
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -400,6 +676,7 @@ if __name__ == "__main__":
     print("🚀 Starting Enhanced RAG API Server")
     print("=" * 60)
     print(f"Index: {settings.PINECONE_INDEX_NAME}")
+    print(f"Vector Store: {settings.VECTOR_STORE}")
     print(f"Embedding Model: {settings.EMBEDDING_MODEL}")
     print(f"Reranker Model: {settings.RERANKER_MODEL}")
     print("=" * 60 + "\n")
@@ -16,6 +16,12 @@ class Settings:
     
     # ── Database Settings ────────────────────────────────────────────────
     SQLITE_DB_PATH: str = os.getenv("SQLITE_DB_PATH", "rag_metadata.db")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+    
+    # ── Retention & Compaction Settings ──────────────────────────────────
+    RETENTION_DAYS: int = int(os.getenv("RETENTION_DAYS", "30"))
+    COMPACTION_INTERVAL_HOURS: float = float(os.getenv("COMPACTION_INTERVAL_HOURS", "24"))  # 0 disables
     
     # ── API Keys ─────────────────────────────────────────────────────────
     PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY", "")
@@ -28,6 +34,13 @@ class Settings:
     PINECONE_REGION: str = os.getenv("PINECONE_REGION", "us-east-1")
     DEFAULT_NAMESPACE: str = os.getenv("DEFAULT_NAMESPACE", "default")
     
+    # ── Vector Store Settings ────────────────────────────────────────────
+    VECTOR_STORE: str = os.getenv("VECTOR_STORE", "pinecone")  # pinecone | fake | record | replay
+    VECTOR_STORE_LATENCY: str = os.getenv("VECTOR_STORE_LATENCY", "serverless")  # fake/replay: instant | local | serverless | degraded
+    VECTOR_STORE_ERRORS: str = os.getenv("VECTOR_STORE_ERRORS", "none")  # fake/replay: none | throttled | flaky | outage
+    VECTOR_STORE_SEED: int = int(os.getenv("VECTOR_STORE_SEED", "0"))  # reproducible latency and error draws
+    VECTOR_STORE_RECORDING: str = os.getenv("VECTOR_STORE_RECORDING", "vector_store_recording.jsonl")  # record writes, replay reads
+    
     # ── Embedding Settings ───────────────────────────────────────────────
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "multilingual-e5-large")
     EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
@@ -37,25 +50,79 @@ class Settings:
     TEXT_CHUNK_OVERLAP: int = int(os.getenv("TEXT_CHUNK_OVERLAP", "80"))
     TABLE_CHUNK_SIZE: int = int(os.getenv("TABLE_CHUNK_SIZE", "800"))
     
+    # ── Chunk Quality Filter Settings ────────────────────────────────────
+    CHUNK_FILTER_ENABLED: bool = os.getenv("CHUNK_FILTER_ENABLED", "true").lower() == "true"
+    CHUNK_FILTER_MODE: str = os.getenv("CHUNK_FILTER_MODE", "merge")  # merge | drop
+    CHUNK_MIN_WORDS: int = int(os.getenv("CHUNK_MIN_WORDS", "5"))
+    CHUNK_MIN_ALPHA_RATIO: float = float(os.getenv("CHUNK_MIN_ALPHA_RATIO", "0.5"))
+    CHUNK_MIN_TOKEN_ENTROPY: float = float(os.getenv("CHUNK_MIN_TOKEN_ENTROPY", "2.0"))
+    CHUNK_ENTROPY_MIN_TOKENS: int = int(os.getenv("CHUNK_ENTROPY_MIN_TOKENS", "12"))  # shorter chunks skip the entropy check
+    CHUNK_MAX_DOT_LEADER_RATIO: float = float(os.getenv("CHUNK_MAX_DOT_LEADER_RATIO", "0.15"))
+    
+    # ── Chunk Hashing Settings ───────────────────────────────────────────
+    CHUNK_HASH_ALGORITHM: str = os.getenv("CHUNK_HASH_ALGORITHM", "sha256")  # sha256 | blake2b
+    CHUNK_NORMALIZATION_VERSION: int = int(os.getenv("CHUNK_NORMALIZATION_VERSION", "2"))
+    CHUNK_HASH_WORKERS: int = int(os.getenv("CHUNK_HASH_WORKERS", "1"))  # threads don't help (GIL-bound normalization)
+    CHUNK_HASH_PARALLEL_THRESHOLD: int = int(os.getenv("CHUNK_HASH_PARALLEL_THRESHOLD", "512"))
+    
+    # ── Chunk Text Store Settings ────────────────────────────────────────
+    CHUNK_TEXT_STORE_ENABLED: bool = os.getenv("CHUNK_TEXT_STORE_ENABLED", "true").lower() == "true"  # hydrate search hits locally
+    CHUNK_TEXT_CODEC: str = os.getenv("CHUNK_TEXT_CODEC", "zstd")  # zstd | zlib (zstd falls back to zlib if not installed)
+    CHUNK_TEXT_LEVEL: int = int(os.getenv("CHUNK_TEXT_LEVEL", "3"))
+    
     # ── Retrieval Settings ───────────────────────────────────────────────
     TOP_K: int = int(os.getenv("TOP_K", "10"))
     
+    # ── Context Expansion Settings ───────────────────────────────────────
+    CONTEXT_WINDOW: int = int(os.getenv("CONTEXT_WINDOW", "1"))  # neighbouring chunks added on each side of a hit (0 = off)
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # estimated tokens of all context sent to the LLM
+    
     # ── Reranker Settings ────────────────────────────────────────────────
     RERANKER_MODEL: str = os.getenv("RERANKER_MODEL", "bge-reranker-v2-m3")
     RERANK_TOP_N: int = int(os.getenv("RERANK_TOP_N", "5"))
     
+    # ── Rerank Cache Settings ────────────────────────────────────────────
+    RERANK_CACHE_ENABLED: bool = os.getenv("RERANK_CACHE_ENABLED", "true").lower() == "true"  # shared by all workers (SQLite)
+    RERANK_CACHE_MAX_ENTRIES: int = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "10000"))  # least recently used evicted beyond
+    RERANK_CACHE_TTL_SECONDS: float = float(os.getenv("RERANK_CACHE_TTL_SECONDS", "86400"))
+    RERANK_CACHE_SETTLE_SECONDS: float = float(os.getenv("RERANK_CACHE_SETTLE_SECONDS", "30"))  # no caching this soon after a write
+    
     # ── Generation Settings ──────────────────────────────────────────────
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     GROQ_MODEL: str = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
     MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", "1024"))
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.2"))
     
+    # ── Hybrid Retrieval Settings ────────────────────────────────────────
+    LEXICAL_INDEX_ENABLED: bool = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"  # FTS5 index of chunk text
+    HYBRID_RRF_K: int = int(os.getenv("HYBRID_RRF_K", "60"))  # reciprocal-rank fusion constant
+    
     # ── Batch Settings ───────────────────────────────────────────────────
     UPSERT_BATCH_SIZE: int = int(os.getenv("UPSERT_BATCH_SIZE", "96"))
+    PINECONE_MAX_CONCURRENCY: int = int(os.getenv("PINECONE_MAX_CONCURRENCY", "4"))  # write batches in flight at once
+    PINECONE_RECORDS_PER_SECOND: float = float(os.getenv("PINECONE_RECORDS_PER_SECOND", "0"))  # 0 = unlimited
+    PINECONE_REQUESTS_PER_SECOND: float = float(os.getenv("PINECONE_REQUESTS_PER_SECOND", "0"))  # 0 = unlimited
+    PINECONE_MAX_RETRIES: int = int(os.getenv("PINECONE_MAX_RETRIES", "3"))  # retries of 429/5xx/network failures
+    
+    # ── Staged Pipeline Settings ─────────────────────────────────────────
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))  # batches buffered between stages
+    PIPELINE_UPSERT_WORKERS: int = int(os.getenv("PIPELINE_UPSERT_WORKERS", "2"))
+    JOURNAL_RESUME_HOURS: float = float(os.getenv("JOURNAL_RESUME_HOURS", "24"))  # interrupted ingestions stay resumable this long
+    INGESTION_LEASE_SECONDS: float = float(os.getenv("INGESTION_LEASE_SECONDS", "120"))  # heartbeat age after which another process's ingestion counts as dead
+    BULK_INGEST_WORKERS: int = int(os.getenv("BULK_INGEST_WORKERS", "4"))  # files ingested concurrently by ingest-dir/ingest-manifest
+    
+    # ── Ingestion Worker Settings ────────────────────────────────────────
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))  # API uploads ingested concurrently in the background
+    UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR", "uploads")  # uploads wait here until their job finishes
+    
+    # ── Health & Stats Settings ──────────────────────────────────────────
+    STATS_CACHE_TTL_SECONDS: float = float(os.getenv("STATS_CACHE_TTL_SECONDS", "60"))  # background refresh of index stats
+    STATS_MAX_STALENESS_SECONDS: float = float(os.getenv("STATS_MAX_STALENESS_SECONDS", "180"))  # older → /health/ready fails
+    STATS_TIMEOUT_SECONDS: float = float(os.getenv("STATS_TIMEOUT_SECONDS", "10"))
     
     def validate(self) -> None:
         """Validate required configuration values."""
-        if not self.PINECONE_API_KEY:
+        if not self.PINECONE_API_KEY and self.VECTOR_STORE in ("pinecone", "record"):
             raise ValueError("PINECONE_API_KEY is required")
         if not self.GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY is required")
@@ -68,16 +135,36 @@ settings = Settings()
 if __name__ == "__main__":
     print("=== Enhanced RAG Configuration ===")
     print(f"Database path     : {settings.SQLITE_DB_PATH}")
+    print(f"SQLite tuning     : busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}ms, cache={settings.SQLITE_CACHE_SIZE_KB}KB (WAL)")
     print(f"PINECONE_API_KEY  : {'✅ set' if settings.PINECONE_API_KEY else '❌ missing'}")
     print(f"GROQ_API_KEY      : {'✅ set' if settings.GROQ_API_KEY else '❌ missing'}")
     print(f"Index name        : {settings.PINECONE_INDEX_NAME}")
+    print(f"Vector store      : {settings.VECTOR_STORE}"
+          + (f" (latency={settings.VECTOR_STORE_LATENCY}, errors={settings.VECTOR_STORE_ERRORS}, seed={settings.VECTOR_STORE_SEED})"
+             if settings.VECTOR_STORE in ("fake", "replay") else ""))
     print(f"Embed model       : {settings.EMBEDDING_MODEL}")
     print(f"Rerank model      : {settings.RERANKER_MODEL}")
     print(f"LLM model         : {settings.GROQ_MODEL}")
     print(f"Text chunk size   : {settings.TEXT_CHUNK_SIZE} (overlap: {settings.TEXT_CHUNK_OVERLAP})")
     print(f"Table chunk size  : {settings.TABLE_CHUNK_SIZE}")
+    print(f"Retention         : {settings.RETENTION_DAYS} days (compaction every {settings.COMPACTION_INTERVAL_HOURS}h)")
+    print(f"Chunk filter      : {'on' if settings.CHUNK_FILTER_ENABLED else 'off'} ({settings.CHUNK_FILTER_MODE})")
+    print(f"Chunk hashing     : {settings.CHUNK_HASH_ALGORITHM} (normalization v{settings.CHUNK_NORMALIZATION_VERSION})")
+    print(f"Chunk text store  : {f'{settings.CHUNK_TEXT_CODEC} level {settings.CHUNK_TEXT_LEVEL}' if settings.CHUNK_TEXT_STORE_ENABLED else 'off'}")
+    print(f"Staged pipeline   : queue={settings.PIPELINE_QUEUE_SIZE}, upsert workers={settings.PIPELINE_UPSERT_WORKERS}")
+    print(f"Pinecone writes   : {settings.PINECONE_MAX_CONCURRENCY} concurrent, "
+          f"{settings.PINECONE_RECORDS_PER_SECOND or '∞'} rec/s, {settings.PINECONE_REQUESTS_PER_SECOND or '∞'} req/s, "
+          f"{settings.PINECONE_MAX_RETRIES} retries")
+    print(f"Resume window     : {settings.JOURNAL_RESUME_HOURS}h (ingestion lease {settings.INGESTION_LEASE_SECONDS:g}s)")
+    print(f"Bulk workers      : {settings.BULK_INGEST_WORKERS}")
+    print(f"Ingest workers    : {settings.INGEST_WORKERS} (spool: {settings.UPLOAD_SPOOL_DIR})")
+    print(f"Stats cache       : refreshed every {settings.STATS_CACHE_TTL_SECONDS:g}s "
+          f"(not ready after {settings.STATS_MAX_STALENESS_SECONDS:g}s without a refresh)")
     print(f"Retrieval TOP_K   : {settings.TOP_K}")
+    print(f"Lexical index     : {'on' if settings.LEXICAL_INDEX_ENABLED else 'off'} (hybrid RRF k={settings.HYBRID_RRF_K})")
     print(f"Rerank TOP_N      : {settings.RERANK_TOP_N}")
+    print(f"Rerank cache      : {f'{settings.RERANK_CACHE_MAX_ENTRIES} entries, TTL {settings.RERANK_CACHE_TTL_SECONDS:g}s' if settings.RERANK_CACHE_ENABLED else 'off'}")
+    print(f"Context window    : ±{settings.CONTEXT_WINDOW} chunks, {settings.CONTEXT_TOKEN_BUDGET} token budget")
     
     try:
         settings.validate()
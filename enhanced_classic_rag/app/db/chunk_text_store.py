@@ -0,0 +1,431 @@
+"""
+Chunk Text Store — compressed, content-addressed chunk text in the metadata database.
+
+Chunk text is stored once per distinct text, however many chunk rows,
+versions or users share it:
+
+    chunk_texts (
+        text_hash TEXT PRIMARY KEY,  -- SHA-256 of the raw text (chunk_hasher.text_digest)
+        codec TEXT,                  -- zstd | zlib | raw
+        raw_size INTEGER,            -- UTF-8 bytes before compression
+        data BLOB,
+        created_at DATETIME          -- last time the text was offered
+    )
+
+Texts are keyed by their raw digest, not by the chunk hash: the chunk hash is
+computed from normalized text (case-folded, quotes and ligatures folded), so
+chunks whose text differs only in those respects share it, and each must
+still read back its own text. Chunk rows (`document_chunks.text_hash`) and
+lexical index entries record which text they use.
+
+With the store in place, vector searches no longer ask Pinecone for
+`chunk_text`: hits carry only IDs, scores and small metadata fields, and
+their text is hydrated here with one batched read (the text hash of each hit
+is looked up from its chunk row). Chunks can also be re-embedded from local
+text (`python main.py reembed`) without re-parsing their PDFs.
+
+zstd (the `zstandard` package) is used when installed, zlib otherwise; each
+row records its codec, so the two can be mixed. Texts that do not shrink are
+stored raw. Texts are written before their chunks are upserted, so rows no
+chunk references (purged versions, aborted ingestions) are removed by
+compaction only once they are older than the retention window. Offering a
+stored text again restarts its window: an ingestion that re-uses an old,
+unreferenced text cannot lose it to a compaction running before it commits.
+
+A table in the earlier layout (keyed by chunk hash) is converted on startup,
+and the chunk rows that used each text are pointed at its new key.
+"""
+
+import zlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.ingestion.chunk_hasher import text_digest
+
+try:
+    import zstandard
+except ImportError:  # optional: falls back to zlib
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("zstd", "zlib")
+READ_BATCH_SIZE = 500  # hashes per SELECT (below SQLite's bound-parameter limit)
+CONVERT_BATCH_SIZE = 2000  # rows per step when converting a chunk-hash keyed table
+
+
+class ChunkTextStore:
+    """Stores chunk text compressed, keyed by the digest of the raw text."""
+    
+    def __init__(self, db_manager, codec: str = "zstd", level: int = 3):
+        """
+        Initialize store and create its table if needed.
+        
+        Args:
+            db_manager: SQLiteManager of the metadata database.
+            codec: 'zstd' (falls back to 'zlib' if zstandard is not installed) or 'zlib'.
+            level: Compression level.
+        
+        Raises:
+            ValueError: On an unknown codec.
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown chunk text codec '{codec}' (expected one of {', '.join(CODECS)})")
+        if codec == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed; compressing chunk text with zlib")
+            codec = "zlib"
+        
+        self.db_manager = db_manager
+        self.codec = codec
+        self.level = level
+        self.ensure_schema()
+    
+    def ensure_schema(self) -> None:
+        """Create the chunk_texts table (converting a table keyed by chunk hash)."""
+        with self.db_manager.transaction() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(chunk_texts)")}
+            legacy = "chunk_hash" in columns
+            if legacy:
+                conn.execute("ALTER TABLE chunk_texts RENAME TO chunk_texts_legacy")
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunk_texts (
+                    text_hash TEXT PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    raw_size INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    created_at DATETIME
+                ) WITHOUT ROWID
+            """)
+            
+            if legacy:
+                self._convert_legacy(conn)
+    
+    def _convert_legacy(self, conn) -> None:
+        """
+        Re-key texts stored by chunk hash, and point chunk rows without a text hash at them.
+        
+        A chunk-hash keyed table holds one text per chunk hash, so every row
+        with that hash used it (whatever its own casing or punctuation was).
+        """
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS text_rekey (chunk_hash TEXT PRIMARY KEY, text_hash TEXT) WITHOUT ROWID")
+        conn.execute("DELETE FROM temp.text_rekey")
+        
+        converted = 0
+        cursor = conn.execute("SELECT chunk_hash, codec, raw_size, data, created_at FROM chunk_texts_legacy")
+        while True:
+            rows = cursor.fetchmany(CONVERT_BATCH_SIZE)
+            if not rows:
+                break
+            keyed = [(text_digest(self._decompress(row["codec"], row["data"])), row) for row in rows]
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunk_texts (text_hash, codec, raw_size, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(text_hash, row["codec"], row["raw_size"], row["data"], row["created_at"]) for text_hash, row in keyed]
+            )
+            conn.executemany(
+                "INSERT INTO temp.text_rekey (chunk_hash, text_hash) VALUES (?, ?)",
+                [(row["chunk_hash"], text_hash) for text_hash, row in keyed]
+            )
+            converted += len(rows)
+        
+        conn.execute("""
+            UPDATE document_chunks
+            SET text_hash = (SELECT k.text_hash FROM temp.text_rekey k WHERE k.chunk_hash = document_chunks.chunk_hash)
+            WHERE text_hash IS NULL
+        """)
+        conn.execute("DROP TABLE chunk_texts_legacy")
+        conn.execute("DROP TABLE temp.text_rekey")
+        logger.info(f"Converted chunk text store to raw-text keys ({converted} texts)")
+    
+    # ── Codecs ───────────────────────────────────────────────────────────
+    
+    def _compress(self, text: str) -> Tuple[str, int, bytes]:
+        raw = text.encode("utf-8")
+        if self.codec == "zstd":
+            data = zstandard.ZstdCompressor(level=self.level).compress(raw)
+        else:
+            data = zlib.compress(raw, self.level)
+        if len(data) >= len(raw):
+            return "raw", len(raw), raw
+        return self.codec, len(raw), data
+    
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> str:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Chunk text is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+        if codec == "zlib":
+            return zlib.decompress(data).decode("utf-8")
+        return bytes(data).decode("utf-8")
+    
+    # ── Writes ───────────────────────────────────────────────────────────
+    
+    def put(self, texts: Iterable[str]) -> Dict[str, str]:
+        """
+        Store texts by their raw digest; texts already stored keep their data,
+        but their created_at is refreshed (see Compactor.purge_expired).
+        
+        Joins the caller's transaction if one is open.
+        
+        Args:
+            texts: Chunk texts.
+        
+        Returns:
+            Text → text hash of every text offered (new or already present).
+        """
+        keys = {text: text_digest(text) for text in texts if text is not None}
+        if not keys:
+            return {}
+        
+        created_at = datetime.now()
+        rows = [(text_hash, *self._compress(text), created_at) for text, text_hash in keys.items()]
+        with self.db_manager.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO chunk_texts (text_hash, codec, raw_size, data, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (text_hash) DO UPDATE SET created_at = excluded.created_at
+            """, rows)
+        return keys
+    
+    def put_chunks(self, chunks: Iterable[Any]) -> int:
+        """Store the text of ChunkRecords (or chunk dictionaries); returns the number of distinct texts."""
+        return len(self.put(chunk["chunk_text"] for chunk in chunks))
+    
+    def put_for_chunks(self, username: str, texts: Dict[str, str]) -> int:
+        """
+        Store texts of existing chunks and point their rows at them.
+        
+        Used for chunks whose text is not in the store (ingested before it, or
+        purged), with text fetched from the vector store. Rows that already
+        reference a stored text keep it.
+        
+        Args:
+            username: Namespace of the chunks.
+            texts: chunk_id → chunk text.
+        
+        Returns:
+            Number of chunk rows that got a text hash.
+        """
+        with self.db_manager.transaction() as conn:
+            keys = self.put(texts.values())
+            return conn.executemany("""
+                UPDATE document_chunks SET text_hash = ?
+                WHERE username = ? AND chunk_id = ? AND is_active = 1
+                  AND (text_hash IS NULL
+                       OR NOT EXISTS (SELECT 1 FROM chunk_texts t WHERE t.text_hash = document_chunks.text_hash))
+            """, [(keys[text], username, chunk_id) for chunk_id, text in texts.items()]).rowcount
+    
+    # ── Reads ────────────────────────────────────────────────────────────
+    
+    def get_many(self, text_hashes: Iterable[str]) -> Dict[str, str]:
+        """
+        Texts for the given text hashes, in one read per READ_BATCH_SIZE hashes.
+        
+        Returns:
+            Text hash → text; unknown hashes are omitted.
+        """
+        hashes = list(dict.fromkeys(h for h in text_hashes if h))
+        texts = {}
+        
+        with self.db_manager.transaction() as conn:
+            for i in range(0, len(hashes), READ_BATCH_SIZE):
+                batch = hashes[i:i + READ_BATCH_SIZE]
+                rows = conn.execute(
+                    f"SELECT text_hash, codec, data FROM chunk_texts "
+                    f"WHERE text_hash IN ({', '.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for row in rows:
+                    texts[row["text_hash"]] = self._decompress(row["codec"], row["data"])
+        return texts
+    
+    def hydrate(self, hits: List[Dict[str, Any]], username: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Fill in 'chunk_text' of search hits.
+        
+        Hits that already carry text are left alone. A hit's text is read by
+        its 'text_hash' (lexical hits carry one); otherwise the text hash is
+        looked up from the hit's active chunk row ('id' and 'source' in the
+        username's namespace).
+        
+        Returns:
+            Hits whose text could not be found (no chunk row with a stored text,
+            e.g. chunks ingested before the store or not committed yet).
+        """
+        pending = [hit for hit in hits if not hit.get("chunk_text")]
+        unresolved = [(hit.get("source"), hit["id"]) for hit in pending if not hit.get("text_hash")]
+        rows = self.db_manager.locate_chunks(username, unresolved) if username and unresolved else {}
+        keys = [hit.get("text_hash") or rows.get(hit["id"], {}).get("text_hash") for hit in pending]
+        texts = self.get_many(keys)
+        
+        missing = []
+        for hit, text_hash in zip(pending, keys):
+            text = texts.get(text_hash)
+            if text is None:
+                missing.append(hit)
+            else:
+                hit["chunk_text"] = text
+        return missing
+    
+    def missing_chunks(self, username: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(username, chunk_id) of active chunks whose text is not stored."""
+        sql = """
+            SELECT dc.username, dc.chunk_id
+            FROM document_chunks dc
+            WHERE dc.is_active = 1
+              AND (dc.text_hash IS NULL
+                   OR NOT EXISTS (SELECT 1 FROM chunk_texts t WHERE t.text_hash = dc.text_hash))
+        """
+        params: List[Any] = []
+        if username:
+            sql += " AND dc.username = ?"
+            params.append(username)
+        
+        with self.db_manager.transaction() as conn:
+            return [(row["username"], row["chunk_id"]) for row in conn.execute(sql, params)]
+    
+    def backfill(self, vector_store, username: Optional[str] = None, batch_size: int = 100) -> Dict[str, int]:
+        """
+        Store the text of active chunks that predate the store, fetched from the vector store.
+        
+        Safe to re-run: only chunks whose text is still missing are fetched.
+        
+        Args:
+            vector_store: VectorStore to fetch records from.
+            username: Restrict to one namespace.
+            batch_size: Records fetched per request.
+        
+        Returns:
+            Dictionary with 'missing', 'stored' and 'not_found' counts.
+        """
+        missing = self.missing_chunks(username)
+        report = {"missing": len(missing), "stored": 0, "not_found": 0}
+        
+        by_user: Dict[str, List[str]] = {}
+        for user, chunk_id in missing:
+            by_user.setdefault(user, []).append(chunk_id)
+        
+        for user, chunk_ids in by_user.items():
+            for i in range(0, len(chunk_ids), batch_size):
+                batch = chunk_ids[i:i + batch_size]
+                records = vector_store.fetch_records(batch, user)
+                texts = {record["_id"]: record["chunk_text"] for record in records if record.get("chunk_text")}
+                self.put_for_chunks(user, texts)
+                report["stored"] += len(texts)
+                report["not_found"] += len(batch) - len(records)
+        
+        logger.info(
+            f"✅ Chunk text backfill: {report['stored']}/{report['missing']} stored, "
+            f"{report['not_found']} not found"
+        )
+        return report
+    
+    def stats(self) -> Dict[str, Any]:
+        """Stored texts, raw and stored bytes, and the compression ratio."""
+        with self.db_manager.transaction() as conn:
+            row = conn.execute("""
+                SELECT COUNT(*) AS texts, COALESCE(SUM(raw_size), 0) AS raw_bytes,
+                       COALESCE(SUM(LENGTH(data)), 0) AS stored_bytes
+                FROM chunk_texts
+            """).fetchone()
+        
+        return {
+            "texts": row["texts"],
+            "raw_bytes": row["raw_bytes"],
+            "stored_bytes": row["stored_bytes"],
+            "ratio": round(row["raw_bytes"] / row["stored_bytes"], 2) if row["stored_bytes"] else 0.0,
+            "codec": self.codec,
+        }
+
+
+if __name__ == "__main__":
+    import os
+    import json
+    import tempfile
+    from app.db.sqlite_manager import SQLiteManager
+    
+    print("=== Chunk Text Store Test ===\n")
+    
+    db = SQLiteManager(os.path.join(tempfile.mkdtemp(), "text_store_test.db"))
+    store = ChunkTextStore(db)
+    print(f"Codec: {store.codec}")
+    
+    paragraph = ("Revenue for the quarter increased by 12% compared to the prior year, driven by "
+                 "growth in subscription services and improved retention among enterprise customers. ")
+    texts = [f"Section {i}. " + paragraph * (1 + i % 3) for i in range(300)]
+    
+    keys = store.put(texts)
+    assert len(keys) == 300 and keys[texts[0]] == text_digest(texts[0])
+    first = keys[texts[0]]
+    with db.transaction() as conn:
+        conn.execute("UPDATE chunk_texts SET created_at = '2000-01-01 00:00:00' WHERE text_hash = ?", (first,))
+    store.put([texts[0]])
+    with db.transaction() as conn:
+        offered_again = conn.execute("SELECT created_at FROM chunk_texts WHERE text_hash = ?", (first,)).fetchone()[0]
+    assert store.get_many([first])[first] == texts[0] and offered_again > "2000-01-01 00:00:00"
+    print("✅ Offering a stored text again keeps its data and refreshes created_at")
+    stats = store.stats()
+    assert stats["texts"] == 300 and stats["ratio"] > 2
+    print(f"✅ Stored {stats['texts']} texts: {stats['raw_bytes']:,} → {stats['stored_bytes']:,} bytes "
+          f"({stats['ratio']}x)")
+    
+    # Round trip, including a text too short to compress
+    short = store.put(["ok"])["ok"]
+    loaded = store.get_many(list(keys.values()) + [short, "unknown"])
+    assert loaded[short] == "ok" and "unknown" not in loaded
+    assert all(loaded[text_hash] == text for text, text_hash in keys.items())
+    print(f"✅ Batched read of {len(loaded)} texts matches what was stored")
+    
+    # Variants that normalize alike (same chunk hash) each keep their own text
+    from app.ingestion.chunk_hasher import ChunkHasher
+    variants = ChunkHasher().add_hashes_to_chunks([
+        {"chunk_text": "Net “Revenue” rose 12%."}, {"chunk_text": 'NET "REVENUE" ROSE 12%.'}
+    ])
+    assert variants[0]["chunk_hash"] == variants[1]["chunk_hash"] and store.put_chunks(variants) == 2
+    read_back = store.get_many(v["text_hash"] for v in variants)
+    assert [read_back[v["text_hash"]] for v in variants] == [v["chunk_text"] for v in variants]
+    print("✅ Texts sharing a chunk hash are stored and read back separately")
+    
+    # Hydration: hits from a text-free vector query get their text back via their chunk rows
+    doc_id = db.insert_document("report.pdf", "alice", "doc-hash", 1, status="processed")
+    db.insert_chunks_batch([
+        {"document_id": doc_id, "chunk_id": f"report_v1_chunk{i:03d}", "chunk_hash": "h", "chunk_index": i,
+         "filename": "report.pdf", "username": "alice", "version": 1, "text_hash": keys[texts[i]]}
+        for i in range(10)
+    ] + [
+        {"document_id": doc_id, "chunk_id": f"report_v1_chunk{10 + i:03d}", "chunk_hash": v["chunk_hash"],
+         "chunk_index": 10 + i, "filename": "report.pdf", "username": "alice", "version": 1,
+         "text_hash": v["text_hash"]}
+        for i, v in enumerate(variants)
+    ])
+    hits = [{"id": f"report_v1_chunk{i:03d}", "score": 0.9, "source": "report.pdf"} for i in range(12)]
+    hits.append({"id": "legacy", "score": 0.5, "source": "report.pdf"})
+    missing = store.hydrate(hits, "alice")
+    assert [hit["id"] for hit in missing] == ["legacy"]
+    assert hits[3]["chunk_text"] == texts[3]
+    assert [hit["chunk_text"] for hit in hits[10:12]] == [v["chunk_text"] for v in variants]
+    slim = len(json.dumps([{k: v for k, v in h.items() if k != "chunk_text"} for h in hits]))
+    print(f"✅ Hydrated 12/13 hits (payload without text: {slim:,} bytes vs {len(json.dumps(hits)):,} with)")
+    
+    # A table keyed by chunk hash (earlier layout) is re-keyed, and chunk rows follow
+    with db.transaction() as conn:
+        conn.execute("DROP TABLE chunk_texts")
+        conn.execute("""
+            CREATE TABLE chunk_texts (
+                chunk_hash TEXT PRIMARY KEY, codec TEXT NOT NULL, raw_size INTEGER NOT NULL,
+                data BLOB NOT NULL, created_at DATETIME
+            ) WITHOUT ROWID
+        """)
+        conn.execute("INSERT INTO chunk_texts VALUES ('h', 'raw', 3, ?, '2024-01-01 00:00:00')", (b"old",))
+        conn.execute("UPDATE document_chunks SET text_hash = NULL WHERE chunk_hash = 'h'")
+    store = ChunkTextStore(db)
+    hit = {"id": "report_v1_chunk004", "source": "report.pdf"}
+    assert store.hydrate([hit], "alice") == []
+    assert hit["chunk_text"] == "old" and store.missing_chunks("alice") == [
+        ("alice", "report_v1_chunk010"), ("alice", "report_v1_chunk011")  # texts not in the old table
+    ]
+    print("✅ Chunk-hash keyed table converted; chunk rows point at the re-keyed texts")
+    
+    print("\n✅ All tests passed!")
@@ -0,0 +1,381 @@
+"""
+Schema Migrations — in-place, batched upgrades of existing metadata databases.
+
+The schema version is stored in SQLite's `PRAGMA user_version`:
+    1  hash scheme columns on document_chunks (hash_algorithm, normalization_version)
+    2  typed chunk columns (filename, username, version, page_number, content_type)
+       backfilled from the JSON `metadata` blob, plus covering indexes
+    3  unique (username, filename, version) for live document versions
+    4  per-user listing indexes (keyset pagination, status counts)
+    5  document_chunks.deactivated_at (retention window for compaction)
+    6  documents.lease_owner / lease_heartbeat (cross-process ingestion leases)
+    7  ingestion_jobs.owner / heartbeat_at (jobs claimed by one worker process)
+    8  document_chunks.text_hash (raw-text key of the chunk text store)
+
+SQLiteManager runs pending migrations when it opens a database. Large
+databases can be upgraded ahead of a deploy with:
+    python main.py migrate-db [batch_size]
+
+Backfills run in id-range batches, one transaction each, so readers and
+writers are never blocked for long and an interrupted run simply resumes.
+"""
+
+import sqlite3
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 8
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Copy JSON metadata into typed columns and drop the blob for one id range
+BACKFILL_TYPED_COLUMNS_SQL = """
+    UPDATE document_chunks
+    SET filename = json_extract(metadata, '$.filename'),
+        username = json_extract(metadata, '$.username'),
+        version = json_extract(metadata, '$.version'),
+        page_number = json_extract(metadata, '$.page_number'),
+        content_type = COALESCE(json_extract(metadata, '$.content_type'), 'text'),
+        metadata = NULL
+    WHERE id > ? AND id <= ?
+    AND metadata IS NOT NULL
+"""
+
+
+def ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    """
+    Add a column to an existing table if it is missing.
+    
+    Returns:
+        True if the column was added.
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    logger.info(f"Added column {table}.{column}")
+    return True
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the schema version recorded in the database file."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _migrate_1(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Hash scheme columns."""
+    with db_manager.transaction() as conn:
+        ensure_column(conn, "document_chunks", "hash_algorithm", "TEXT NOT NULL DEFAULT 'sha256'")
+        ensure_column(conn, "document_chunks", "normalization_version", "INTEGER NOT NULL DEFAULT 1")
+    return 0
+
+
+def _migrate_2(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Typed chunk columns backfilled from JSON metadata, plus covering indexes."""
+    with db_manager.transaction() as conn:
+        ensure_column(conn, "document_chunks", "filename", "TEXT")
+        ensure_column(conn, "document_chunks", "username", "TEXT")
+        ensure_column(conn, "document_chunks", "version", "INTEGER")
+        ensure_column(conn, "document_chunks", "page_number", "INTEGER")
+        ensure_column(conn, "document_chunks", "content_type", "TEXT NOT NULL DEFAULT 'text'")
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM document_chunks").fetchone()[0]
+    
+    backfilled = 0
+    for low in range(0, max_id, batch_size):
+        with db_manager.transaction() as conn:
+            backfilled += conn.execute(BACKFILL_TYPED_COLUMNS_SQL, (low, low + batch_size)).rowcount
+        if progress:
+            progress(min(low + batch_size, max_id), max_id)
+    
+    with db_manager.transaction() as conn:
+        # Hash-map lookups (document_id, is_active) → (chunk_hash, chunk_id) never touch the table
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_chunks_active_hash
+            ON document_chunks(document_id, is_active, chunk_hash, chunk_id)
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_chunks_user_file_version
+            ON document_chunks(username, filename, version)
+        """)
+        # Superseded by the covering index above (same leading columns)
+        conn.execute("DROP INDEX IF EXISTS idx_chunk_lookup")
+    
+    return backfilled
+
+
+def _migrate_3(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Unique live version per (username, filename)."""
+    with db_manager.transaction(immediate=True) as conn:
+        # Versions allocated twice by earlier concurrent uploads: keep the newest row,
+        # mark the others as failed so the constraint can be created
+        resolved = conn.execute("""
+            UPDATE documents
+            SET status = 'failed', is_active = 0
+            WHERE status IN ('processing', 'processed')
+            AND id NOT IN (
+                SELECT MAX(id) FROM documents
+                WHERE status IN ('processing', 'processed')
+                GROUP BY username, filename, version
+            )
+        """).rowcount
+        if resolved:
+            logger.warning(f"Marked {resolved} conflicting document versions as failed")
+        
+        conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_documents_live_version
+            ON documents(username, filename, version)
+            WHERE status IN ('processing', 'processed')
+        """)
+    return 0
+
+
+def _migrate_4(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Per-user document listing indexes."""
+    with db_manager.transaction() as conn:
+        # Keyset pagination: WHERE username = ? AND (uploaded_at, id) < (?, ?) ORDER BY uploaded_at DESC, id DESC
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_documents_user_uploaded
+            ON documents(username, uploaded_at, id)
+        """)
+        # Status/active counts and filters answered from the index alone
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_documents_user_status
+            ON documents(username, status, is_active)
+        """)
+    return 0
+
+
+def _migrate_5(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Deactivation timestamp for chunk retention."""
+    with db_manager.transaction() as conn:
+        ensure_column(conn, "document_chunks", "deactivated_at", "DATETIME")
+        # Inactive rows are what compaction scans for
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_chunks_inactive
+            ON document_chunks(is_active, deactivated_at)
+        """)
+    return 0
+
+
+def _migrate_6(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Lease columns on documents (ingestions shared between processes)."""
+    with db_manager.transaction() as conn:
+        ensure_column(conn, "documents", "lease_owner", "TEXT")
+        ensure_column(conn, "documents", "lease_heartbeat", "DATETIME")
+    return 0
+
+
+def _migrate_7(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Owner and heartbeat of ingestion jobs (claimed by one worker process)."""
+    with db_manager.transaction() as conn:
+        ensure_column(conn, "ingestion_jobs", "owner", "TEXT")
+        ensure_column(conn, "ingestion_jobs", "heartbeat_at", "DATETIME")
+    return 0
+
+
+def _migrate_8(db_manager, batch_size: int, progress: Optional[Callable]) -> int:
+    """Raw-text hash of each chunk (filled in by ChunkTextStore when it converts its table)."""
+    with db_manager.transaction() as conn:
+        ensure_column(conn, "document_chunks", "text_hash", "TEXT")
+        # Compaction keeps the texts that active or retained chunk rows reference
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_text_hash ON document_chunks(text_hash)")
+    return 0
+
+
+MIGRATIONS = {
+    1: _migrate_1,
+    2: _migrate_2,
+    3: _migrate_3,
+    4: _migrate_4,
+    5: _migrate_5,
+    6: _migrate_6,
+    7: _migrate_7,
+    8: _migrate_8,
+}
+
+
+def migrate(
+    db_manager,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Apply all pending migrations to the manager's database.
+    
+    Args:
+        db_manager: SQLiteManager whose database should be upgraded.
+        batch_size: Rows per backfill transaction.
+        progress: Optional callback(done_rows, total_rows) for backfills.
+    
+    Returns:
+        Dictionary with the structure:
+        {
+            "from_version": 0,
+            "to_version": 8,
+            "applied": [1, 2, 3, 4, 5, 6, 7, 8],
+            "rows_backfilled": 120000,
+            "elapsed_seconds": 1.8
+        }
+    """
+    start = time.perf_counter()
+    
+    with db_manager.transaction() as conn:
+        from_version = get_schema_version(conn)
+    
+    applied = []
+    rows_backfilled = 0
+    
+    for version in sorted(MIGRATIONS):
+        if version <= from_version:
+            continue
+        
+        logger.info(f"Applying schema migration {version}...")
+        rows_backfilled += MIGRATIONS[version](db_manager, batch_size, progress)
+        
+        with db_manager.transaction() as conn:
+            conn.execute(f"PRAGMA user_version = {version}")
+        applied.append(version)
+    
+    result = {
+        "from_version": from_version,
+        "to_version": max(from_version, SCHEMA_VERSION),
+        "applied": applied,
+        "rows_backfilled": rows_backfilled,
+        "elapsed_seconds": round(time.perf_counter() - start, 3)
+    }
+    
+    if applied:
+        logger.info(
+            f"✅ Schema migrated v{from_version} → v{result['to_version']} "
+            f"({rows_backfilled} rows backfilled in {result['elapsed_seconds']}s)"
+        )
+    return result
+
+
+if __name__ == "__main__":
+    import json
+    import os
+    from app.db.sqlite_manager import SQLiteManager
+    
+    test_db = "test_migrations.db"
+    
+    def cleanup():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(test_db + suffix):
+                os.remove(test_db + suffix)
+    
+    cleanup()
+    
+    try:
+        print("=== Schema Migrations Test ===\n")
+        
+        # Build a database with the original (JSON metadata) schema
+        conn = sqlite3.connect(test_db)
+        conn.executescript("""
+            CREATE TABLE documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL,
+                username TEXT NOT NULL,
+                document_hash TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                is_active BOOLEAN DEFAULT 1,
+                uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE document_chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL,
+                metadata TEXT,
+                is_active BOOLEAN DEFAULT 1,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX idx_chunk_lookup ON document_chunks(document_id, is_active);
+        """)
+        conn.execute(
+            "INSERT INTO documents (filename, username, document_hash, version, status) "
+            "VALUES ('legacy.pdf', 'alice', 'h', 1, 'processed')"
+        )
+        n_rows = 25000
+        conn.executemany(
+            "INSERT INTO document_chunks (document_id, chunk_hash, chunk_index, chunk_id, metadata) "
+            "VALUES (1, ?, ?, ?, ?)",
+            [
+                (f"{i:064x}", i, f"legacy_v1_chunk{i:03d}", json.dumps({
+                    "filename": "legacy.pdf", "username": "alice", "version": 1,
+                    "page_number": i // 25 + 1, "content_type": "table" if i % 50 == 0 else "text"
+                }))
+                for i in range(n_rows)
+            ]
+        )
+        conn.commit()
+        conn.close()
+        
+        # Opening the database with SQLiteManager upgrades it in place
+        manager = SQLiteManager(test_db)
+        
+        with manager._get_connection() as conn:
+            assert get_schema_version(conn) == SCHEMA_VERSION, "Schema version should be current"
+            row = dict(conn.execute("SELECT * FROM document_chunks WHERE chunk_index = 50").fetchone())
+        
+        print(f"✅ Migrated row: {row['filename']} v{row['version']} p.{row['page_number']} "
+              f"{row['content_type']} (metadata={row['metadata']})")
+        assert row["page_number"] == 3 and row["content_type"] == "table", "Backfill values incorrect"
+        assert row["metadata"] is None, "JSON blob should be dropped after backfill"
+        
+        chunks = manager.get_active_chunks(1)
+        assert len(chunks) == n_rows and chunks[50]["page_number"] == 3, "Typed columns should be read"
+        
+        # Re-running is a no-op
+        result = migrate(manager)
+        assert result["applied"] == [], "Migrations should be idempotent"
+        print(f"✅ Re-run: {result}")
+        
+        # Hash-map lookup is answered from the covering index alone
+        with manager._get_connection() as conn:
+            plan = " ".join(row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT chunk_hash, chunk_id FROM document_chunks "
+                "WHERE document_id = ? AND is_active = 1", (1,)
+            ))
+        print(f"✅ Hash-map query plan: {plan}")
+        assert "COVERING INDEX idx_chunks_active_hash" in plan, "Hash map should be index-only"
+        
+        # Benchmark: JSON-parsing hash map (previous) vs index-only hash map
+        with manager._get_connection() as conn:
+            conn.execute(
+                "UPDATE document_chunks SET metadata = json_object("
+                "'filename', filename, 'username', username, 'version', version, "
+                "'page_number', page_number, 'content_type', content_type)"
+            )
+        
+        def json_hash_map():
+            with manager._get_connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, document_id, chunk_id, chunk_hash, chunk_index, metadata, is_active, created_at "
+                    "FROM document_chunks WHERE document_id = ? AND is_active = 1 ORDER BY chunk_index", (1,)
+                ).fetchall()
+            chunks = []
+            for row in rows:
+                chunk = dict(row)
+                chunk["metadata"] = json.loads(chunk["metadata"])
+                chunks.append(chunk)
+            return {chunk["chunk_hash"]: chunk["chunk_id"] for chunk in chunks}
+        
+        for name, lookup in [("JSON rows", json_hash_map), ("index-only", lambda: manager.get_chunk_hash_map(1))]:
+            start = time.perf_counter()
+            for _ in range(5):
+                hash_map = lookup()
+            elapsed = (time.perf_counter() - start) / 5
+            assert len(hash_map) == n_rows
+            print(f"   Hash map ({n_rows:,} chunks) {name:10s}: {elapsed * 1000:6.1f} ms")
+        
+        manager.close()
+        print("\n✅ All tests passed!")
+    
+    finally:
+        cleanup()
@@ -1,5 +1,8 @@
 """
 Generation module — creates answers using LLM with retrieved context.
+
+The `a`-prefixed methods await the LLM (`ChatGroq.ainvoke`) so the API's
+event loop keeps serving other requests while an answer is generated.
 """
 
 import logging
@@ -29,24 +32,8 @@ class Generator:
         
         logger.info(f"Generator initialized with Groq ({settings.GROQ_MODEL})")
     
-    def generate_answer(
-        self,
-        question: str,
-        chunks: List[Dict[str, Any]]
-    ) -> str:
-        """
-        Generate an answer to a question using retrieved chunks.
-        
-        Args:
-            question: User question.
-            chunks: Retrieved/reranked chunks with metadata.
-        
-        Returns:
-            Generated answer.
-        """
-        if not chunks:
-            return "I couldn't find any relevant information to answer your question."
-        
+    def _build_prompt(self, question: str, chunks: List[Dict[str, Any]]) -> str:
+        """Build the answer prompt from the question and retrieved chunks."""
         # Build context from chunks
         context_parts = []
         
@@ -80,8 +67,48 @@ Instructions:
 
 Answer:"""
         
+        return prompt
+    
+    def generate_answer(
+        self,
+        question: str,
+        chunks: List[Dict[str, Any]]
+    ) -> str:
+        """
+        Generate an answer to a question using retrieved chunks.
+        
+        Args:
+            question: User question.
+            chunks: Retrieved/reranked chunks with metadata.
+        
+        Returns:
+            Generated answer.
+        """
+        if not chunks:
+            return "I couldn't find any relevant information to answer your question."
+        
+        try:
+            response = self.llm.invoke(self._build_prompt(question, chunks))
+            answer = response.content if hasattr(response, 'content') else str(response)
+            
+            logger.info("Generated answer successfully")
+            return answer
+        
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            raise
+    
+    async def agenerate_answer(
+        self,
+        question: str,
+        chunks: List[Dict[str, Any]]
+    ) -> str:
+        """Generate an answer without blocking the event loop (see generate_answer())."""
+        if not chunks:
+            return "I couldn't find any relevant information to answer your question."
+        
         try:
-            response = self.llm.invoke(prompt)
+            response = await self.llm.ainvoke(self._build_prompt(question, chunks))
             answer = response.content if hasattr(response, 'content') else str(response)
             
             logger.info("Generated answer successfully")
@@ -106,9 +133,25 @@ Answer:"""
         Returns:
             Dictionary with answer and citations.
         """
-        answer = self.generate_answer(question, chunks)
-        
-        # Extract citations
+        return {
+            "answer": self.generate_answer(question, chunks),
+            "citations": self._citations(chunks)
+        }
+    
+    async def agenerate_with_citations(
+        self,
+        question: str,
+        chunks: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Generate an answer with citations without blocking the event loop."""
+        return {
+            "answer": await self.agenerate_answer(question, chunks),
+            "citations": self._citations(chunks)
+        }
+    
+    @staticmethod
+    def _citations(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Citation entries for the chunks, numbered as in the prompt."""
         citations = []
         for i, chunk in enumerate(chunks, 1):
             citations.append({
@@ -121,10 +164,7 @@ Answer:"""
                 "text_preview": chunk.get("chunk_text", "")[:200] + "..."
             })
         
-        return {
-            "answer": answer,
-            "citations": citations
-        }
+        return citations
 
 
 if __name__ == "__main__":
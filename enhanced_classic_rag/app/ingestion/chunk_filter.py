@@ -0,0 +1,321 @@
+"""
+Chunk Filter — quality gate between chunking and hashing.
+
+Scores each text chunk and removes low-information windows before they are
+hashed, embedded and upserted:
+- Dot leaders (table-of-contents lines such as "Introduction ....... 5")
+- Lone page numbers / running footers ("Page 3 of 12")
+- OCR garbage and symbol soup (low alphabetic ratio)
+- Repetitive filler (low token entropy, only for chunks long enough that
+  entropy is meaningful: five distinct words cap it at log2(5) ≈ 2.3 bits, so
+  a short heading with one repeated word would fail the default threshold)
+- Fragments below a minimum word count (merged into a neighbour or dropped)
+
+Table chunks are passed through untouched — numeric cells would otherwise
+fail the alphabetic-ratio check.
+"""
+
+import math
+import re
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Runs of leader characters ("....", ". . . .", "____") optionally followed by a page number
+DOT_LEADER_RE = re.compile(r"(?:[.…·_]\s?){4,}\s*\d*")
+
+# "12", "Page 12", "12 of 40", "- 12 -", "p. 12/40"
+PAGE_NUMBER_RE = re.compile(
+    r"^[\s\-–—]*(?:page|p\.)?\s*\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?[\s\-–—]*$",
+    re.IGNORECASE
+)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class ChunkFilter:
+    """Scores chunks and drops or merges low-value ones."""
+    
+    def __init__(
+        self,
+        enabled: bool = True,
+        mode: str = "merge",
+        min_words: int = 5,
+        min_alpha_ratio: float = 0.5,
+        min_token_entropy: float = 2.0,
+        min_entropy_tokens: int = 12,
+        max_dot_leader_ratio: float = 0.15
+    ):
+        """
+        Initialize chunk filter with configurable thresholds.
+        
+        Args:
+            enabled: If False, chunks are passed through unchanged.
+            mode: How to treat fragments below `min_words`: 'merge' appends them
+                  to a neighbouring chunk on the same page, 'drop' discards them.
+            min_words: Minimum number of word tokens for a standalone chunk.
+            min_alpha_ratio: Minimum share of alphabetic characters among non-space characters.
+            min_token_entropy: Minimum Shannon entropy (bits) of the token distribution.
+            min_entropy_tokens: Chunks with fewer tokens skip the entropy check.
+            max_dot_leader_ratio: Maximum share of characters covered by dot leaders.
+        """
+        if mode not in ("merge", "drop"):
+            raise ValueError(f"Unsupported chunk filter mode: {mode}")
+        
+        self.enabled = enabled
+        self.mode = mode
+        self.min_words = min_words
+        self.min_alpha_ratio = min_alpha_ratio
+        self.min_token_entropy = min_token_entropy
+        self.min_entropy_tokens = min_entropy_tokens
+        self.max_dot_leader_ratio = max_dot_leader_ratio
+    
+    @staticmethod
+    def alpha_ratio(text: str) -> float:
+        """Share of alphabetic characters among non-whitespace characters."""
+        non_space = [c for c in text if not c.isspace()]
+        if not non_space:
+            return 0.0
+        return sum(1 for c in non_space if c.isalpha()) / len(non_space)
+    
+    @staticmethod
+    def token_entropy(tokens: List[str]) -> float:
+        """Shannon entropy (bits) of the token frequency distribution."""
+        if not tokens:
+            return 0.0
+        counts = Counter(tokens)
+        total = len(tokens)
+        return -sum((n / total) * math.log2(n / total) for n in counts.values())
+    
+    @staticmethod
+    def dot_leader_ratio(text: str) -> float:
+        """Share of characters covered by dot-leader runs."""
+        if not text:
+            return 0.0
+        covered = sum(m.end() - m.start() for m in DOT_LEADER_RE.finditer(text))
+        return covered / len(text)
+    
+    def score_chunk(self, text: str) -> Dict[str, Any]:
+        """
+        Compute quality signals for a chunk and classify it.
+        
+        Args:
+            text: Chunk text.
+        
+        Returns:
+            Dictionary with the individual scores and a `reason` field that is
+            None for chunks that pass, 'too_short' for mergeable fragments, or
+            the name of the failed check for chunks that should be dropped.
+        """
+        tokens = [t.lower() for t in TOKEN_RE.findall(text)]
+        scores = {
+            "word_count": len(tokens),
+            "alpha_ratio": round(self.alpha_ratio(text), 3),
+            "token_entropy": round(self.token_entropy(tokens), 3),
+            "dot_leader_ratio": round(self.dot_leader_ratio(text), 3),
+            "reason": None
+        }
+        
+        if PAGE_NUMBER_RE.match(text):
+            scores["reason"] = "page_number"
+        elif scores["dot_leader_ratio"] > self.max_dot_leader_ratio:
+            scores["reason"] = "dot_leader"
+        elif scores["alpha_ratio"] < self.min_alpha_ratio:
+            scores["reason"] = "low_alpha"
+        elif len(tokens) < self.min_words:
+            scores["reason"] = "too_short"
+        elif len(tokens) >= self.min_entropy_tokens and scores["token_entropy"] < self.min_token_entropy:
+            scores["reason"] = "low_entropy"
+        
+        return scores
+    
+    @staticmethod
+    def _join_text(first: str, second: str, min_overlap: int = 8) -> str:
+        """Join two adjacent windows, removing the overlap the chunker introduced."""
+        max_overlap = min(len(first), len(second))
+        for size in range(max_overlap, min_overlap - 1, -1):
+            if first.endswith(second[:size]):
+                return first + second[size:]
+        return f"{first} {second}"
+    
+    def empty_stats(self) -> Dict[str, Any]:
+        """Return a zeroed stats dictionary (see filter_chunks)."""
+        return {
+            "enabled": self.enabled,
+            "input_chunks": 0,
+            "kept_chunks": 0,
+            "dropped_chunks": 0,
+            "merged_chunks": 0,
+            "reasons": {}
+        }
+    
+    def filter_page(
+        self,
+        chunks: List[Dict[str, Any]],
+        stats: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Apply the quality gate to one page's chunks, accumulating into `stats`.
+        
+        Merges never cross a page boundary, so filtering a document page by
+        page (as the staged pipeline does) keeps exactly the chunks that
+        filter_chunks would keep.
+        
+        Args:
+            chunks: Chunks from a single page.
+            stats: Stats dictionary from empty_stats(), updated in place.
+        
+        Returns:
+            Kept chunks.
+        """
+        stats["input_chunks"] += len(chunks)
+        
+        if not self.enabled:
+            stats["kept_chunks"] += len(chunks)
+            return chunks
+        
+        kept: List[Dict[str, Any]] = []
+        pending: Optional[Dict[str, Any]] = None  # short fragment waiting for a successor
+        
+        def count(reason: str, merged: bool = False) -> None:
+            stats["merged_chunks" if merged else "dropped_chunks"] += 1
+            stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+        
+        for chunk in chunks:
+            # A pending fragment can only be merged within its own page
+            if pending is not None and chunk["page_number"] != pending["page_number"]:
+                count("too_short")
+                pending = None
+            
+            if chunk.get("content_type") != "text":
+                kept.append(chunk)
+                continue
+            
+            reason = self.score_chunk(chunk["chunk_text"])["reason"]
+            
+            if reason is None:
+                if pending is not None:
+                    chunk["chunk_text"] = self._join_text(pending["chunk_text"], chunk["chunk_text"])
+                    count("too_short", merged=True)
+                    pending = None
+                kept.append(chunk)
+                continue
+            
+            if reason == "too_short" and self.mode == "merge":
+                previous = kept[-1] if kept else None
+                if (
+                    previous is not None
+                    and previous.get("content_type") == "text"
+                    and previous["page_number"] == chunk["page_number"]
+                ):
+                    previous["chunk_text"] = self._join_text(previous["chunk_text"], chunk["chunk_text"])
+                    count("too_short", merged=True)
+                elif pending is None:
+                    pending = chunk
+                else:
+                    pending["chunk_text"] = self._join_text(pending["chunk_text"], chunk["chunk_text"])
+                    count("too_short", merged=True)
+                continue
+            
+            count(reason)
+        
+        if pending is not None:
+            count("too_short")
+        
+        stats["kept_chunks"] += len(kept)
+        return kept
+    
+    def filter_chunks(
+        self,
+        chunks: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Apply the quality gate to a document's chunks.
+        
+        Chunk indexes of kept chunks are left untouched so chunk IDs stay
+        deterministic for a given chunker configuration.
+        
+        Args:
+            chunks: Chunks from Chunker (text and/or table).
+        
+        Returns:
+            Tuple of (kept_chunks, stats) where stats has the structure:
+            {
+                "enabled": True,
+                "input_chunks": 42,
+                "kept_chunks": 37,
+                "dropped_chunks": 4,
+                "merged_chunks": 1,
+                "reasons": {"dot_leader": 3, "page_number": 1, "too_short": 1}
+            }
+        """
+        stats = self.empty_stats()
+        kept = self.filter_page(chunks, stats)
+        
+        if self.enabled:
+            self.log_stats(stats)
+        return kept, stats
+    
+    @staticmethod
+    def log_stats(stats: Dict[str, Any]) -> None:
+        """Log a one-line summary of filter stats."""
+        logger.info(
+            f"Chunk filter: kept {stats['kept_chunks']}/{stats['input_chunks']} chunks "
+            f"(dropped {stats['dropped_chunks']}, merged {stats['merged_chunks']}) {stats['reasons']}"
+        )
+
+
+if __name__ == "__main__":
+    print("=== Chunk Filter Test ===\n")
+    
+    test_chunks = [
+        {"chunk_text": "Contents Introduction ........ 1 Methods ........ 4 Results ........ 9",
+         "page_number": 1, "content_type": "text", "chunk_index": 0},
+        {"chunk_text": "Page 2 of 10", "page_number": 2, "content_type": "text", "chunk_index": 1},
+        {"chunk_text": "The transformer relies entirely on attention mechanisms to draw global "
+                       "dependencies between input and output sequences.",
+         "page_number": 3, "content_type": "text", "chunk_index": 2},
+        {"chunk_text": "sequences. See Fig", "page_number": 3, "content_type": "text", "chunk_index": 3},
+        {"chunk_text": "#@! %% ^^ ~~ 0x1f ## $$ && ** ((", "page_number": 4, "content_type": "text", "chunk_index": 4},
+        {"chunk_text": " ".join(["data"] * 12), "page_number": 4,
+         "content_type": "text", "chunk_index": 5},
+        {"chunk_text": "Q1 | 100 | 200", "page_number": 4, "content_type": "table", "chunk_index": 0},
+    ]
+    
+    chunk_filter = ChunkFilter(mode="merge")
+    
+    for chunk in test_chunks:
+        scores = chunk_filter.score_chunk(chunk["chunk_text"])
+        print(f"[{chunk['chunk_index']}] {scores['reason'] or 'ok':12s} {chunk['chunk_text'][:50]!r}")
+    
+    kept, stats = chunk_filter.filter_chunks([dict(c) for c in test_chunks])
+    print(f"\nStats: {stats}")
+    print(f"Merged chunk: {kept[0]['chunk_text']!r}")
+    
+    assert stats["kept_chunks"] == 2, "Should keep one text chunk and one table chunk"
+    assert stats["merged_chunks"] == 1, "Trailing fragment should be merged"
+    assert kept[0]["chunk_text"].endswith("output sequences. See Fig"), "Overlap should be removed on merge"
+    assert kept[1]["content_type"] == "table", "Tables should pass through"
+    
+    # Page-by-page filtering (staged pipeline) keeps exactly the same chunks
+    page_stats = chunk_filter.empty_stats()
+    page_kept = []
+    for page in sorted({c["page_number"] for c in test_chunks}):
+        page_kept += chunk_filter.filter_page(
+            [dict(c) for c in test_chunks if c["page_number"] == page], page_stats
+        )
+    assert [c["chunk_text"] for c in page_kept] == [c["chunk_text"] for c in kept]
+    assert page_stats == stats, "Per-page stats should add up to whole-document stats"
+    print("✅ Page-by-page filtering matches whole-document filtering")
+    
+    # Short real text is kept: 5 words with one repeat score 1.92 bits
+    heading = "The scope of the study"
+    assert chunk_filter.score_chunk(heading)["token_entropy"] < chunk_filter.min_token_entropy
+    assert chunk_filter.score_chunk(heading)["reason"] is None, "Short heading should skip the entropy check"
+    assert ChunkFilter(min_entropy_tokens=0).score_chunk(heading)["reason"] == "low_entropy"
+    assert chunk_filter.score_chunk(test_chunks[5]["chunk_text"])["reason"] == "low_entropy"
+    print(f"✅ Short heading kept: {heading!r}")
+    
+    print("\n✅ All tests passed!")
@@ -1,84 +1,304 @@
 """
-Chunk Hasher — computes SHA256 hashes for normalized chunk content.
+Chunk Hasher — computes versioned hashes for normalized chunk content.
 
-Normalization rules:
+Normalization rules (version 1):
 - Convert to lowercase
 - Normalize whitespace (multiple spaces -> single space)
 - Strip leading/trailing whitespace
+
+Normalization rules (version 2, default) — makes hashes stable across PDF re-exports:
+- Unicode NFKC (ligatures ﬁ/ﬂ/ﬀ → fi/fl/ff, NBSP → space, full-width forms)
+- Expand remaining ligatures (æ → ae, œ → oe)
+- Remove soft hyphens and zero-width characters
+- Fold curly quotes, primes and dash variants to ASCII
+- De-hyphenate words split across line breaks ("exam- ple" → "example")
+- Case-fold and normalize whitespace
+
+Every hash is produced under a scheme of (algorithm, normalization_version).
+The scheme is stored next to each chunk in `document_chunks` so databases
+that contain chunks hashed under older schemes still diff correctly.
+
+Chunks also get a `text_hash`: SHA-256 of the raw, un-normalized text. It
+keys the chunk text store, where texts that differ only in case, quotes or
+ligatures (and so share a chunk hash) must be kept apart.
 """
 
 import hashlib
-import re
 import logging
-from typing import Dict, Any, List
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+SUPPORTED_HASH_ALGORITHMS = ("sha256", "blake2b")
+DEFAULT_HASH_ALGORITHM = "sha256"
+CURRENT_NORMALIZATION_VERSION = 2
+
+# Characters that differ between exports of the same PDF, applied after NFKC
+_V2_TRANSLATION = str.maketrans({
+    # Ligatures NFKC leaves alone
+    "\u00e6": "ae", "\u00c6": "ae", "\u0153": "oe", "\u0152": "oe",
+    # Invisible characters
+    "\u00ad": None, "\u200b": None, "\u200c": None, "\u200d": None, "\u2060": None, "\ufeff": None,
+    # Quotes and primes
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'", "\u2032": "'", "\u00b4": "'",
+    "\u201c": '"', "\u201d": '"', "\u201e": '"', "\u201f": '"', "\u2033": '"', "\u00ab": '"', "\u00bb": '"',
+    # Hyphen and dash variants
+    "\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-", "\u2014": "-", "\u2015": "-", "\u2212": "-",
+})
+
+# Word broken across a line: the chunker has already collapsed the newline to a space.
+# The pattern starts with a literal so the regex engine can skip ahead quickly;
+# the preceding word character is checked in `_dehyphenate`.
+_DEHYPHENATE_RE = re.compile(r"-\s+(?=\w)")
+
+
+def _normalize_v1(text: str) -> str:
+    """Lowercase and collapse whitespace (str.split() splits on exactly the characters regex `\\s` matches)."""
+    return " ".join(text.lower().split())
+
+
+def _dehyphenate(text: str) -> str:
+    """Join words split by a hyphen followed by whitespace."""
+    parts = []
+    last = 0
+    for match in _DEHYPHENATE_RE.finditer(text):
+        start = match.start()
+        if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "_"):
+            parts.append(text[last:start])
+            last = match.end()
+    if not parts:
+        return text
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def _normalize_v2(text: str) -> str:
+    """Unicode-stable normalization: NFKC, ligatures, invisibles, quotes, de-hyphenation, case-fold."""
+    if not text.isascii():
+        # NFKC and the translation table only change non-ASCII characters
+        text = unicodedata.normalize("NFKC", text).translate(_V2_TRANSLATION)
+    if "`" in text:
+        text = text.replace("`", "'")
+    if "-" in text:
+        text = _dehyphenate(text)
+    return " ".join(text.casefold().split())
+
+
+# Normalization pipelines by version — never change a published version,
+# add a new one instead so stored hashes remain reproducible.
+NORMALIZERS: Dict[int, Callable[[str], str]] = {
+    1: _normalize_v1,
+    2: _normalize_v2,
+}
+
+
+def _digest_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _digest_blake2b(data: bytes) -> str:
+    # 32-byte digest keeps the hex length identical to SHA-256
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+DIGESTERS: Dict[str, Callable[[bytes], str]] = {
+    "sha256": _digest_sha256,
+    "blake2b": _digest_blake2b,
+}
+
+
+def text_digest(text: str) -> str:
+    """SHA-256 of the raw chunk text (key of the chunk text store; no normalization)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
 
 class ChunkHasher:
     """Handles chunk content normalization and hashing."""
     
+    def __init__(
+        self,
+        algorithm: str = DEFAULT_HASH_ALGORITHM,
+        normalization_version: int = CURRENT_NORMALIZATION_VERSION,
+        max_workers: int = 1,
+        parallel_threshold: int = 512
+    ):
+        """
+        Initialize chunk hasher.
+        
+        Args:
+            algorithm: Hash algorithm ('sha256' or 'blake2b').
+            normalization_version: Normalization pipeline version to apply before hashing.
+            max_workers: Thread pool size for batched hashing (1, the default,
+                disables the pool; see hash_texts).
+            parallel_threshold: Minimum number of chunks before the thread pool is used.
+        """
+        if algorithm not in DIGESTERS:
+            raise ValueError(
+                f"Unsupported hash algorithm: {algorithm} (supported: {', '.join(SUPPORTED_HASH_ALGORITHMS)})"
+            )
+        if normalization_version not in NORMALIZERS:
+            raise ValueError(f"Unknown normalization version: {normalization_version}")
+        
+        self.algorithm = algorithm
+        self.normalization_version = normalization_version
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        
+        self._normalize = NORMALIZERS[normalization_version]
+        self._digest = DIGESTERS[algorithm]
+    
+    @property
+    def scheme(self) -> Tuple[str, int]:
+        """Hash scheme as (algorithm, normalization_version)."""
+        return self.algorithm, self.normalization_version
+    
     @staticmethod
-    def normalize_text(text: str) -> str:
+    def normalize_text(text: str, version: int = CURRENT_NORMALIZATION_VERSION) -> str:
         """
         Normalize text for consistent hashing.
         
-        Normalization:
-        - Convert to lowercase
-        - Replace multiple whitespace with single space
-        - Strip leading/trailing whitespace
-        
         Args:
             text: Raw text content.
+            version: Normalization pipeline version.
         
         Returns:
             Normalized text.
         """
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Normalize whitespace
-        text = re.sub(r"\s+", " ", text)
-        
-        # Strip
-        text = text.strip()
-        
-        return text
+        return NORMALIZERS[version](text)
     
     @staticmethod
-    def compute_chunk_hash(text: str) -> str:
+    def compute_chunk_hash(
+        text: str,
+        algorithm: str = DEFAULT_HASH_ALGORITHM,
+        normalization_version: int = CURRENT_NORMALIZATION_VERSION
+    ) -> str:
         """
-        Compute SHA256 hash of normalized chunk content.
+        Compute hash of normalized chunk content.
         
         Args:
             text: Chunk text content.
+            algorithm: Hash algorithm ('sha256' or 'blake2b').
+            normalization_version: Normalization pipeline version.
         
         Returns:
-            SHA256 hash as hexadecimal string.
+            Hash as hexadecimal string.
         """
-        normalized = ChunkHasher.normalize_text(text)
-        sha256 = hashlib.sha256()
-        sha256.update(normalized.encode('utf-8'))
-        return sha256.hexdigest()
+        normalized = NORMALIZERS[normalization_version](text)
+        return DIGESTERS[algorithm](normalized.encode('utf-8'))
     
-    @staticmethod
-    def add_hashes_to_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _hash_batch(self, texts: List[str]) -> List[str]:
+        """Hash a batch of texts with the pre-bound normalizer and digester."""
+        normalize = self._normalize
+        digest = self._digest
+        return [digest(normalize(text).encode('utf-8')) for text in texts]
+    
+    def hash_texts(self, texts: List[str]) -> List[str]:
         """
-        Add chunk_hash field to all chunks.
+        Hash many texts, optionally using a thread pool for large batches.
+        
+        The pool rarely helps: normalization is pure Python and holds the GIL,
+        and hashlib only releases it for buffers over 2 KiB, so batches of
+        ordinary chunks hash no faster on 4 threads than on one (see the
+        benchmark below). It is off by default (max_workers=1).
         
         Args:
-            chunks: List of chunk dictionaries with 'chunk_text' field.
+            texts: Chunk texts.
         
         Returns:
-            Chunks with 'chunk_hash' field added.
+            Hashes in the same order as `texts`.
         """
-        for chunk in chunks:
-            chunk_text = chunk.get('chunk_text', '')
-            chunk['chunk_hash'] = ChunkHasher.compute_chunk_hash(chunk_text)
+        if self.max_workers <= 1 or len(texts) < self.parallel_threshold:
+            return self._hash_batch(texts)
+        
+        batch_size = max(1, -(-len(texts) // self.max_workers))
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
         
-        logger.info(f"Computed hashes for {len(chunks)} chunks")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chunk-hash") as executor:
+            results = executor.map(self._hash_batch, batches)
+        
+        return [chunk_hash for batch in results for chunk_hash in batch]
+    
+    def add_hashes_to_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add chunk_hash (and the hash scheme) and text_hash to all chunks in place.
+        
+        Args:
+            chunks: ChunkRecords (or dictionaries) with a 'chunk_text' field.
+        
+        Returns:
+            Chunks with 'chunk_hash', 'hash_algorithm', 'normalization_version'
+            and 'text_hash' set.
+        """
+        texts = [chunk.get('chunk_text', '') for chunk in chunks]
+        hashes = self.hash_texts(texts)
+        
+        for chunk, text, chunk_hash in zip(chunks, texts, hashes):
+            chunk['chunk_hash'] = chunk_hash
+            chunk['hash_algorithm'] = self.algorithm
+            chunk['normalization_version'] = self.normalization_version
+            chunk['text_hash'] = text_digest(text)
+        
+        logger.info(
+            f"Computed {self.algorithm} hashes for {len(chunks)} chunks "
+            f"(normalization v{self.normalization_version})"
+        )
         return chunks
     
+    def translate_legacy_hashes(
+        self,
+        old_chunks: List[Dict[str, Any]],
+        new_chunks: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Re-key old chunk records hashed under a legacy scheme into the current scheme.
+        
+        Old chunks cannot be re-hashed (their text is not stored), so the new
+        chunks are hashed under each legacy scheme instead and matching legacy
+        hashes are replaced by the corresponding current hash. Old records
+        without a match keep their legacy hash and diff as deletions.
+        
+        Args:
+            old_chunks: Chunk records with 'chunk_hash', 'hash_algorithm' and
+                'normalization_version' (updated in place).
+            new_chunks: New chunks with 'chunk_text' and current-scheme 'chunk_hash'.
+        
+        Returns:
+            The old chunk records, with legacy hashes translated where possible.
+        """
+        legacy_schemes = {
+            (c.get('hash_algorithm', DEFAULT_HASH_ALGORITHM), c.get('normalization_version', 1))
+            for c in old_chunks
+        } - {self.scheme}
+        
+        if not legacy_schemes:
+            return old_chunks
+        
+        texts = [chunk.get('chunk_text', '') for chunk in new_chunks]
+        translated = 0
+        
+        for algorithm, version in legacy_schemes:
+            legacy_hasher = ChunkHasher(algorithm, version, self.max_workers, self.parallel_threshold)
+            legacy_to_current: Dict[str, str] = {}
+            for legacy_hash, chunk in zip(legacy_hasher.hash_texts(texts), new_chunks):
+                legacy_to_current.setdefault(legacy_hash, chunk['chunk_hash'])
+            
+            for chunk in old_chunks:
+                if (chunk.get('hash_algorithm'), chunk.get('normalization_version')) != (algorithm, version):
+                    continue
+                current_hash = legacy_to_current.get(chunk['chunk_hash'])
+                if current_hash is not None:
+                    chunk['chunk_hash'] = current_hash
+                    translated += 1
+        
+        logger.info(
+            f"Translated {translated}/{len(old_chunks)} legacy chunk hashes "
+            f"to scheme {self.algorithm}/v{self.normalization_version}"
+        )
+        return old_chunks
+    
     @staticmethod
     def create_hash_map(chunks: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         """
@@ -136,10 +356,116 @@ if __name__ == "__main__":
         {"chunk_text": "Third chunk", "page": 3},
     ]
     
-    chunks_with_hashes = ChunkHasher.add_hashes_to_chunks(test_chunks)
+    chunks_with_hashes = ChunkHasher().add_hashes_to_chunks(test_chunks)
     print(f"\n✅ Added hashes to {len(chunks_with_hashes)} chunks")
     
+    # Variants with the same chunk hash keep distinct text hashes
+    variants = ChunkHasher().add_hashes_to_chunks([{"chunk_text": "Net “Revenue”"}, {"chunk_text": 'NET "revenue"'}])
+    assert variants[0]["chunk_hash"] == variants[1]["chunk_hash"]
+    assert variants[0]["text_hash"] != variants[1]["text_hash"]
+    print("✅ Case/quote variants share a chunk hash but not a text hash")
+    
     hash_map = ChunkHasher.create_hash_map(chunks_with_hashes)
     print(f"✅ Created hash map with {len(hash_map)} entries")
     
+    # Mixed-scheme diff: old version hashed with sha256/v1, new with blake2b/v1
+    old_records = [
+        {
+            "chunk_id": f"doc_v1_chunk{i:03d}",
+            "chunk_hash": ChunkHasher.compute_chunk_hash(c["chunk_text"], "sha256", 1),
+            "hash_algorithm": "sha256",
+            "normalization_version": 1
+        }
+        for i, c in enumerate(test_chunks)
+    ]
+    blake_hasher = ChunkHasher(algorithm="blake2b")
+    new_chunks = blake_hasher.add_hashes_to_chunks([dict(c) for c in test_chunks])
+    translated = blake_hasher.translate_legacy_hashes(old_records, new_chunks)
+    assert [r["chunk_hash"] for r in translated] == [c["chunk_hash"] for c in new_chunks], \
+        "Legacy hashes should translate"
+    print("✅ Legacy sha256 hashes translated to blake2b scheme")
+    
+    # Batched / parallel hashing benchmark (threads give no gain: the GIL is
+    # held during normalization)
+    import re
+    import time
+    
+    bulk_texts = [f"  Chunk {i}:  some   repeated   CONTENT for benchmarking. " * 8 for i in range(50_000)]
+    
+    start = time.perf_counter()
+    baseline = []
+    for text in bulk_texts:
+        normalized = re.sub(r"\s+", " ", text.lower()).strip()
+        baseline.append(hashlib.sha256(normalized.encode('utf-8')).hexdigest())
+    baseline_time = time.perf_counter() - start
+    
+    for algorithm, version, workers in [
+        ("sha256", 1, 1), ("sha256", 1, 4), ("blake2b", 1, 1), ("blake2b", 1, 4), ("blake2b", 2, 4)
+    ]:
+        hasher = ChunkHasher(algorithm, version, max_workers=workers, parallel_threshold=1)
+        start = time.perf_counter()
+        hashes = hasher.hash_texts(bulk_texts)
+        elapsed = time.perf_counter() - start
+        if (algorithm, version) == ("sha256", 1):
+            assert hashes == baseline, "Precompiled path must reproduce legacy hashes"
+        print(
+            f"   {algorithm:8s} v{version} workers={workers}: {elapsed:.3f}s "
+            f"(legacy per-chunk path: {baseline_time:.3f}s)"
+        )
+    
+    # Re-export corpus: the same PDF passage as extracted from different exports
+    # (after the chunker has collapsed newlines). Each pair should hash equal.
+    reexport_corpus = [
+        ("The ﬁnal ﬁgures were ﬂagged for review.",
+         "The final figures were flagged for review."),
+        ("Attention is all you need\u00a0— a new architecture.",
+         "Attention is all you need - a new architecture."),
+        ("We call this \u201cscaled dot-product attention\u201d.",
+         'We call this "scaled dot-product attention".'),
+        ("The model\u2019s encoder maps an input sequence.",
+         "The model's encoder maps an input sequence."),
+        ("Residual connections are em- ployed around each sub-layer.",
+         "Residual connections are employed around each sub-layer."),
+        ("Layer nor\u00admalization follows each residual block.",
+         "Layer normalization follows each residual block."),
+        ("Dropout P\u200bdrop = 0.1 is applied to the output.",
+         "Dropout Pdrop = 0.1 is applied to the output."),
+        ("Training took 3.5 days on eight P100 GPUs\u2026",
+         "Training took 3.5 days on eight P100 GPUs..."),
+        ("Positional encodings use sine and cosine functions of diﬀerent frequencies.",
+         "Positional encodings use sine and cosine functions of different frequencies."),
+        ("Maximum path length is O(n\u00b7d) for self\u2010attention layers.",
+         "Maximum path length is O(n\u00b7d) for self-attention layers."),
+        ("Table 2 summarises the results \u2013 BLEU 28.4 on EN\u2013DE.",
+         "Table 2 summarises the results - BLEU 28.4 on EN-DE."),
+        ("ＢＬＥＵ scores are reported on newstest2014.",
+         "BLEU scores are reported on newstest2014."),
+    ]
+    # Real edits must still be detected
+    genuine_changes = [
+        ("BLEU 28.4 on EN-DE.", "BLEU 41.8 on EN-FR."),
+        ("The encoder has six layers.", "The encoder has eight layers."),
+        ("Dropout is applied to the output.", "Dropout is not applied to the output."),
+    ]
+    
+    print("\nRe-export corpus (false-positive diffs):")
+    for version in sorted(NORMALIZERS):
+        false_positives = sum(
+            ChunkHasher.compute_chunk_hash(a, normalization_version=version)
+            != ChunkHasher.compute_chunk_hash(b, normalization_version=version)
+            for a, b in reexport_corpus
+        )
+        detected = sum(
+            ChunkHasher.compute_chunk_hash(a, normalization_version=version)
+            != ChunkHasher.compute_chunk_hash(b, normalization_version=version)
+            for a, b in genuine_changes
+        )
+        print(
+            f"   normalization v{version}: {false_positives}/{len(reexport_corpus)} spurious changes, "
+            f"{detected}/{len(genuine_changes)} genuine changes detected"
+        )
+        assert detected == len(genuine_changes), "Genuine edits must change the hash"
+        if version == CURRENT_NORMALIZATION_VERSION:
+            assert false_positives == 0, "Re-exports must not register as changed chunks"
+    
     print("\n✅ All tests passed!")
@@ -0,0 +1,236 @@
+"""
+Chunk Record — compact, slotted chunk type carried through the ingestion pipeline.
+
+A ChunkRecord is created once by the Chunker and enriched in place by every
+later stage (filter → hasher → metadata builder), instead of being copied
+into a new dictionary at each step. Conversion to wire/storage formats only
+happens at the boundaries:
+- PineconeManager.upsert_chunks  → ChunkRecord.to_pinecone_record()
+- SQLiteManager.insert_chunk_records → typed document_chunks columns
+
+Mapping-style access (`record["chunk_text"]`, `record.get(...)`) is supported
+so stage code that also handles plain dictionaries (e.g. chunk rows loaded
+from SQLite in IncrementalDiff) works with both.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+class ChunkRecord:
+    """A single chunk and the metadata accumulated for it during ingestion."""
+    
+    __slots__ = (
+        "chunk_text",
+        "page_number",
+        "content_type",
+        "chunk_index",
+        "table_index",
+        "chunk_hash",
+        "hash_algorithm",
+        "normalization_version",
+        "text_hash",
+        "chunk_id",
+        "source",
+        "username",
+        "version",
+        "date",
+    )
+    
+    def __init__(
+        self,
+        chunk_text: str,
+        page_number: int,
+        content_type: str = "text",
+        chunk_index: int = 0,
+        table_index: Optional[int] = None
+    ):
+        """
+        Initialize a chunk record.
+        
+        Args:
+            chunk_text: Chunk content.
+            page_number: Page the chunk was extracted from (1-indexed).
+            content_type: 'text' or 'table'.
+            chunk_index: Position of the chunk within the document.
+            table_index: Index of the table on its page (tables only).
+        """
+        self.chunk_text = chunk_text
+        self.page_number = page_number
+        self.content_type = content_type
+        self.chunk_index = chunk_index
+        self.table_index = table_index
+        
+        # Filled in by ChunkHasher
+        self.chunk_hash = None
+        self.hash_algorithm = None
+        self.normalization_version = None
+        self.text_hash = None  # raw-text digest, key of the chunk text store
+        
+        # Filled in by MetadataBuilder
+        self.chunk_id = None
+        self.source = None
+        self.username = None
+        self.version = None
+        self.date = None
+    
+    # ── Mapping-style access ─────────────────────────────────────────────
+    
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    
+    def __setitem__(self, key: str, value: Any) -> None:
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key) from None
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__ and getattr(self, key) is not None
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a field value, or `default` if the field is unknown or unset."""
+        value = getattr(self, key, None)
+        return default if value is None else value
+    
+    def __repr__(self) -> str:
+        return (
+            f"ChunkRecord(chunk_id={self.chunk_id!r}, chunk_index={self.chunk_index}, "
+            f"page_number={self.page_number}, content_type={self.content_type!r})"
+        )
+    
+    # ── Boundary adapters ────────────────────────────────────────────────
+    
+    def to_pinecone_record(self) -> Dict[str, Any]:
+        """Build the record sent to Pinecone `upsert_records` (integrated embedding)."""
+        record = {
+            "_id": self.chunk_id,
+            "chunk_text": self.chunk_text,
+            "chunk_hash": self.chunk_hash,
+            "source": self.source,
+            "username": self.username,
+            "version": self.version,
+            "page_number": self.page_number,
+            "content_type": self.content_type,
+            "date": self.date,
+        }
+        
+        if self.table_index is not None:
+            record["table_index"] = self.table_index
+        
+        # Numeric copy of the date: Pinecone range filters only apply to numbers
+        if self.date:
+            record["timestamp"] = int(datetime.fromisoformat(self.date).timestamp())
+        
+        return record
+    
+    def to_db_metadata(self) -> Dict[str, Any]:
+        """Return the document-level metadata fields as a dictionary."""
+        return {
+            "filename": self.source,
+            "username": self.username,
+            "version": self.version,
+            "page_number": self.page_number,
+            "content_type": self.content_type,
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return all set fields as a dictionary."""
+        return {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        }
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    import time
+    import tracemalloc
+    from datetime import datetime
+    
+    print("=== Chunk Record Test ===\n")
+    
+    record = ChunkRecord("This is a test chunk.", page_number=1, chunk_index=0)
+    record["chunk_hash"] = "abc123"
+    assert record.get("chunk_hash") == "abc123", "Mapping access should read slots"
+    assert "table_index" not in record, "Unset fields are not contained"
+    assert not hasattr(record, "__dict__"), "Records must not carry a per-instance dict"
+    print(f"✅ {record}")
+    print(f"   Size: {sys.getsizeof(record)} bytes (dict with same keys: "
+          f"{sys.getsizeof(dict.fromkeys(ChunkRecord.__slots__))} bytes)")
+    
+    # Memory benchmark: previous dict-based flow vs. slotted record flow
+    N = 100_000
+    text = "Attention mechanisms draw global dependencies between input and output. " * 6
+    
+    def dict_flow():
+        chunks = [
+            {"chunk_text": text, "page_number": i // 10 + 1, "content_type": "text", "chunk_index": i}
+            for i in range(N)
+        ]
+        for chunk in chunks:
+            chunk["chunk_hash"] = f"{chunk['chunk_index']:064x}"
+        date = datetime.now().isoformat()
+        with_metadata = [
+            {
+                "id": f"doc_v1_chunk{c['chunk_index']:03d}", "chunk_text": c["chunk_text"],
+                "source": "doc.pdf", "username": "alice", "version": 1,
+                "page_number": c["page_number"], "content_type": c["content_type"],
+                "date": date, "chunk_hash": c["chunk_hash"],
+            }
+            for c in chunks
+        ]
+        pinecone_records = [
+            {
+                "_id": c["id"], "chunk_text": c["chunk_text"], "source": c["source"],
+                "username": c["username"], "version": c["version"], "page_number": c["page_number"],
+                "content_type": c["content_type"], "date": c["date"],
+            }
+            for c in with_metadata
+        ]
+        db_records = [
+            {
+                "document_id": 1, "filename": "doc.pdf", "username": "alice", "version": 1,
+                "chunk_id": c["id"], "chunk_hash": c["chunk_hash"], "page_number": c["page_number"],
+                "content_type": c["content_type"], "is_active": True,
+            }
+            for c in with_metadata
+        ]
+        db_params = [
+            json.dumps({k: r[k] for k in ("filename", "username", "version", "page_number", "content_type")})
+            for r in db_records
+        ]
+        return chunks, with_metadata, pinecone_records, db_records, db_params
+    
+    def record_flow(batch_size=96):
+        records = [ChunkRecord(text, i // 10 + 1, "text", i) for i in range(N)]
+        date = datetime.now().isoformat()
+        for r in records:
+            r.chunk_hash = f"{r.chunk_index:064x}"
+            r.chunk_id = f"doc_v1_chunk{r.chunk_index:03d}"
+            r.source, r.username, r.version, r.date = "doc.pdf", "alice", 1, date
+        # Boundary adapters run per upsert batch, so only one batch of dicts is alive
+        for start in range(0, N, batch_size):
+            batch = [r.to_pinecone_record() for r in records[start:start + batch_size]]
+        db_params = [json.dumps(r.to_db_metadata()) for r in records]
+        return records, batch, db_params
+    
+    for name, flow in [("dict flow", dict_flow), ("record flow", record_flow)]:
+        start = time.perf_counter()
+        result = flow()
+        elapsed = time.perf_counter() - start
+        del result
+        
+        tracemalloc.start()
+        result = flow()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        print(f"   {name:12s}: peak {peak / 1024 / 1024:7.1f} MiB, {elapsed:.2f}s for {N:,} chunks")
+    
+    print("\n✅ All tests passed!")
@@ -16,6 +16,8 @@ import re
 import logging
 from typing import List, Dict, Any
 
+from app.ingestion.chunk_record import ChunkRecord
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,7 +42,7 @@ class Chunker:
         self.text_chunk_overlap = text_chunk_overlap
         self.table_chunk_size = table_chunk_size  # Kept for backward compatibility
     
-    def chunk_text(self, pages_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def chunk_text(self, pages_data: List[Dict[str, Any]]) -> List[ChunkRecord]:
         """
         Chunk text content from pages with overlap.
         
@@ -48,51 +50,61 @@ class Chunker:
             pages_data: Pages data from DocumentLoader.
         
         Returns:
-            List of text chunks:
-            [
-                {
-                    "chunk_text": "text content...",
-                    "page_number": 1,
-                    "content_type": "text",
-                    "chunk_index": 0
-                },
-                ...
-            ]
+            List of text ChunkRecords (content_type "text") with
+            chunk_text, page_number and chunk_index set.
         """
         chunks = []
-        chunk_index = 0
         
         for page_data in pages_data:
-            page_num = page_data["page_number"]
-            text = page_data.get("text", "").strip()
-            
-            if not text:
-                continue
-            
-            # Clean text
-            text = self._clean_text(text)
-            
-            # Split text into chunks with overlap
-            page_chunks = self._split_with_overlap(
-                text,
-                self.text_chunk_size,
-                self.text_chunk_overlap
-            )
-            
-            for chunk_text in page_chunks:
-                if chunk_text.strip():
-                    chunks.append({
-                        "chunk_text": chunk_text,
-                        "page_number": page_num,
-                        "content_type": "text",
-                        "chunk_index": chunk_index
-                    })
-                    chunk_index += 1
+            chunks.extend(self.chunk_page(page_data, start_index=len(chunks)))
         
         logger.info(f"Created {len(chunks)} text chunks")
         return chunks
     
-    def chunk_tables(self, table_strings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def chunk_page(self, page_data: Dict[str, Any], start_index: int = 0) -> List[ChunkRecord]:
+        """
+        Chunk the text of a single page.
+        
+        Args:
+            page_data: One page from DocumentLoader.
+            start_index: chunk_index of the page's first chunk (number of text
+                chunks on earlier pages), so streamed pages get the same
+                indexes as chunk_text().
+        
+        Returns:
+            List of text ChunkRecords for the page.
+        """
+        text = page_data.get("text", "").strip()
+        if not text:
+            return []
+        
+        # Clean text
+        text = self._clean_text(text)
+        
+        # Split text into chunks with overlap
+        page_chunks = self._split_with_overlap(
+            text,
+            self.text_chunk_size,
+            self.text_chunk_overlap
+        )
+        
+        chunks = []
+        for chunk_text in page_chunks:
+            if chunk_text.strip():
+                chunks.append(ChunkRecord(
+                    chunk_text=chunk_text,
+                    page_number=page_data["page_number"],
+                    content_type="text",
+                    chunk_index=start_index + len(chunks)
+                ))
+        
+        return chunks
+    
+    def chunk_tables(
+        self,
+        table_strings: List[Dict[str, Any]],
+        start_index: int = 0
+    ) -> List[ChunkRecord]:
         """
         Chunk table content - keeps each table as a single chunk (no splitting).
         
@@ -100,19 +112,12 @@ class Chunker:
         
         Args:
             table_strings: Table strings from DocumentLoader.get_table_strings().
+            start_index: First chunk_index to assign. Pass the number of text
+                chunks so table chunk indexes (and chunk IDs) don't collide with them.
         
         Returns:
-            List of table chunks:
-            [
-                {
-                    "chunk_text": "table content (markdown format)...",
-                    "page_number": 1,
-                    "content_type": "table",
-                    "chunk_index": 0,
-                    "table_index": 0
-                },
-                ...
-            ]
+            List of table ChunkRecords (content_type "table") with
+            chunk_text (markdown), page_number, chunk_index and table_index set.
         """
         chunks = []
         
@@ -125,13 +130,13 @@ class Chunker:
                 continue
             
             # Keep entire table as one chunk regardless of size
-            chunks.append({
-                "chunk_text": table_string,
-                "page_number": page_num,
-                "content_type": "table",
-                "chunk_index": idx,
-                "table_index": table_index
-            })
+            chunks.append(ChunkRecord(
+                chunk_text=table_string,
+                page_number=page_num,
+                content_type="table",
+                chunk_index=start_index + idx,
+                table_index=table_index
+            ))
         
         logger.info(f"Created {len(chunks)} table chunks (each table = 1 chunk)")
         return chunks
@@ -220,8 +225,8 @@ if __name__ == "__main__":
     # Test text chunking
     text_chunks = chunker.chunk_text(test_pages)
     print(f"✅ Created {len(text_chunks)} text chunks")
-    print(f"   First chunk: {text_chunks[0]['chunk_text'][:100]}...")
-    print(f"   Last chunk: {text_chunks[-1]['chunk_text'][:100]}...")
+    print(f"   First chunk: {text_chunks[0].chunk_text[:100]}...")
+    print(f"   Last chunk: {text_chunks[-1].chunk_text[:100]}...")
     
     # Test table chunking
     test_tables = [
@@ -235,6 +240,6 @@ if __name__ == "__main__":
     table_chunks = chunker.chunk_tables(test_tables)
     print(f"\n✅ Created {len(table_chunks)} table chunks")
     if table_chunks:
-        print(f"   Table chunk: {table_chunks[0]['chunk_text']}")
+        print(f"   Table chunk: {table_chunks[0].chunk_text}")
     
     print("\n✅ All tests passed!")
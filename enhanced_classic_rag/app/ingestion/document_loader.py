@@ -5,10 +5,11 @@ Uses PyMuPDF (fitz) to:
 - Extract text from each page
 - Extract tables from each page
 - Maintain page number tracking
+- Stream pages one at a time (iter_pages) for the staged pipeline
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from pathlib import Path
 
 try:
@@ -26,6 +27,45 @@ class DocumentLoader:
         """Initialize document loader."""
         pass
     
+    def iter_pages(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Extract text and tables page by page.
+        
+        Lets the staged ingestion pipeline chunk, hash and upsert early pages
+        while later pages are still being extracted.
+        
+        Args:
+            file_path: Path to the PDF file.
+        
+        Yields:
+            One page data dictionary per page (see load_pdf).
+        """
+        if not Path(file_path).exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        if not file_path.lower().endswith('.pdf'):
+            raise ValueError(f"Only PDF files are supported, got: {file_path}")
+        
+        try:
+            doc = fitz.open(file_path)
+            logger.info(f"Loading PDF: {Path(file_path).name} ({len(doc)} pages)")
+            
+            try:
+                for page_num in range(len(doc)):
+                    page = doc[page_num]
+                    
+                    yield {
+                        "page_number": page_num + 1,  # 1-indexed
+                        "text": page.get_text("text"),
+                        "tables": self._extract_tables(page)
+                    }
+            finally:
+                doc.close()
+        
+        except Exception as e:
+            logger.error(f"Error loading PDF {file_path}: {e}")
+            raise
+    
     def load_pdf(self, file_path: str) -> List[Dict[str, Any]]:
         """
         Load a PDF and extract text and tables from each page.
@@ -50,41 +90,15 @@ class DocumentLoader:
                 ...
             ]
         """
-        if not Path(file_path).exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        if not file_path.lower().endswith('.pdf'):
-            raise ValueError(f"Only PDF files are supported, got: {file_path}")
+        pages_data = list(self.iter_pages(file_path))
+        logger.info(f"Extracted {len(pages_data)} pages from {Path(file_path).name}")
         
-        pages_data = []
-        
-        try:
-            doc = fitz.open(file_path)
-            logger.info(f"Loading PDF: {Path(file_path).name} ({len(doc)} pages)")
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Extract text
-                text = page.get_text("text")
-                
-                # Extract tables
-                tables = self._extract_tables(page)
-                
-                pages_data.append({
-                    "page_number": page_num + 1,  # 1-indexed
-                    "text": text,
-                    "tables": tables
-                })
-            
-            doc.close()
-            logger.info(f"Extracted {len(pages_data)} pages from {Path(file_path).name}")
-            
-            return pages_data
-            
-        except Exception as e:
-            logger.error(f"Error loading PDF {file_path}: {e}")
-            raise
+        return pages_data
+    
+    def page_count(self, file_path: str) -> int:
+        """Number of pages of a PDF (opens the document without extracting anything)."""
+        with fitz.open(file_path) as doc:
+            return len(doc)
     
     def _extract_tables(self, page: fitz.Page) -> List[Dict[str, Any]]:
         """
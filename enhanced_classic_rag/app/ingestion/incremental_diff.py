@@ -5,10 +5,19 @@ Uses set operations to identify:
 - chunks_to_add: New chunks not in old version
 - chunks_to_delete: Old chunks not in new version  
 - unchanged_chunks: Chunks present in both versions
+
+The multiset diff (`compute_multiset_diff`, used by the pipeline) additionally:
+- Keeps repeated identical chunks apart (a hash can occur several times)
+- Aligns the old and new chunk sequences to pair each old chunk with its
+  counterpart, including chunks that moved
+- Emits a fourth class, chunks_to_update: same content but a different page
+  number or chunk index, applied as a metadata update instead of delete + re-embed
 """
 
+import difflib
 import logging
-from typing import Dict, Set, Tuple, List, Any
+from collections import defaultdict, deque
+from typing import Dict, Set, Tuple, List, Any, Iterable
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +57,91 @@ class IncrementalDiff:
         
         return chunks_to_add, chunks_to_delete, unchanged_chunks
     
+    @staticmethod
+    def compute_multiset_diff(
+        old_chunks: List[Dict[str, Any]],
+        new_chunks: List[Dict[str, Any]]
+    ) -> Dict[str, List[Any]]:
+        """
+        Compute a move-aware diff between old and new chunk sequences.
+        
+        Chunks are first aligned in order (longest matching runs of hashes),
+        then any remaining identical hashes are paired as moves. Every old
+        chunk is used at most once, so duplicates are never collapsed.
+        
+        Args:
+            old_chunks: Active chunk records of the previous version, each with
+                'chunk_hash', 'chunk_id', 'chunk_index' and 'page_number'.
+            new_chunks: Hashed chunks of the new version, each with
+                'chunk_hash', 'chunk_index' and 'page_number'.
+        
+        Returns:
+            Dictionary with the structure:
+            {
+                "to_add": [new_chunk, ...],                    # embed + upsert
+                "to_delete": [old_chunk, ...],                 # delete from Pinecone
+                "to_update": [(old_chunk, new_chunk), ...],    # metadata-only update
+                "unchanged": [(old_chunk, new_chunk), ...]     # nothing to do
+            }
+        """
+        old_sorted = sorted(old_chunks, key=lambda c: c['chunk_index'])
+        old_hashes = [c['chunk_hash'] for c in old_sorted]
+        new_hashes = [c['chunk_hash'] for c in new_chunks]
+        
+        matched_old: Set[int] = set()
+        matched_new: Dict[int, int] = {}  # new position -> old position
+        
+        # Pass 1: in-order alignment
+        matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+        for block in matcher.get_matching_blocks():
+            for offset in range(block.size):
+                matched_old.add(block.a + offset)
+                matched_new[block.b + offset] = block.a + offset
+        
+        # Pass 2: pair leftover identical hashes as moves (first-come, in order)
+        leftover_old: Dict[str, deque] = defaultdict(deque)
+        for position, chunk_hash in enumerate(old_hashes):
+            if position not in matched_old:
+                leftover_old[chunk_hash].append(position)
+        
+        to_add = []
+        for position, chunk_hash in enumerate(new_hashes):
+            if position in matched_new:
+                continue
+            if leftover_old[chunk_hash]:
+                old_position = leftover_old[chunk_hash].popleft()
+                matched_old.add(old_position)
+                matched_new[position] = old_position
+            else:
+                to_add.append(new_chunks[position])
+        
+        to_update = []
+        unchanged = []
+        for new_position in sorted(matched_new):
+            old_chunk = old_sorted[matched_new[new_position]]
+            new_chunk = new_chunks[new_position]
+            if (
+                old_chunk.get('page_number') == new_chunk.get('page_number')
+                and old_chunk.get('chunk_index') == new_chunk.get('chunk_index')
+            ):
+                unchanged.append((old_chunk, new_chunk))
+            else:
+                to_update.append((old_chunk, new_chunk))
+        
+        to_delete = [c for position, c in enumerate(old_sorted) if position not in matched_old]
+        
+        logger.info(
+            f"Multiset diff computed: {len(to_add)} to add, {len(to_delete)} to delete, "
+            f"{len(to_update)} metadata-only updates, {len(unchanged)} unchanged"
+        )
+        
+        return {
+            "to_add": to_add,
+            "to_delete": to_delete,
+            "to_update": to_update,
+            "unchanged": unchanged
+        }
+    
     @staticmethod
     def get_chunks_to_process(
         chunks_to_add: Set[str],
@@ -94,27 +188,35 @@ class IncrementalDiff:
     
     @staticmethod
     def create_diff_report(
-        chunks_to_add: Set[str],
-        chunks_to_delete: Set[str],
-        unchanged_chunks: Set[str]
+        chunks_to_add: Iterable[Any],
+        chunks_to_delete: Iterable[Any],
+        unchanged_chunks: Iterable[Any],
+        chunks_to_update: Iterable[Any] = ()
     ) -> Dict[str, Any]:
         """
         Create a summary report of the diff operation.
         
         Args:
-            chunks_to_add: Set of chunk hashes to add.
-            chunks_to_delete: Set of chunk hashes to delete.
-            unchanged_chunks: Set of unchanged chunk hashes.
+            chunks_to_add: Chunk hashes (or chunks) to add.
+            chunks_to_delete: Chunk hashes (or chunks) to delete.
+            unchanged_chunks: Unchanged chunk hashes (or pairs).
+            chunks_to_update: Chunks that only need a metadata update (moved/renumbered).
         
         Returns:
             Dictionary with diff statistics.
         """
-        total_old = len(chunks_to_delete) + len(unchanged_chunks)
-        total_new = len(chunks_to_add) + len(unchanged_chunks)
+        chunks_to_add = list(chunks_to_add)
+        chunks_to_delete = list(chunks_to_delete)
+        unchanged_chunks = list(unchanged_chunks)
+        chunks_to_update = list(chunks_to_update)
+        
+        total_old = len(chunks_to_delete) + len(unchanged_chunks) + len(chunks_to_update)
+        total_new = len(chunks_to_add) + len(unchanged_chunks) + len(chunks_to_update)
         
         return {
             "chunks_to_add": len(chunks_to_add),
             "chunks_to_delete": len(chunks_to_delete),
+            "chunks_to_update": len(chunks_to_update),
             "unchanged_chunks": len(unchanged_chunks),
             "total_old_chunks": total_old,
             "total_new_chunks": total_new,
@@ -174,4 +276,34 @@ if __name__ == "__main__":
     assert len(unchanged) == 2, "Should have 2 unchanged chunks"
     assert len(delete_ids) == 2, "Should have 2 IDs to delete"
     
+    # Multiset, move-aware diff
+    old_chunks = [
+        {"chunk_id": "doc_v1_chunk000", "chunk_hash": "intro", "chunk_index": 0, "page_number": 1},
+        {"chunk_id": "doc_v1_chunk001", "chunk_hash": "disclaimer", "chunk_index": 1, "page_number": 1},
+        {"chunk_id": "doc_v1_chunk002", "chunk_hash": "body", "chunk_index": 2, "page_number": 2},
+        {"chunk_id": "doc_v1_chunk003", "chunk_hash": "disclaimer", "chunk_index": 3, "page_number": 2},
+        {"chunk_id": "doc_v1_chunk004", "chunk_hash": "removed", "chunk_index": 4, "page_number": 3},
+    ]
+    new_chunks = [
+        {"chunk_hash": "intro", "chunk_index": 0, "page_number": 1},
+        {"chunk_hash": "new_section", "chunk_index": 1, "page_number": 1},
+        {"chunk_hash": "disclaimer", "chunk_index": 2, "page_number": 2},
+        {"chunk_hash": "body", "chunk_index": 3, "page_number": 3},
+        {"chunk_hash": "disclaimer", "chunk_index": 4, "page_number": 3},
+        {"chunk_hash": "disclaimer", "chunk_index": 5, "page_number": 3},
+    ]
+    
+    diff = IncrementalDiff.compute_multiset_diff(old_chunks, new_chunks)
+    report = IncrementalDiff.create_diff_report(
+        diff["to_add"], diff["to_delete"], diff["unchanged"], diff["to_update"]
+    )
+    print("\nMultiset Diff Report:")
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    
+    assert [c["chunk_hash"] for c in diff["to_add"]] == ["new_section", "disclaimer"], "Third disclaimer is new"
+    assert [c["chunk_id"] for c in diff["to_delete"]] == ["doc_v1_chunk004"], "Only removed chunk is deleted"
+    assert len(diff["to_update"]) == 3, "Moved chunks should be metadata-only updates"
+    assert len(diff["unchanged"]) == 1, "Intro is unchanged"
+    
     print("\n✅ All tests passed!")
@@ -1,23 +1,24 @@
 """
-Metadata Builder — creates structured metadata for each chunk.
+Metadata Builder — fills structured metadata into each ChunkRecord.
 
-Metadata structure:
+Fields set on the record:
 {
     "source": filename,
     "username": username,
     "version": version,
-    "page_number": page_number,
-    "content_type": "text" | "table",
     "date": ingestion_date,
     "chunk_id": deterministic_id
 }
+(page_number, content_type and chunk_index are set by the Chunker.)
 """
 
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import List, Optional
 from pathlib import Path
 
+from app.ingestion.chunk_record import ChunkRecord
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,98 +56,79 @@ class MetadataBuilder:
     
     @staticmethod
     def build_metadata(
-        chunk: Dict[str, Any],
+        chunk: ChunkRecord,
         filename: str,
         username: str,
         version: int,
         ingestion_date: str = None
-    ) -> Dict[str, Any]:
+    ) -> ChunkRecord:
         """
-        Build complete metadata for a chunk.
+        Fill complete metadata into a chunk record (in place).
         
         Args:
-            chunk: Chunk dictionary with chunk_text, page_number, content_type, chunk_index.
+            chunk: ChunkRecord with chunk_text, page_number, content_type, chunk_index.
             filename: Source filename.
             username: Username (lowercase).
             version: Document version.
             ingestion_date: Date string (ISO format). If None, uses current date.
         
         Returns:
-            Complete chunk dictionary with metadata.
+            The same ChunkRecord with chunk_id, source, username, version and date set.
         """
         if ingestion_date is None:
             ingestion_date = datetime.now().isoformat()
         
-        # Create chunk ID
-        chunk_id = MetadataBuilder.create_chunk_id(
+        chunk.chunk_id = MetadataBuilder.create_chunk_id(
             filename,
             version,
-            chunk["chunk_index"]
+            chunk.chunk_index
         )
+        chunk.source = filename
+        chunk.username = username.lower()
+        chunk.version = version
+        chunk.date = ingestion_date
         
-        # Build complete metadata
-        metadata = {
-            "id": chunk_id,
-            "chunk_text": chunk["chunk_text"],
-            "source": filename,
-            "username": username.lower(),
-            "version": version,
-            "page_number": chunk["page_number"],
-            "content_type": chunk["content_type"],
-            "date": ingestion_date,
-        }
-        
-        # Add optional fields
-        if "chunk_hash" in chunk:
-            metadata["chunk_hash"] = chunk["chunk_hash"]
-        
-        if "table_index" in chunk:
-            metadata["table_index"] = chunk["table_index"]
-        
-        if "sub_chunk_index" in chunk:
-            metadata["sub_chunk_index"] = chunk["sub_chunk_index"]
-        
-        return metadata
+        return chunk
     
     @staticmethod
     def build_all_metadata(
-        chunks: List[Dict[str, Any]],
+        chunks: List[ChunkRecord],
         filename: str,
         username: str,
-        version: int
-    ) -> List[Dict[str, Any]]:
+        version: int,
+        ingestion_date: Optional[str] = None
+    ) -> List[ChunkRecord]:
         """
         Build metadata for all chunks.
         
         Args:
-            chunks: List of chunk dictionaries.
+            chunks: List of ChunkRecords.
             filename: Source filename.
             username: Username.
             version: Document version.
+            ingestion_date: ISO timestamp to stamp on every chunk (defaults to now).
+                Pass one value when a document is built in several batches.
         
         Returns:
-            List of chunks with complete metadata.
+            The same chunks with complete metadata.
         """
-        ingestion_date = datetime.now().isoformat()
-        
-        chunks_with_metadata = []
+        ingestion_date = ingestion_date or datetime.now().isoformat()
         
         for chunk in chunks:
-            metadata = MetadataBuilder.build_metadata(
+            MetadataBuilder.build_metadata(
                 chunk,
                 filename,
                 username,
                 version,
                 ingestion_date
             )
-            chunks_with_metadata.append(metadata)
         
         logger.info(
-            f"Built metadata for {len(chunks_with_metadata)} chunks "
+            f"Built metadata for {len(chunks)} chunks "
             f"(file: {filename}, user: {username}, version: {version})"
         )
         
-        return chunks_with_metadata
+        return chunks
 
 
 if __name__ == "__main__":
@@ -158,12 +140,12 @@ if __name__ == "__main__":
     assert chunk_id == "test_document_v2_chunk005", "Chunk ID format incorrect"
     
     # Test metadata building
-    test_chunk = {
-        "chunk_text": "This is a test chunk.",
-        "page_number": 1,
-        "content_type": "text",
-        "chunk_index": 0
-    }
+    test_chunk = ChunkRecord(
+        chunk_text="This is a test chunk.",
+        page_number=1,
+        content_type="text",
+        chunk_index=0
+    )
     
     metadata = MetadataBuilder.build_metadata(
         test_chunk,
@@ -173,24 +155,14 @@ if __name__ == "__main__":
     )
     
     print(f"\n✅ Metadata created:")
-    for key, value in metadata.items():
+    for key, value in metadata.to_dict().items():
         if key != "chunk_text":
             print(f"   {key}: {value}")
     
     # Test batch metadata building
     test_chunks = [
-        {
-            "chunk_text": "Chunk 1",
-            "page_number": 1,
-            "content_type": "text",
-            "chunk_index": 0
-        },
-        {
-            "chunk_text": "Chunk 2",
-            "page_number": 1,
-            "content_type": "text",
-            "chunk_index": 1
-        },
+        ChunkRecord(chunk_text="Chunk 1", page_number=1, content_type="text", chunk_index=0),
+        ChunkRecord(chunk_text="Chunk 2", page_number=1, content_type="text", chunk_index=1),
     ]
     
     all_metadata = MetadataBuilder.build_all_metadata(
@@ -201,6 +173,6 @@ if __name__ == "__main__":
     )
     
     print(f"\n✅ Built metadata for {len(all_metadata)} chunks")
-    print(f"   IDs: {[m['id'] for m in all_metadata]}")
+    print(f"   IDs: {[m.chunk_id for m in all_metadata]}")
     
     print("\n✅ All tests passed!")
@@ -0,0 +1,410 @@
+"""
+Ingestion Worker — runs API uploads on a background thread pool.
+
+`/ingest` used to call the synchronous `process_document` from inside the
+event loop, so one large upload stalled every concurrent `/chat` and
+`/search` request. Instead the API now:
+1. Spools the upload to UPLOAD_SPOOL_DIR and records a job in `ingestion_jobs`
+2. Submits the job to this worker pool and returns 202 with the job ID
+3. Serves `/jobs/{id}` from the job row (status, stage, progress, result)
+
+Job lifecycle: queued → running → completed | failed. While running, the
+pipeline's progress callback updates stage, page and chunk counters
+(throttled to one write per `update_interval` seconds, plus every stage
+change).
+
+Several worker processes (uvicorn workers) can share the job table. A job
+is claimed atomically (queued → running, with this process as its owner)
+before it runs, and its heartbeat is renewed while it runs (LeaseKeeper).
+`start()` re-queues only running jobs whose heartbeat is older than
+`lease_seconds` (their process died) and submits every queued job whose
+spooled upload still exists; whichever process claims it first runs it. The
+ingestion journal then resumes the interrupted version without re-embedding
+acknowledged batches.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Dict, List, Optional
+
+from app.pipeline.lease import LeaseKeeper, lease_owner
+
+logger = logging.getLogger(__name__)
+
+# Progress reached when a stage starts; counter-driven stages interpolate
+# towards the start of the next one
+STAGE_PROGRESS = {
+    "queued": 0.0,
+    "hashing": 0.02,
+    "ingesting": 0.05,    # new document: extraction and upserts overlap (→ 0.90)
+    "extracting": 0.05,   # update: extraction and hashing (→ 0.60)
+    "upserting": 0.60,    # update: added chunks (→ 0.90)
+    "committing": 0.92,
+    "cleanup": 0.96,
+}
+
+
+def compute_progress(stage: str, counters: Dict[str, int]) -> float:
+    """Estimate job progress (0..1) from the current stage and counters."""
+    start = STAGE_PROGRESS.get(stage, 0.0)
+    
+    if stage in ("ingesting", "extracting") and counters.get("pages_total"):
+        end = 0.90 if stage == "ingesting" else 0.60
+        return start + (end - start) * min(1.0, counters["pages_done"] / counters["pages_total"])
+    
+    if stage == "upserting":
+        total = counters.get("chunks_total", 0)
+        done = min(1.0, counters.get("chunks_upserted", 0) / total) if total else 1.0
+        return start + (0.90 - start) * done
+    
+    return start
+
+
+class _JobProgress:
+    """Progress callback for one job: accumulates counters, writes them throttled."""
+    
+    COUNTERS = ("pages_done", "pages_total", "chunks_upserted", "chunks_total")
+    
+    def __init__(self, db_manager, job_id: str, update_interval: float):
+        self.db_manager = db_manager
+        self.job_id = job_id
+        self.update_interval = update_interval
+        self.stage = "queued"
+        self.counters = {name: 0 for name in self.COUNTERS}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+    
+    def __call__(self, stage: Optional[str] = None, **counters: int) -> None:
+        # Called from pipeline stage threads (e.g. several upsert workers)
+        with self._lock:
+            changed = stage is not None and stage != self.stage
+            if stage is not None:
+                self.stage = stage
+            for name, increment in counters.items():
+                if name in self.counters:
+                    self.counters[name] += increment
+            
+            now = time.monotonic()
+            if not changed and now - self._last_write < self.update_interval:
+                return
+            self._last_write = now
+            fields = dict(
+                self.counters, stage=self.stage, progress=round(compute_progress(self.stage, self.counters), 4)
+            )
+        
+        try:
+            self.db_manager.update_job(self.job_id, **fields)
+        except Exception as e:
+            # Progress is best-effort; never fail the ingestion over it
+            logger.warning(f"Could not update progress of job {self.job_id}: {e}")
+
+
+class IngestionWorker:
+    """Runs ingestion jobs on a thread pool, recording their state in SQLite."""
+    
+    def __init__(
+        self,
+        pipeline,
+        workers: int = 2,
+        spool_dir: str = "uploads",
+        update_interval: float = 0.5,
+        lease_seconds: float = 120.0
+    ):
+        """
+        Initialize worker.
+        
+        Args:
+            pipeline: ProcessingPipeline used by every job (its db_manager stores the jobs).
+            workers: Number of documents ingested concurrently.
+            spool_dir: Directory holding uploads until their job finishes.
+            update_interval: Minimum seconds between progress writes of a job.
+            lease_seconds: Heartbeat age after which a running job's process is
+                considered dead and the job is re-queued.
+        """
+        self.pipeline = pipeline
+        self.db_manager = pipeline.db_manager
+        self.workers = max(1, workers)
+        self.spool_dir = Path(spool_dir)
+        self.update_interval = update_interval
+        self.lease_seconds = lease_seconds
+        self.owner = lease_owner()
+        self.leases = LeaseKeeper(
+            lambda job_ids: self.db_manager.renew_job_leases(job_ids, self.owner),
+            interval_seconds=lease_seconds / 3
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def start(self) -> int:
+        """
+        Start the pool and pick up jobs no live process is working on.
+        
+        Running jobs of other processes keep their owner while it heartbeats;
+        queued jobs are submitted here too, and the first process to claim one
+        runs it.
+        
+        Returns:
+            Number of jobs submitted.
+        """
+        if self._executor is not None:
+            return 0
+        
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        logger.info(f"Ingestion worker started ({self.workers} workers)")
+        
+        stale = self.db_manager.requeue_stale_jobs(self.lease_seconds)
+        if stale:
+            logger.info(f"Re-queued {stale} jobs whose worker stopped heartbeating")
+        
+        requeued = 0
+        for job in self.db_manager.get_unfinished_jobs():
+            if job["status"] != "queued":
+                continue  # running in a live process
+            if os.path.exists(job["file_path"]):
+                self._submit(job["id"])
+                requeued += 1
+            elif self.db_manager.claim_job(job["id"], self.owner):
+                self.db_manager.update_job(
+                    job["id"], status="failed", error="Interrupted by a restart; upload no longer available",
+                    finished_at=datetime.now()
+                )
+        
+        if requeued:
+            logger.info(f"Submitted {requeued} unfinished ingestion jobs")
+        return requeued
+    
+    def stop(self) -> None:
+        """Stop accepting jobs; queued jobs stay 'queued' and are re-queued by the next start()."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def spool(self, content: bytes, suffix: str = ".pdf") -> str:
+        """Write an upload to the spool directory and return its path."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spool_dir / f"{uuid.uuid4().hex}{suffix}"
+        path.write_bytes(content)
+        return str(path)
+    
+    def submit(self, file_path: str, username: str, filename: str) -> str:
+        """
+        Queue a document for ingestion.
+        
+        Args:
+            file_path: Spooled upload (deleted when the job finishes).
+            username: Owner of the document.
+            filename: Original filename recorded for the document.
+        
+        Returns:
+            Job ID.
+        
+        Raises:
+            RuntimeError: If the worker is not started.
+        """
+        if self._executor is None:
+            raise RuntimeError("Ingestion worker is not running")
+        
+        job_id = uuid.uuid4().hex
+        self.db_manager.create_job(job_id, username.lower().strip(), filename, file_path)
+        self._submit(job_id)
+        logger.info(f"Queued ingestion job {job_id}: {filename} (user: {username})")
+        return job_id
+    
+    def _submit(self, job_id: str) -> None:
+        future = self._executor.submit(self._run, job_id)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+    
+    def _forget(self, job_id: str) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+    
+    def _run(self, job_id: str) -> None:
+        if not self.db_manager.claim_job(job_id, self.owner):
+            logger.info(f"Ingestion job {job_id} was claimed by another process")
+            return
+        job = self.db_manager.get_job(job_id)
+        progress = _JobProgress(self.db_manager, job_id, self.update_interval)
+        
+        with self.leases.hold(job_id):
+            try:
+                result = self.pipeline.process_document(
+                    job["file_path"], job["username"], original_filename=job["filename"], progress=progress
+                )
+            except Exception as e:
+                # process_document reports errors in its result; this is a last resort
+                logger.error(f"Ingestion job {job_id} crashed: {e}")
+                result = {"status": "error", "message": str(e)}
+        
+        failed = result.get("status") == "error"
+        self.db_manager.update_job(
+            job_id,
+            status="failed" if failed else "completed",
+            stage="done",
+            progress=round(compute_progress(progress.stage, progress.counters), 4) if failed else 1.0,
+            result=result,
+            error=result.get("message") if failed else None,
+            finished_at=datetime.now()
+        )
+        logger.info(f"Ingestion job {job_id} {'failed' if failed else 'completed'}")
+        
+        try:
+            os.unlink(job["file_path"])
+        except OSError:
+            pass
+    
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a job submitted by this worker finishes; return its record."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.get_job(job_id)
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job record (None if unknown)."""
+        return self.db_manager.get_job(job_id)
+    
+    def list_jobs(self, username: str, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a user's most recent jobs, newest first."""
+        return self.db_manager.list_jobs(username.lower().strip(), limit=limit, status=status)
+    
+    def stats(self) -> Dict[str, int]:
+        """Jobs submitted by this process that have not finished yet."""
+        with self._lock:
+            return {"workers": self.workers, "in_flight": len(self._futures)}
+
+
+if __name__ == "__main__":
+    import asyncio
+    import tempfile
+    import statistics
+    from app.db.sqlite_manager import SQLiteManager
+    
+    print("=== Ingestion Worker Test ===\n")
+    
+    class FakePipeline:
+        """Stands in for ProcessingPipeline: 40 pages of CPU + I/O-like work."""
+        
+        def __init__(self, db_manager, pages=40):
+            self.db_manager = db_manager
+            self.pages = pages
+        
+        def process_document(self, file_path, username, original_filename=None, progress=None):
+            progress = progress or (lambda stage=None, **counters: None)
+            progress("hashing")
+            if b"broken" in Path(file_path).read_bytes():
+                return {"status": "error", "message": "cannot parse", "filename": original_filename}
+            progress("ingesting", pages_total=self.pages)
+            for _ in range(self.pages):
+                sum(i * i for i in range(2000))  # extraction/chunking (holds the GIL briefly)
+                time.sleep(0.01)                  # embedding/upsert round trip
+                progress(pages_done=1, chunks_upserted=5)
+            progress("committing")
+            return {"status": "success", "filename": original_filename, "version": 1, "total_pages": self.pages}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SQLiteManager(os.path.join(tmp, "jobs.db"))
+        pipeline = FakePipeline(manager)
+        worker = IngestionWorker(pipeline, workers=2, spool_dir=os.path.join(tmp, "uploads"), update_interval=0.05)
+        worker.start()
+        
+        # Lifecycle and progress
+        job_id = worker.submit(worker.spool(b"%PDF-report"), "Alice", "report.pdf")
+        seen = set()
+        while True:
+            job = worker.get_job(job_id)
+            seen.add((job["status"], job["stage"]))
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.02)
+        assert job["status"] == "completed" and job["progress"] == 1.0 and job["result"]["version"] == 1
+        assert job["pages_done"] == 40 and not os.path.exists(job["file_path"]), job
+        assert ("running", "ingesting") in seen, seen
+        print(f"✅ Job lifecycle: {sorted(seen)} → {job['status']}")
+        
+        failed = worker.wait(worker.submit(worker.spool(b"%PDF-broken"), "alice", "broken.pdf"))
+        assert failed["status"] == "failed" and failed["error"] == "cannot parse"
+        print(f"✅ Failed job reports its error: {failed['error']}")
+        
+        # Restart: a job left 'running' with its upload still spooled is re-queued
+        manager.create_job("interrupted", "alice", "old.pdf", worker.spool(b"%PDF-old"))
+        manager.update_job("interrupted", status="running", stage="ingesting")
+        manager.create_job("lost", "alice", "lost.pdf", os.path.join(tmp, "missing.pdf"))
+        # ...but a job a live sibling process is running (fresh heartbeat) is not
+        manager.create_job("sibling", "alice", "busy.pdf", worker.spool(b"%PDF-busy"))
+        assert manager.claim_job("sibling", "other-process") and not manager.claim_job("sibling", "late")
+        worker.stop()
+        worker = IngestionWorker(pipeline, workers=2, spool_dir=os.path.join(tmp, "uploads"))
+        assert worker.start() == 1
+        assert worker.wait("interrupted")["status"] == "completed"
+        assert worker.get_job("lost")["status"] == "failed"
+        sibling = worker.get_job("sibling")
+        assert sibling["status"] == "running" and sibling["owner"] == "other-process"
+        print("✅ Restart: interrupted job re-queued, job without upload marked failed, sibling's job left alone")
+        
+        # Two processes submitting the same queued job: only one runs it
+        manager.create_job("shared", "alice", "shared.pdf", worker.spool(b"%PDF-shared"))
+        other = IngestionWorker(pipeline, workers=1, spool_dir=os.path.join(tmp, "uploads"))
+        other.start()
+        worker._submit("shared")
+        other._submit("shared")
+        for w in (worker, other):
+            w.wait("shared")
+        shared = worker.get_job("shared")
+        assert shared["status"] == "completed" and shared["owner"] in (worker.owner, other.owner)
+        other.stop()
+        print("✅ Queued job submitted by two processes is claimed and run once")
+        
+        # Latency of a concurrent request while a 4-document ingestion runs
+        async def chat_latency(duration: float) -> List[float]:
+            latencies = []
+            end = time.perf_counter() + duration
+            while time.perf_counter() < end:
+                start = time.perf_counter()
+                await asyncio.sleep(0.005)  # a /chat request awaiting its LLM call
+                latencies.append((time.perf_counter() - start - 0.005) * 1000)
+            return latencies
+        
+        async def inline_ingest():
+            # Previous behaviour: synchronous pipeline call inside the async endpoint
+            for _ in range(4):
+                await asyncio.sleep(0)
+                pipeline.process_document(worker.spool(b"%PDF-x"), "bob", "big.pdf")
+        
+        async def background_ingest():
+            job_ids = [worker.submit(worker.spool(b"%PDF-x"), "bob", f"big_{i}.pdf") for i in range(4)]
+            while any(worker.get_job(j)["status"] not in ("completed", "failed") for j in job_ids):
+                await asyncio.sleep(0.05)  # client polling /jobs/{id}
+        
+        async def measure(ingest) -> List[float]:
+            ingest_task = asyncio.ensure_future(ingest())
+            latencies = await chat_latency(1.0)
+            await ingest_task
+            return latencies
+        
+        def describe(latencies: List[float]) -> str:
+            ordered = sorted(latencies)
+            return (f"p50 {statistics.median(ordered):6.1f} ms, "
+                    f"p99 {ordered[int(len(ordered) * 0.99) - 1]:6.1f} ms, max {ordered[-1]:6.1f} ms")
+        
+        blocking = asyncio.run(measure(inline_ingest))
+        background = asyncio.run(measure(background_ingest))
+        print(f"   Chat extra latency, ingestion in event loop: {describe(blocking)}")
+        print(f"   Chat extra latency, ingestion on worker pool: {describe(background)}")
+        assert max(background) < max(blocking) / 5, "Worker pool should keep the event loop responsive"
+        print("✅ Event loop stays responsive during background ingestion")
+        
+        worker.stop()
+        manager.close()
+    
+    print("\n✅ All tests passed!")
@@ -4,44 +4,187 @@ Processing Pipeline — orchestrates incremental document ingestion with chunk d
 Flow:
 1. Normalize username and filename
 2. Compute document SHA256 hash
-3. Check for duplicates or existing versions
-4. If new document → Full ingestion
+3. Check for duplicates and allocate the next version atomically
+   (one ingestion per user/filename at a time; identical concurrent uploads coalesce)
+4. If new document → Full ingestion (load → chunk → quality filter → hash → upsert)
 5. If same hash → Mark duplicate, stop
 6. If different hash → Incremental diff
    - Load and chunk document
    - Hash all chunks
-   - Compare with previous version
+   - Compare with previous version (multiset, move-aware)
    - Add new chunks
    - Delete removed chunks
+   - Update metadata of moved chunks (no re-embedding)
    - Skip unchanged chunks
-7. Update database with version tracking
+7. Update database with version tracking (single transaction per ingestion)
+
+Loading, chunking, hashing, metadata and upserts run as concurrent stages
+connected by bounded queues (see StagedPipeline), so the first upsert batches
+are in flight while later pages are still being extracted. Each result carries
+per-stage busy time and queue depth in 'stage_metrics'.
+
+Chunk text store: chunk text is stored locally, compressed, once per distinct
+text (ChunkTextStore) before the chunk is upserted. Vector searches then
+request hits without 'chunk_text' and the text is hydrated from the store in
+one batched read; reembed() re-upserts active chunks from the stored text.
+expand_context() widens hits to their neighbouring chunks from the same
+store (ContextExpander) before generation, without further vector queries.
+
+Rerank cache: reranked results are cached in SQLite (RerankCache), shared
+by every worker and keyed by normalized query, namespace, model and request
+or candidate set. Every write to a namespace's vectors (upsert batches,
+post-commit deletions and moves, rollbacks, re-embedding) bumps the
+namespace's generation, which invalidates its cached results.
+
+Lexical index: the same commit transactions mirror added, removed and
+retained chunks into the FTS5 index (LexicalIndex; one contentless table per
+namespace, reading text from the chunk text store), so hybrid search (dense
++ BM25, reciprocal-rank fusion) always sees the active versions.
+
+Progress: process_document() accepts a callback that receives the current
+stage ('hashing', 'ingesting', 'extracting', 'upserting', 'committing',
+'cleanup') and counter increments (pages_total, pages_done, chunks_total,
+chunks_upserted); the IngestionWorker turns these into job status.
+
+Crash safety: every upsert batch is written to the ingestion journal before it
+is sent and acknowledged after Pinecone accepts it. Deletions and moves of
+an incremental update are journaled in the commit transaction and applied
+after it. If the process dies mid-ingestion:
+- Re-uploading the same file resumes the 'processing' version and skips every
+  acknowledged batch (no re-embedding)
+- Uploading a different file rolls the dead version back first
+
+A version is only treated as dead once its lease expired: the process
+ingesting it renews a heartbeat on its row (LeaseKeeper) every third of
+INGESTION_LEASE_SECONDS. Uploads of a file another process (uvicorn worker,
+bulk ingest) is still ingesting are rejected as in progress.
+- recover_incomplete_ingestions() (run at API startup) finishes committed
+  versions' pending deletions and rolls back versions idle for
+  JOURNAL_RESUME_HOURS
 """
 
+import asyncio
 import logging
 import os
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 
 from app.core.config import settings
 from app.db.sqlite_manager import SQLiteManager
+from app.db.chunk_text_store import ChunkTextStore
 from app.ingestion.hash_manager import HashManager
 from app.ingestion.document_loader import DocumentLoader
 from app.ingestion.chunker import Chunker
+from app.ingestion.chunk_filter import ChunkFilter
 from app.ingestion.chunk_hasher import ChunkHasher
+from app.ingestion.chunk_record import ChunkRecord
 from app.ingestion.incremental_diff import IncrementalDiff
 from app.ingestion.metadata_builder import MetadataBuilder
-from app.vectorstore.pinecone_manager import PineconeManager
+from app.pipeline.lease import LeaseKeeper, lease_owner
+from app.pipeline.single_flight import SingleFlight
+from app.pipeline.staged import Stage, StagedPipeline
+from app.retrieval.context_window import ContextExpander
+from app.retrieval.hybrid import HybridRetriever
+from app.retrieval.lexical_index import LexicalIndex
+from app.vectorstore.base import VectorStore, create_vector_store
+from app.vectorstore.batch_executor import raise_on_failure
+from app.vectorstore.rerank_cache import RerankCache
 
 logger = logging.getLogger(__name__)
 
+ProgressCallback = Callable[..., None]
+
+
+def _no_progress(stage: Optional[str] = None, **counters: int) -> None:
+    pass
+
+
+class _ChunkStream:
+    """
+    State of the streaming chunk stage for one ingestion.
+    
+    Chunks and filters one page at a time and emits fixed-size batches. Table
+    chunks are emitted at the end because their indexes start after the last
+    text chunk, which keeps chunk IDs identical to whole-document chunking.
+    """
+    
+    def __init__(
+        self,
+        pipeline: "ProcessingPipeline",
+        batch_size: int,
+        progress: ProgressCallback = _no_progress
+    ):
+        self.chunker = pipeline.chunker
+        self.chunk_filter = pipeline.chunk_filter
+        self.document_loader = pipeline.document_loader
+        self.batch_size = batch_size
+        self.progress = progress
+        self.filter_stats = self.chunk_filter.empty_stats()
+        self.pages = 0
+        self.text_chunks = 0       # before filtering (next text chunk_index)
+        self.kept_text_chunks = 0
+        self.table_chunks = 0
+        self._table_strings: List[Dict[str, Any]] = []
+        self._batch: List[ChunkRecord] = []
+    
+    def _add(self, chunks: List[ChunkRecord]) -> List[List[ChunkRecord]]:
+        """Buffer chunks and return every batch that filled up."""
+        batches = []
+        for chunk in chunks:
+            self._batch.append(chunk)
+            if len(self._batch) >= self.batch_size:
+                batches.append(self._batch)
+                self._batch = []
+        return batches
+    
+    def chunk_page(self, page_data: Dict[str, Any]) -> List[List[ChunkRecord]]:
+        """Chunk and filter one page; return the batches it completed."""
+        self.pages += 1
+        text_chunks = self.chunker.chunk_page(page_data, start_index=self.text_chunks)
+        self.text_chunks += len(text_chunks)
+        
+        # Drop or merge low-information chunks before they are hashed and embedded
+        kept = self.chunk_filter.filter_page(text_chunks, self.filter_stats)
+        self.kept_text_chunks += len(kept)
+        
+        self._table_strings.extend(self.document_loader.get_table_strings([page_data]))
+        self.progress(pages_done=1)
+        return self._add(kept)
+    
+    def flush(self) -> List[List[ChunkRecord]]:
+        """Chunk the buffered tables and return the remaining batches."""
+        logger.info(f"Created {self.text_chunks} text chunks")
+        if self.chunk_filter.enabled:
+            self.chunk_filter.log_stats(self.filter_stats)
+        
+        table_chunks = self.chunker.chunk_tables(self._table_strings, start_index=self.text_chunks)
+        self.table_chunks = len(table_chunks)
+        
+        batches = self._add(table_chunks)
+        if self._batch:
+            batches.append(self._batch)
+            self._batch = []
+        return batches
+
 
 class ProcessingPipeline:
     """Orchestrates incremental document processing with chunk-level diffing."""
     
-    def __init__(self):
-        """Initialize pipeline with all required components."""
+    def __init__(self, vector_store: Optional[VectorStore] = None):
+        """
+        Initialize pipeline with all required components.
+        
+        Args:
+            vector_store: Vector store to use (defaults to create_vector_store(),
+                i.e. settings.VECTOR_STORE).
+        """
         # Initialize components
-        self.db_manager = SQLiteManager(settings.SQLITE_DB_PATH)
+        self.db_manager = SQLiteManager(
+            settings.SQLITE_DB_PATH,
+            busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+            cache_size_kb=settings.SQLITE_CACHE_SIZE_KB
+        )
         self.hash_manager = HashManager()
         self.document_loader = DocumentLoader()
         self.chunker = Chunker(
@@ -49,16 +192,71 @@ class ProcessingPipeline:
             text_chunk_overlap=settings.TEXT_CHUNK_OVERLAP,
             table_chunk_size=settings.TABLE_CHUNK_SIZE
         )
-        self.chunk_hasher = ChunkHasher()
+        self.chunk_filter = ChunkFilter(
+            enabled=settings.CHUNK_FILTER_ENABLED,
+            mode=settings.CHUNK_FILTER_MODE,
+            min_words=settings.CHUNK_MIN_WORDS,
+            min_alpha_ratio=settings.CHUNK_MIN_ALPHA_RATIO,
+            min_token_entropy=settings.CHUNK_MIN_TOKEN_ENTROPY,
+            min_entropy_tokens=settings.CHUNK_ENTROPY_MIN_TOKENS,
+            max_dot_leader_ratio=settings.CHUNK_MAX_DOT_LEADER_RATIO
+        )
+        self.chunk_hasher = ChunkHasher(
+            algorithm=settings.CHUNK_HASH_ALGORITHM,
+            normalization_version=settings.CHUNK_NORMALIZATION_VERSION,
+            max_workers=settings.CHUNK_HASH_WORKERS,
+            parallel_threshold=settings.CHUNK_HASH_PARALLEL_THRESHOLD
+        )
         self.incremental_diff = IncrementalDiff()
         self.metadata_builder = MetadataBuilder()
-        self.pinecone_manager = PineconeManager(
-            api_key=settings.PINECONE_API_KEY,
-            index_name=settings.PINECONE_INDEX_NAME,
-            cloud=settings.PINECONE_CLOUD,
-            region=settings.PINECONE_REGION,
-            embedding_model=settings.EMBEDDING_MODEL,
-            batch_size=settings.UPSERT_BATCH_SIZE
+        # Pinecone, or an offline stand-in (VECTOR_STORE=fake|record|replay)
+        self.vector_store = vector_store if vector_store is not None else create_vector_store()
+        # Compressed chunk text by hash; search hits are hydrated from it
+        self.text_store = (
+            ChunkTextStore(self.db_manager, codec=settings.CHUNK_TEXT_CODEC, level=settings.CHUNK_TEXT_LEVEL)
+            if settings.CHUNK_TEXT_STORE_ENABLED else None
+        )
+        # Neighbour-window expansion of hits before generation (reads the text store)
+        self.context_expander = (
+            ContextExpander(
+                self.db_manager,
+                self.text_store,
+                window=settings.CONTEXT_WINDOW,
+                token_budget=settings.CONTEXT_TOKEN_BUDGET,
+                max_overlap=settings.TEXT_CHUNK_OVERLAP
+            )
+            if self.text_store else None
+        )
+        # FTS5 index of active chunks, written in the same transactions as the chunk metadata
+        # (contentless: it reads chunk text from the text store)
+        if settings.LEXICAL_INDEX_ENABLED and self.text_store is None:
+            logger.warning("Lexical index disabled: it needs the chunk text store (CHUNK_TEXT_STORE_ENABLED=false)")
+        self.lexical_index = (
+            LexicalIndex(self.db_manager, self.text_store)
+            if settings.LEXICAL_INDEX_ENABLED and self.text_store else None
+        )
+        self.hybrid_retriever = (
+            HybridRetriever(self.vector_store, self.lexical_index, rrf_k=settings.HYBRID_RRF_K)
+            if self.lexical_index else None
+        )
+        # Reranked results shared across workers; invalidated by namespace generations
+        self.rerank_cache = (
+            RerankCache(
+                self.db_manager,
+                settings.RERANKER_MODEL,
+                max_entries=settings.RERANK_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.RERANK_CACHE_TTL_SECONDS,
+                settle_seconds=settings.RERANK_CACHE_SETTLE_SECONDS
+            )
+            if settings.RERANK_CACHE_ENABLED else None
+        )
+        # Serializes ingestions per (username, filename); coalesces identical concurrent uploads
+        self.single_flight = SingleFlight()
+        # Cross-process ownership of 'processing' versions (other workers, bulk ingest)
+        self.lease_owner = lease_owner()
+        self.leases = LeaseKeeper(
+            lambda doc_ids: self.db_manager.renew_document_leases(doc_ids, self.lease_owner),
+            interval_seconds=settings.INGESTION_LEASE_SECONDS / 3
         )
         
         logger.info("Processing pipeline initialized with incremental diff support")
@@ -67,7 +265,8 @@ class ProcessingPipeline:
         self,
         file_path: str,
         username: str,
-        original_filename: Optional[str] = None
+        original_filename: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """
         Process a document with incremental diff support.
@@ -75,6 +274,9 @@ class ProcessingPipeline:
         Args:
             file_path: Path to the document file.
             username: Username who uploaded the document.
+            original_filename: Name to record instead of the file's own name.
+            progress: Called as progress(stage=None, **counter_increments) while
+                      the document is processed (see module docstring).
         
         Returns:
             Processing result dictionary with status and details.
@@ -90,34 +292,27 @@ class ProcessingPipeline:
             filename = Path(file_path).name.strip()
         
         logger.info(f"Starting processing for {filename} (user: {username})")
+        progress = progress or _no_progress
         
         try:
             # Step 2: Compute document hash
             logger.info("Computing document hash...")
+            progress("hashing")
             document_hash = self.hash_manager.compute_hash(file_path)
             logger.info(f"Document hash: {document_hash}")
             
-            # Step 3: Query latest document version
-            logger.info("Checking for existing versions...")
-            latest_doc = self.db_manager.get_latest_document(filename, username)
-            
-            # Determine processing path
-            if latest_doc is None:
-                # Case 1: New document
-                logger.info("New document detected - full ingestion")
-                return self._process_new_document(file_path, filename, username, document_hash)
+            # Steps 3-6 run once per (username, filename) at a time
+            result, shared = self.single_flight.run(
+                (username, filename),
+                document_hash,
+                lambda: self._ingest(file_path, filename, username, document_hash, progress)
+            )
             
-            elif latest_doc['document_hash'] == document_hash:
-                # Case 2: Same hash - duplicate
-                logger.warning(f"Duplicate detected: {filename} (v{latest_doc['version']})")
-                return self._handle_duplicate(filename, username, latest_doc)
+            if shared:
+                logger.info(f"Coalesced with concurrent identical upload of {filename}")
+                result = dict(result, coalesced=True)
             
-            else:
-                # Case 3: Different hash - incremental update
-                logger.info(f"Document updated detected - incremental diff (old v{latest_doc['version']})")
-                return self._process_incremental_update(
-                    file_path, filename, username, document_hash, latest_doc
-                )
+            return result
             
         except Exception as e:
             logger.error(f"Error processing document: {e}")
@@ -128,79 +323,331 @@ class ProcessingPipeline:
                 "username": username
             }
     
-    def _process_new_document(
+    def _ingest(
         self,
         file_path: str,
         filename: str,
         username: str,
-        document_hash: str
+        document_hash: str,
+        progress: ProgressCallback = _no_progress
     ) -> Dict[str, Any]:
-        """Process a brand new document (version 1)."""
-        version = 1
-        
-        # Insert document record
-        doc_id = self.db_manager.insert_document(
-            filename=filename,
-            username=username,
-            document_hash=document_hash,
-            version=version,
-            status="processing",
-            is_active=True
+        """Run the duplicate check, allocate a version and dispatch to the processing path."""
+        # Step 3: Atomically check for duplicates and reserve the next version
+        logger.info("Checking for existing versions...")
+        allocation = self.db_manager.allocate_version(
+            filename, username, document_hash, resume_abandoned=True,
+            lease_owner=self.lease_owner, lease_seconds=settings.INGESTION_LEASE_SECONDS
         )
+        if allocation["action"] == "in_progress":
+            logger.warning(f"{filename} v{allocation['version']} is being ingested by another process")
+            return {
+                "status": "error",
+                "message": (
+                    f"{filename} (v{allocation['version']}) is already being ingested by another process; "
+                    "upload it again once that ingestion has finished"
+                ),
+                "in_progress": True,
+                "filename": filename,
+                "username": username
+            }
+        
+        with self.leases.hold(allocation["doc_id"]):
+            return self._dispatch(file_path, filename, username, allocation, progress)
+    
+    def _dispatch(
+        self,
+        file_path: str,
+        filename: str,
+        username: str,
+        allocation: Dict[str, Any],
+        progress: ProgressCallback = _no_progress
+    ) -> Dict[str, Any]:
+        """Roll back an abandoned version, then run the processing path of an allocation."""
+        latest_doc = allocation["latest"]
+        
+        # An ingestion of another version of this file died: remove its vectors first
+        if allocation["abandoned"] is not None:
+            logger.warning(f"Rolling back interrupted ingestion (document {allocation['abandoned']['id']})")
+            self._rollback_document(allocation["abandoned"])
+        
+        # Same file as an interrupted ingestion: resume it, skipping acknowledged batches
+        acked = {}
+        if allocation["action"] == "resume":
+            acked = self.db_manager.get_acked_upserts(allocation["doc_id"])
+            logger.info(
+                f"Resuming interrupted ingestion of {filename} v{allocation['version']} "
+                f"({len(acked)} chunks already upserted)"
+            )
+        
+        # Determine processing path
+        if allocation["action"] == "new" or (allocation["action"] == "resume" and latest_doc is None):
+            # Case 1: New document
+            logger.info("New document detected - full ingestion")
+            return self._process_new_document(
+                file_path, filename, username, allocation["doc_id"], allocation["version"], acked, progress
+            )
+        
+        elif allocation["action"] == "duplicate":
+            # Case 2: Same hash - duplicate
+            logger.warning(f"Duplicate detected: {filename} (v{latest_doc['version']})")
+            return self._handle_duplicate(filename, username, latest_doc, allocation["doc_id"])
         
+        else:
+            # Case 3: Different hash - incremental update
+            logger.info(f"Document updated detected - incremental diff (old v{latest_doc['version']})")
+            return self._process_incremental_update(
+                file_path, filename, username, latest_doc, allocation["doc_id"], allocation["version"],
+                acked, progress
+            )
+    
+    def _extraction_stages(self, stream: _ChunkStream) -> List[Stage]:
+        """Stages shared by both ingestion paths: chunk + filter → hash."""
+        return [
+            Stage("chunk", stream.chunk_page, flat=True, flush=stream.flush),
+            Stage("hash", self.chunk_hasher.add_hashes_to_chunks),
+        ]
+    
+    def _upsert_stages(
+        self,
+        filename: str,
+        username: str,
+        version: int,
+        doc_id: int,
+        acked: Dict[str, str],
+        progress: ProgressCallback = _no_progress
+    ) -> List[Stage]:
+        """
+        Stages that stamp metadata on chunk batches and upsert them to Pinecone.
+        
+        Each batch is journaled before the upsert and acknowledged after it;
+        chunks acknowledged by an earlier, interrupted attempt (same chunk ID
+        and hash in `acked`) are not sent again.
+        """
+        ingestion_date = self._version_date(doc_id)
+        
+        def upsert(batch: List[ChunkRecord]) -> List[ChunkRecord]:
+            # Text first, so a chunk is never searchable without it
+            if self.text_store:
+                self.text_store.put_chunks(batch)
+            pending = [chunk for chunk in batch if acked.get(chunk.chunk_id) != chunk.chunk_hash]
+            if pending:
+                self.db_manager.journal_plan(
+                    doc_id, "upsert", [(c.chunk_id, c.chunk_hash, c.page_number) for c in pending]
+                )
+                self.vector_store.upsert_chunks(pending, username)
+                self.db_manager.journal_ack(doc_id, "upsert", [c.chunk_id for c in pending])
+                self._namespace_written(username)
+            progress(chunks_upserted=len(batch))
+            return batch
+        
+        return [
+            Stage(
+                "metadata",
+                lambda batch: self.metadata_builder.build_all_metadata(
+                    batch, filename, username, version, ingestion_date
+                )
+            ),
+            Stage("upsert", upsert, workers=settings.PIPELINE_UPSERT_WORKERS),
+        ]
+    
+    def _version_date(self, doc_id: int) -> str:
+        """
+        Ingestion date stamped on the chunks a document version adds (its upload time).
+        
+        Chunks re-sent by a resumed attempt carry the same date, which is also
+        the `uploaded_at` that date filters are resolved against.
+        """
+        return datetime.fromisoformat(str(self.db_manager.get_document(doc_id)["uploaded_at"])).isoformat()
+    
+    def _namespace_written(self, username: str) -> None:
+        """Bump a namespace's generation after a write to its vectors (cached reranks become stale)."""
+        if self.rerank_cache:
+            self.rerank_cache.invalidate(username)
+        else:
+            self.db_manager.bump_namespace_generation(username)
+    
+    def _count_resumed(self, chunks: List[ChunkRecord], acked: Dict[str, str]) -> int:
+        return sum(1 for chunk in chunks if acked.get(chunk.chunk_id) == chunk.chunk_hash)
+    
+    def _rollback_document(self, doc: Dict) -> int:
+        """
+        Undo an uncommitted ingestion: mark it failed and delete its journaled vectors.
+        
+        The failed status is written first, so if Pinecone is unreachable the
+        journal is kept and the recovery sweep retries the deletion.
+        
+        Returns:
+            Number of vectors deleted.
+        """
+        self.db_manager.update_status(doc["id"], "failed")
+        chunk_ids = [entry["chunk_id"] for entry in self.db_manager.get_journal_entries(doc["id"], op="upsert")]
+        
+        deleted = 0
+        if chunk_ids:
+            logger.info(f"Rolling back {len(chunk_ids)} upserted chunks of document {doc['id']}...")
+            deleted = self.vector_store.delete_chunks(chunk_ids, doc["username"])
+            self._namespace_written(doc["username"])
+        
+        self.db_manager.clear_journal(doc["id"])
+        return deleted
+    
+    def _abort_ingestion(self, doc_id: int, username: str) -> None:
+        """Roll back a failed ingestion; if that fails too, leave it to the recovery sweep."""
+        try:
+            self._rollback_document({"id": doc_id, "username": username})
+        except Exception as e:
+            logger.error(f"Rollback of document {doc_id} failed (left for recovery): {e}")
+    
+    def _apply_post_commit(self, doc_id: int, username: str) -> int:
+        """
+        Apply the journaled deletions and moves of a committed version.
+        
+        Only chunks that moved to another page are updated (their page
+        number); unchanged chunks keep the version and date they were
+        embedded with, and version/date filters are resolved from the
+        metadata database instead (see search_filter.resolve_filter).
+        Delete and update batches run concurrently (VectorStore.execute_batches)
+        and each batch is acknowledged in the journal as soon as it succeeds.
+        Both operations are idempotent, so a batch that was sent but not
+        acknowledged before a crash (or that failed) is simply sent again by the
+        recovery sweep.
+        
+        Returns:
+            Number of chunks deleted from Pinecone.
+        
+        Raises:
+            RuntimeError: If a batch still fails after retries (journal is kept).
+        """
+        pending = self.db_manager.get_journal_entries(doc_id, acked=False)
+        deletes = [entry["chunk_id"] for entry in pending if entry["op"] == "delete"]
+        moves = [entry for entry in pending if entry["op"] == "update"]
+        
+        if deletes or moves:
+            logger.info(f"Deleting {len(deletes)} removed chunks, updating metadata for {len(moves)} moved chunks...")
+        report = self.vector_store.execute_batches(
+            username,
+            deletes=deletes,
+            updates=[{"id": entry["chunk_id"], "page_number": entry["page_number"]} for entry in moves],
+            on_success=lambda result: self.db_manager.journal_ack(doc_id, result["op"], result["ids"])
+        )
+        if deletes or moves:
+            self._namespace_written(username)
+        if report["failed_batches"]:
+            raise RuntimeError(f"{report['failed_batches']} delete/update batches failed ({report['errors'][0]})")
+        
+        self.db_manager.clear_journal(doc_id)
+        return report["delete"]
+    
+    def recover_incomplete_ingestions(self, stale_after_hours: Optional[float] = None) -> Dict[str, int]:
+        """
+        Startup sweep: reconcile or roll back ingestions interrupted by a crash.
+        
+        - Processed versions with pending journal entries: finish their
+          deletions/moves (roll forward)
+        - 'processing' versions idle for `stale_after_hours`, and failed versions
+          whose rollback did not finish: delete their vectors (roll back)
+        - Other 'processing' versions are left for resumption on re-upload
+        - Versions another process holds a live lease on are still being
+          ingested and are left alone
+        
+        Safe to run while other processes ingest (API startup of each worker,
+        `python main.py recover`).
+        
+        Args:
+            stale_after_hours: Override settings.JOURNAL_RESUME_HOURS.
+        
+        Returns:
+            Dictionary with 'rolled_forward', 'rolled_back', 'resumable',
+            'in_progress' and 'errors' counts.
+        """
+        if stale_after_hours is None:
+            stale_after_hours = settings.JOURNAL_RESUME_HOURS
+        
+        report = {"rolled_forward": 0, "rolled_back": 0, "resumable": 0, "in_progress": 0, "errors": 0}
+        
+        candidates = self.db_manager.get_recovery_candidates(stale_after_hours, settings.INGESTION_LEASE_SECONDS)
+        for doc in candidates:
+            try:
+                if doc["leased"] and doc["lease_owner"] != self.lease_owner:
+                    report["in_progress"] += 1
+                elif doc["status"] == "processed":
+                    self._apply_post_commit(doc["id"], doc["username"])
+                    report["rolled_forward"] += 1
+                elif doc["status"] == "processing" and not doc["stale"]:
+                    logger.info(
+                        f"Resumable: {doc['filename']} v{doc['version']} for '{doc['username']}' "
+                        f"({doc['acked_upserts']} chunks upserted)"
+                    )
+                    report["resumable"] += 1
+                else:
+                    self._rollback_document(doc)
+                    report["rolled_back"] += 1
+            except Exception as e:
+                logger.error(f"Recovery of document {doc['id']} failed: {e}")
+                report["errors"] += 1
+        
+        logger.info(
+            f"✅ Recovery sweep: {report['rolled_forward']} rolled forward, "
+            f"{report['rolled_back']} rolled back, {report['resumable']} resumable, "
+            f"{report['in_progress']} in progress elsewhere"
+        )
+        return report
+    
+    @staticmethod
+    def _collect(batches: List[List[ChunkRecord]]) -> List[ChunkRecord]:
+        """Flatten stage output back into document order."""
+        return sorted((chunk for batch in batches for chunk in batch), key=lambda c: c.chunk_index)
+    
+    def _process_new_document(
+        self,
+        file_path: str,
+        filename: str,
+        username: str,
+        doc_id: int,
+        version: int,
+        acked: Optional[Dict[str, str]] = None,
+        progress: ProgressCallback = _no_progress
+    ) -> Dict[str, Any]:
+        """
+        Process a brand new document (document row already allocated).
+        
+        `acked` maps chunk IDs to hashes already upserted by an interrupted attempt.
+        """
+        acked = acked or {}
         try:
             # Ensure namespace exists
-            self.pinecone_manager.ensure_namespace_exists(username)
+            self.vector_store.ensure_namespace_exists(username)
             
-            # Load and chunk document
-            logger.info("Loading document...")
-            pages_data = self.document_loader.load_pdf(file_path)
-            table_strings = self.document_loader.get_table_strings(pages_data)
-            
-            logger.info("Chunking content...")
-            text_chunks = self.chunker.chunk_text(pages_data)
-            table_chunks = self.chunker.chunk_tables(table_strings)
-            all_chunks = text_chunks + table_chunks
+            # Load → chunk → hash → metadata → upsert, all stages overlapping
+            logger.info("Loading, chunking and upserting document (staged)...")
+            progress("ingesting", pages_total=self.document_loader.page_count(file_path))
+            stream = _ChunkStream(self, settings.UPSERT_BATCH_SIZE, progress)
+            staged = StagedPipeline(
+                self._extraction_stages(stream)
+                + self._upsert_stages(filename, username, version, doc_id, acked, progress),
+                queue_size=settings.PIPELINE_QUEUE_SIZE
+            )
+            chunks_with_metadata = self._collect(staged.run(self.document_loader.iter_pages(file_path)))
+            logger.info(f"Stage timings: {staged.summary()}")
             
-            if not all_chunks:
+            if not chunks_with_metadata:
                 raise ValueError("No chunks created from document")
             
-            logger.info(f"Created {len(all_chunks)} chunks ({len(text_chunks)} text, {len(table_chunks)} table)")
-            
-            # Add chunk hashes
-            logger.info("Computing chunk hashes...")
-            all_chunks = self.chunk_hasher.add_hashes_to_chunks(all_chunks)
-            
-            # Build metadata
-            logger.info("Building metadata...")
-            chunks_with_metadata = self.metadata_builder.build_all_metadata(
-                all_chunks, filename, username, version
+            upserted_count = len(chunks_with_metadata)
+            logger.info(
+                f"Created {upserted_count} chunks "
+                f"({stream.kept_text_chunks} text, {stream.table_chunks} table)"
             )
             
-            # Upsert to Pinecone
-            logger.info("Upserting to Pinecone...")
-            upserted_count = self.pinecone_manager.upsert_chunks(chunks_with_metadata, username)
-            
-            # Insert chunks to database
+            # Insert chunks, mark processed and retire the journal in one transaction
             logger.info("Saving chunks to database...")
-            chunk_records = []
-            for chunk in chunks_with_metadata:
-                chunk_records.append({
-                    'document_id': doc_id,
-                    'filename': filename,
-                    'username': username,
-                    'version': version,
-                    'chunk_id': chunk['id'],
-                    'chunk_hash': chunk['chunk_hash'],
-                    'page_number': chunk['page_number'],
-                    'content_type': chunk['content_type'],
-                    'is_active': True
-                })
-            
-            self.db_manager.insert_chunks_batch(chunk_records)
-            
-            # Update status
-            self.db_manager.update_status(doc_id, "processed")
+            progress("committing")
+            with self.db_manager.transaction():
+                self.db_manager.insert_chunk_records(doc_id, chunks_with_metadata)
+                if self.lexical_index:
+                    self.lexical_index.add_chunks(username, chunks_with_metadata)
+                self.db_manager.update_status(doc_id, "processed")
+                self.db_manager.clear_journal(doc_id)
             
             logger.info(f"✅ New document processed: {filename} v{version}")
             
@@ -211,36 +658,32 @@ class ProcessingPipeline:
                 "username": username,
                 "version": version,
                 "doc_id": doc_id,
-                "total_chunks": len(all_chunks),
-                "text_chunks": len(text_chunks),
-                "table_chunks": len(table_chunks),
+                "total_chunks": upserted_count,
+                "total_pages": stream.pages,
+                "text_chunks": stream.kept_text_chunks,
+                "table_chunks": stream.table_chunks,
                 "chunks_added": upserted_count,
                 "chunks_deleted": 0,
-                "unchanged_chunks": 0
+                "chunks_updated": 0,
+                "unchanged_chunks": 0,
+                "chunks_resumed": self._count_resumed(chunks_with_metadata, acked),
+                "filter_stats": stream.filter_stats,
+                "stage_metrics": staged.metrics()
             }
             
         except Exception as e:
             logger.error(f"Error in new document processing: {e}")
-            self.db_manager.update_status(doc_id, "failed")
+            self._abort_ingestion(doc_id, username)
             raise
     
     def _handle_duplicate(
         self,
         filename: str,
         username: str,
-        latest_doc: Dict
+        latest_doc: Dict,
+        doc_id: int
     ) -> Dict[str, Any]:
-        """Handle duplicate document upload."""
-        # Insert duplicate record
-        doc_id = self.db_manager.insert_document(
-            filename=filename,
-            username=username,
-            document_hash=latest_doc['document_hash'],
-            version=latest_doc['version'],
-            status="duplicate",
-            is_active=False
-        )
-        
+        """Handle duplicate document upload (duplicate row already recorded)."""
         return {
             "status": "duplicate",
             "message": f"Document already exists (version {latest_doc['version']})",
@@ -248,6 +691,7 @@ class ProcessingPipeline:
             "username": username,
             "version": latest_doc['version'],
             "existing_doc_id": latest_doc['id'],
+            "existing_chunks": self.db_manager.count_active_chunks(latest_doc['id']),
             "duplicate_doc_id": doc_id
         }
     
@@ -256,143 +700,175 @@ class ProcessingPipeline:
         file_path: str,
         filename: str,
         username: str,
-        document_hash: str,
-        latest_doc: Dict
+        latest_doc: Dict,
+        doc_id: int,
+        new_version: int,
+        acked: Optional[Dict[str, str]] = None,
+        progress: ProgressCallback = _no_progress
     ) -> Dict[str, Any]:
-        """Process an incremental update with chunk-level diffing."""
+        """
+        Process an incremental update with chunk-level diffing (new version already allocated).
+        
+        `acked` maps chunk IDs to hashes already upserted by an interrupted attempt.
+        """
         old_version = latest_doc['version']
-        new_version = old_version + 1
-        
-        # Insert new document record
-        doc_id = self.db_manager.insert_document(
-            filename=filename,
-            username=username,
-            document_hash=document_hash,
-            version=new_version,
-            status="processing",
-            is_active=True
-        )
+        acked = acked or {}
         
         try:
-            # Load and chunk new document
-            logger.info("Loading new version...")
-            pages_data = self.document_loader.load_pdf(file_path)
-            table_strings = self.document_loader.get_table_strings(pages_data)
-            
-            logger.info("Chunking new version...")
-            text_chunks = self.chunker.chunk_text(pages_data)
-            table_chunks = self.chunker.chunk_tables(table_strings)
-            all_new_chunks = text_chunks + table_chunks
+            # Load → chunk → hash run as overlapping stages; the diff needs every chunk
+            logger.info("Loading, chunking and hashing new version (staged)...")
+            progress("extracting", pages_total=self.document_loader.page_count(file_path))
+            stream = _ChunkStream(self, settings.UPSERT_BATCH_SIZE, progress)
+            extraction = StagedPipeline(
+                self._extraction_stages(stream), queue_size=settings.PIPELINE_QUEUE_SIZE
+            )
+            all_new_chunks = self._collect(extraction.run(self.document_loader.iter_pages(file_path)))
             
             if not all_new_chunks:
                 raise ValueError("No chunks created from document")
             
             logger.info(f"Created {len(all_new_chunks)} chunks for new version")
             
-            # Hash new chunks
-            logger.info("Computing chunk hashes for new version...")
-            all_new_chunks = self.chunk_hasher.add_hashes_to_chunks(all_new_chunks)
-            new_hash_map = self.chunk_hasher.create_hash_map(all_new_chunks)
-            
-            # Get old chunk hashes from database
+            # Get old chunks from database
             logger.info(f"Fetching old version chunks (v{old_version})...")
-            old_hash_map = self.db_manager.get_chunk_hash_map(latest_doc['id'])
-            logger.info(f"Found {len(old_hash_map)} chunks in old version")
+            old_chunks = self.db_manager.get_active_chunks(latest_doc['id'])
+            logger.info(f"Found {len(old_chunks)} chunks in old version")
+            
+            # Old chunks hashed under another algorithm/normalization are re-keyed
+            # so they still match their unchanged counterparts
+            old_chunks = self.chunk_hasher.translate_legacy_hashes(old_chunks, all_new_chunks)
             
-            # Compute diff
+            # Compute move-aware multiset diff
             logger.info("Computing incremental diff...")
-            chunks_to_add, chunks_to_delete, unchanged_chunks = self.incremental_diff.compute_diff(
-                old_hash_map, new_hash_map
-            )
+            diff = self.incremental_diff.compute_multiset_diff(old_chunks, all_new_chunks)
+            chunks_to_add = diff["to_add"]
+            chunks_to_delete = diff["to_delete"]
+            chunks_to_update = diff["to_update"]
+            unchanged_chunks = diff["unchanged"]
             
             diff_report = self.incremental_diff.create_diff_report(
-                chunks_to_add, chunks_to_delete, unchanged_chunks
+                chunks_to_add, chunks_to_delete, unchanged_chunks, chunks_to_update
+            )
+            logger.info(
+                f"Diff: +{len(chunks_to_add)} -{len(chunks_to_delete)} "
+                f"~{len(chunks_to_update)} ={len(unchanged_chunks)}"
             )
-            logger.info(f"Diff: +{len(chunks_to_add)} -{len(chunks_to_delete)} ={len(unchanged_chunks)}")
             
-            # Process additions
-            chunks_added = 0
+            # Process additions: metadata → upsert stages over batches of new chunks
+            chunks_with_metadata = []
+            progress("upserting", chunks_total=len(chunks_to_add))
+            additions = StagedPipeline(
+                self._upsert_stages(filename, username, new_version, doc_id, acked, progress),
+                queue_size=settings.PIPELINE_QUEUE_SIZE,
+                source_name="diff"
+            )
             if chunks_to_add:
                 logger.info(f"Adding {len(chunks_to_add)} new chunks...")
-                new_chunks_to_process = self.incremental_diff.get_chunks_to_process(
-                    chunks_to_add, new_hash_map
-                )
-                
-                # Build metadata for new chunks
-                chunks_with_metadata = self.metadata_builder.build_all_metadata(
-                    new_chunks_to_process, filename, username, new_version
-                )
-                
-                # Upsert to Pinecone
-                chunks_added = self.pinecone_manager.upsert_chunks(chunks_with_metadata, username)
-                
-                # Insert to database
-                chunk_records = []
-                for chunk in chunks_with_metadata:
-                    chunk_records.append({
-                        'document_id': doc_id,
-                        'filename': filename,
-                        'username': username,
-                        'version': new_version,
-                        'chunk_id': chunk['id'],
-                        'chunk_hash': chunk['chunk_hash'],
-                        'page_number': chunk['page_number'],
-                        'content_type': chunk['content_type'],
-                        'is_active': True
-                    })
-                
-                self.db_manager.insert_chunks_batch(chunk_records)
-            
-            # Process deletions
-            chunks_deleted = 0
-            if chunks_to_delete:
-                logger.info(f"Deleting {len(chunks_to_delete)} removed chunks...")
-                
-                # Get chunk IDs to delete from Pinecone
-                chunk_ids_to_delete = self.incremental_diff.get_chunk_ids_to_delete(
-                    chunks_to_delete, old_hash_map
-                )
-                
-                # Delete from Pinecone
-                chunks_deleted = self.pinecone_manager.delete_chunks(chunk_ids_to_delete, username)
-                
-                # Soft delete in database
-                self.db_manager.deactivate_chunks_by_hash(
-                    list(chunks_to_delete), latest_doc['id']
-                )
-            
-            # Handle unchanged chunks (no action needed - just log)
-            logger.info(f"Skipping {len(unchanged_chunks)} unchanged chunks (no re-embedding)")
+                batch_size = settings.UPSERT_BATCH_SIZE
+                chunks_with_metadata = self._collect(additions.run(
+                    chunks_to_add[i:i + batch_size] for i in range(0, len(chunks_to_add), batch_size)
+                ))
             
-            # Deactivate old document version
-            self.db_manager.deactivate_previous_version(filename, username, old_version)
+            chunks_added = len(chunks_with_metadata)
+            stage_metrics = {**extraction.metrics(), **additions.metrics()}
+            logger.info(f"Stage timings: {extraction.summary()}; {additions.summary()}")
             
-            # Update new document status
-            self.db_manager.update_status(doc_id, "processed")
+            # Metadata-only updates (moved chunks keep their vector). Only the page is
+            # in Pinecone metadata; a changed chunk_index alone needs no request
+            moved_to_other_page = [
+                (old_chunk['chunk_id'], None, new_chunk.page_number)
+                for old_chunk, new_chunk in chunks_to_update
+                if old_chunk.get('page_number') != new_chunk.page_number
+            ]
             
-            logger.info(f"✅ Incremental update complete: {filename} v{old_version} → v{new_version}")
+            logger.info(f"Skipping {len(unchanged_chunks)} unchanged chunks (no re-embedding)")
             
-            return {
-                "status": "success",
-                "message": f"Document updated successfully (v{old_version} → v{new_version})",
-                "filename": filename,
-                "username": username,
-                "old_version": old_version,
-                "new_version": new_version,
-                "doc_id": doc_id,
-                "total_chunks": len(all_new_chunks),
-                "text_chunks": len(text_chunks),
-                "table_chunks": len(table_chunks),
-                "chunks_added": chunks_added,
-                "chunks_deleted": chunks_deleted,
-                "unchanged_chunks": len(unchanged_chunks),
-                "diff_report": diff_report
-            }
+            # Apply the whole version change to the database atomically; deletions and
+            # moves are journaled in the same transaction and sent to Pinecone after it,
+            # so a crash before the commit leaves the old version intact
+            progress("committing")
+            with self.db_manager.transaction(immediate=True):
+                self.db_manager.apply_incremental_update(
+                    document_id=doc_id,
+                    filename=filename,
+                    username=username,
+                    old_version=old_version,
+                    added=chunks_with_metadata,
+                    deleted_row_ids=[chunk['id'] for chunk in chunks_to_delete],
+                    carried=[
+                        {
+                            'id': old_chunk['id'],
+                            'chunk_index': new_chunk.chunk_index,
+                            'page_number': new_chunk.page_number,
+                            'chunk_hash': new_chunk.chunk_hash,
+                            'hash_algorithm': new_chunk.hash_algorithm,
+                            'normalization_version': new_chunk.normalization_version,
+                            'text_hash': new_chunk.text_hash
+                        }
+                        for old_chunk, new_chunk in chunks_to_update + unchanged_chunks
+                    ]
+                )
+                self.db_manager.journal_plan(
+                    doc_id, "delete",
+                    [(chunk['chunk_id'], chunk['chunk_hash'], None) for chunk in chunks_to_delete]
+                )
+                self.db_manager.journal_plan(doc_id, "update", moved_to_other_page)
+                self.db_manager.clear_journal(doc_id, op="upsert")
+                if self.text_store:
+                    # Carried chunks ingested before the text store existed get their text too
+                    self.text_store.put_chunks(new_chunk for _, new_chunk in chunks_to_update + unchanged_chunks)
+                if self.lexical_index:
+                    self.lexical_index.add_chunks(username, chunks_with_metadata)
+                    self.lexical_index.remove_chunks(username, [chunk['chunk_id'] for chunk in chunks_to_delete])
+                    self.lexical_index.update_carried(
+                        username,
+                        [
+                            (old_chunk['chunk_id'], new_chunk.chunk_hash, new_chunk.page_number)
+                            for old_chunk, new_chunk in chunks_to_update + unchanged_chunks
+                        ],
+                        new_version,
+                        self._version_date(doc_id)
+                    )
             
         except Exception as e:
             logger.error(f"Error in incremental update: {e}")
-            self.db_manager.update_status(doc_id, "failed")
+            self._abort_ingestion(doc_id, username)
             raise
+        
+        # Committed: a failure from here on is finished by the recovery sweep, not rolled back
+        chunks_deleted = 0
+        cleanup_pending = False
+        progress("cleanup")
+        try:
+            chunks_deleted = self._apply_post_commit(doc_id, username)
+        except Exception as e:
+            logger.error(f"Post-commit Pinecone cleanup of document {doc_id} failed (left for recovery): {e}")
+            cleanup_pending = True
+        
+        logger.info(f"✅ Incremental update complete: {filename} v{old_version} → v{new_version}")
+        
+        return {
+            "status": "success",
+            "message": f"Document updated successfully (v{old_version} → v{new_version})",
+            "filename": filename,
+            "username": username,
+            "old_version": old_version,
+            "new_version": new_version,
+            "doc_id": doc_id,
+            "total_chunks": len(all_new_chunks),
+            "total_pages": stream.pages,
+            "text_chunks": stream.kept_text_chunks,
+            "table_chunks": stream.table_chunks,
+            "chunks_added": chunks_added,
+            "chunks_deleted": chunks_deleted,
+            "chunks_updated": len(chunks_to_update),
+            "unchanged_chunks": len(unchanged_chunks),
+            "chunks_resumed": self._count_resumed(chunks_with_metadata, acked),
+            "cleanup_pending": cleanup_pending,
+            "diff_report": diff_report,
+            "filter_stats": stream.filter_stats,
+            "stage_metrics": stage_metrics
+        }
     
     def get_user_documents(self, username: str, limit: int = 50) -> list:
         """
@@ -407,11 +883,36 @@ class ProcessingPipeline:
         """
         return self.db_manager.get_user_documents(username.lower(), limit)
     
+    def list_user_documents(self, username: str, **filters) -> Dict[str, Any]:
+        """
+        Get one keyset page of a user's documents.
+        
+        Args:
+            username: Username.
+            **filters: limit, cursor, active_only, status, filename_prefix
+                       (see SQLiteManager.list_documents).
+        
+        Returns:
+            Dictionary with 'documents' and 'next_cursor'.
+        """
+        return self.db_manager.list_documents(username.lower(), **filters)
+    
+    def get_document_counts(self, username: str) -> Dict[str, Any]:
+        """Get a user's document counts (total, active, by status)."""
+        return self.db_manager.get_document_counts(username.lower())
+    
+    def _hybrid(self) -> HybridRetriever:
+        if self.hybrid_retriever is None:
+            raise ValueError("Hybrid search requires the lexical index (LEXICAL_INDEX_ENABLED=true)")
+        return self.hybrid_retriever
+    
     def search_documents(
         self,
         query: str,
         username: str,
-        top_k: int = None
+        top_k: int = None,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False
     ) -> list:
         """
         Search documents for a user.
@@ -420,14 +921,266 @@ class ProcessingPipeline:
             query: Search query.
             username: Username.
             top_k: Number of results to return.
+            metadata_filter: Pinecone metadata filter (see search_filter.build_filter).
+            hybrid: Fuse dense and lexical (FTS5) results (see HybridRetriever).
         
         Returns:
             List of search results.
+        
+        Raises:
+            ValueError: If hybrid search is requested but the lexical index is disabled.
         """
         if top_k is None:
             top_k = settings.TOP_K
         
-        return self.pinecone_manager.search(query, username.lower(), top_k)
+        if hybrid:
+            hits = self._hybrid().search(query, username.lower(), top_k, metadata_filter)
+        else:
+            hits = self.vector_store.search(query, username.lower(), top_k, metadata_filter)
+        return self._hydrate(hits, username.lower())
+    
+    async def asearch_documents(
+        self,
+        query: str,
+        username: str,
+        top_k: int = None,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False
+    ) -> list:
+        """Search documents for a user without blocking the event loop (see search_documents())."""
+        if top_k is None:
+            top_k = settings.TOP_K
+        
+        if hybrid:
+            hits = await self._hybrid().asearch(query, username.lower(), top_k, metadata_filter)
+        else:
+            hits = await self.vector_store.asearch(query, username.lower(), top_k, metadata_filter)
+        return await asyncio.to_thread(self._hydrate, hits, username.lower())
+    
+    def search_reranked(
+        self,
+        query: str,
+        username: str,
+        top_k: int = None,
+        top_n: int = None,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False
+    ) -> list:
+        """
+        Search and rerank documents for a user, with hydrated text.
+        
+        Dense candidates are searched and reranked in one request
+        (VectorStore.rerank). Hybrid candidates are fused first and then
+        reranked as they are (VectorStore.rerank_documents), so there is no
+        second vector search. Both reranks go through the rerank cache.
+        
+        Args:
+            query: Search query.
+            username: Username.
+            top_k: Candidates retrieved before reranking.
+            top_n: Results kept after reranking.
+            metadata_filter: Pinecone metadata filter (see search_filter.build_filter).
+            hybrid: Rerank the dense + lexical fusion of the top_k candidates.
+        
+        Returns:
+            List of reranked results.
+        
+        Raises:
+            ValueError: If hybrid search is requested but the lexical index is disabled.
+        """
+        top_k = top_k or settings.TOP_K
+        top_n = top_n or settings.RERANK_TOP_N
+        namespace = username.lower()
+        if hybrid:
+            candidates = self.search_documents(query, username, top_k, metadata_filter, hybrid=True)
+            if self.rerank_cache is None:
+                return self.vector_store.rerank_documents(query, candidates, top_n)
+            
+            key = self.rerank_cache.key(namespace, query, candidates=self.rerank_cache.candidate_set(candidates), top_n=top_n)
+            ranking, state = self.rerank_cache.lookup(namespace, key)
+            if ranking is not None:
+                return self.rerank_cache.reorder(candidates, ranking)
+            hits = self.vector_store.rerank_documents(query, candidates, top_n)
+            self.rerank_cache.put(namespace, key, state, self.rerank_cache.ranking(hits))
+            return hits
+        
+        if self.rerank_cache is None:
+            hits = self.vector_store.rerank(query, namespace, top_k, top_n, metadata_filter)
+        else:
+            key = self.rerank_cache.key(namespace, query, top_k=top_k, top_n=top_n, filter=metadata_filter)
+            hits, state = self.rerank_cache.lookup(namespace, key)
+            if hits is None:
+                hits = self.vector_store.rerank(query, namespace, top_k, top_n, metadata_filter)
+                self.rerank_cache.put(namespace, key, state, hits)
+        return self._hydrate(hits, namespace)
+    
+    async def asearch_reranked(
+        self,
+        query: str,
+        username: str,
+        top_k: int = None,
+        top_n: int = None,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False
+    ) -> list:
+        """Search and rerank without blocking the event loop (see search_reranked())."""
+        top_k = top_k or settings.TOP_K
+        top_n = top_n or settings.RERANK_TOP_N
+        namespace = username.lower()
+        if hybrid:
+            candidates = await self.asearch_documents(query, username, top_k, metadata_filter, hybrid=True)
+            if self.rerank_cache is None:
+                return await self.vector_store.arerank_documents(query, candidates, top_n)
+            
+            key = self.rerank_cache.key(namespace, query, candidates=self.rerank_cache.candidate_set(candidates), top_n=top_n)
+            ranking, state = await asyncio.to_thread(self.rerank_cache.lookup, namespace, key)
+            if ranking is not None:
+                return self.rerank_cache.reorder(candidates, ranking)
+            hits = await self.vector_store.arerank_documents(query, candidates, top_n)
+            await asyncio.to_thread(self.rerank_cache.put, namespace, key, state, self.rerank_cache.ranking(hits))
+            return hits
+        
+        if self.rerank_cache is None:
+            hits = await self.vector_store.arerank(query, namespace, top_k, top_n, metadata_filter)
+        else:
+            key = self.rerank_cache.key(namespace, query, top_k=top_k, top_n=top_n, filter=metadata_filter)
+            hits, state = await asyncio.to_thread(self.rerank_cache.lookup, namespace, key)
+            if hits is None:
+                hits = await self.vector_store.arerank(query, namespace, top_k, top_n, metadata_filter)
+                await asyncio.to_thread(self.rerank_cache.put, namespace, key, state, hits)
+        return await asyncio.to_thread(self._hydrate, hits, namespace)
+    
+    def expand_context(
+        self,
+        hits: List[Dict[str, Any]],
+        username: str,
+        window: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Widen hits to their neighbouring chunks within the token budget (see ContextExpander).
+        
+        Args:
+            hits: Hydrated search or rerank hits, best first.
+            username: Username.
+            window: Neighbouring chunks per side (defaults to CONTEXT_WINDOW; 0 disables).
+        
+        Returns:
+            Context entries for generation (hits unchanged if the text store is disabled).
+        """
+        if self.context_expander is None:
+            return hits
+        return self.context_expander.expand(hits, username.lower(), window)
+    
+    async def aexpand_context(
+        self,
+        hits: List[Dict[str, Any]],
+        username: str,
+        window: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Widen hits to their neighbouring chunks without blocking the event loop."""
+        return await asyncio.to_thread(self.expand_context, hits, username, window)
+    
+    # ── Chunk text store ─────────────────────────────────────────────────
+    
+    def _hydrate(self, hits: List[Dict[str, Any]], username: str) -> List[Dict[str, Any]]:
+        """
+        Fill in the text of search hits from the chunk text store.
+        
+        Hits whose text is not stored yet (chunks ingested before the store)
+        are fetched from the vector store in one request, and their text is
+        stored for next time.
+        """
+        if not self.text_store or not hits:
+            return hits
+        
+        missing = self.text_store.hydrate(hits, username)
+        if missing:
+            records = {
+                record["_id"]: record
+                for record in self.vector_store.fetch_records([hit["id"] for hit in missing], username)
+            }
+            for hit in missing:
+                text = records.get(hit["id"], {}).get("chunk_text")
+                if text:
+                    hit["chunk_text"] = text
+            self.text_store.put_for_chunks(
+                username, {hit["id"]: hit["chunk_text"] for hit in missing if hit.get("chunk_text")}
+            )
+            logger.debug(f"Hydrated {len(missing)} hits from the vector store")
+        return hits
+    
+    def text_backfill(self, username: Optional[str] = None) -> Dict[str, int]:
+        """
+        Store the text of active chunks ingested before the chunk text store.
+        
+        Raises:
+            ValueError: If the chunk text store is disabled.
+        """
+        if self.text_store is None:
+            raise ValueError("The chunk text store is disabled (CHUNK_TEXT_STORE_ENABLED=false)")
+        return self.text_store.backfill(self.vector_store, username.lower() if username else None)
+    
+    def reembed(self, username: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Re-upsert active chunks from their stored text, without re-parsing PDFs.
+        
+        Used after changing the embedding model or recreating the index.
+        Chunk IDs and versions are unchanged, so the metadata database stays
+        valid; 'date' is the document version's upload time. Chunks whose
+        text is not stored are skipped (run text_backfill() first).
+        
+        Args:
+            username: Restrict to one user; defaults to all users.
+        
+        Returns:
+            Dictionary with 'chunks', 'upserted' and 'skipped' counts.
+        
+        Raises:
+            ValueError: If the chunk text store is disabled.
+            RuntimeError: If any upsert batch fails.
+        """
+        if self.text_store is None:
+            raise ValueError("The chunk text store is disabled (CHUNK_TEXT_STORE_ENABLED=false)")
+        
+        report = {"chunks": 0, "upserted": 0, "skipped": 0}
+        namespaces = set()
+        for rows in self.db_manager.iter_active_chunks(username.lower() if username else None):
+            texts = self.text_store.get_many(row["text_hash"] for row in rows)
+            by_user: Dict[str, List[ChunkRecord]] = {}
+            
+            for row in rows:
+                text = texts.get(row["text_hash"])
+                if text is None:
+                    report["skipped"] += 1
+                    continue
+                chunk = ChunkRecord(text, row["page_number"], row["content_type"], row["chunk_index"])
+                chunk.chunk_hash = row["chunk_hash"]
+                chunk.hash_algorithm = row["hash_algorithm"]
+                chunk.normalization_version = row["normalization_version"]
+                chunk.text_hash = row["text_hash"]
+                chunk.chunk_id = row["chunk_id"]
+                chunk.source = row["filename"]
+                chunk.username = row["username"]
+                chunk.version = row["version"]
+                chunk.date = datetime.fromisoformat(str(row["uploaded_at"])).isoformat()
+                by_user.setdefault(row["username"], []).append(chunk)
+            
+            report["chunks"] += len(rows)
+            for user, chunks in by_user.items():
+                if user not in namespaces:
+                    self.vector_store.ensure_namespace_exists(user)
+                    namespaces.add(user)
+                try:
+                    raise_on_failure(self.vector_store.execute_batches(user, upserts=chunks), "re-embedding chunks")
+                finally:
+                    self._namespace_written(user)
+                report["upserted"] += len(chunks)
+        
+        logger.info(
+            f"✅ Re-embedded {report['upserted']}/{report['chunks']} chunks "
+            f"({report['skipped']} without stored text)"
+        )
+        return report
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""
+Single Flight — per-key serialization with result sharing for identical calls.
+
+Used by ProcessingPipeline to make concurrent uploads of the same document safe:
+- Calls with the same key (username, filename) run one at a time, so each
+  incremental diff sees the version committed by the previous call.
+- Calls with the same key *and* token (document hash) that overlap are
+  coalesced: only the first one runs, the others wait and share its result.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight call whose result can be shared with waiting callers."""
+    
+    __slots__ = ("done", "result", "error", "waiters")
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and coalesces identical calls."""
+    
+    def __init__(self):
+        """Initialize empty call and lock registries."""
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[Hashable, Hashable], _Call] = {}
+        self._key_locks: Dict[Hashable, list] = {}  # key -> [lock, reference count]
+    
+    def run(
+        self,
+        key: Hashable,
+        token: Hashable,
+        fn: Callable[[], Any]
+    ) -> Tuple[Any, bool]:
+        """
+        Run `fn` under the key's lock, or share the result of an identical in-flight call.
+        
+        Args:
+            key: Serialization key (e.g. (username, filename)).
+            token: Identity of the work (e.g. document hash); overlapping calls
+                   with the same key and token are coalesced.
+            fn: Work to run.
+        
+        Returns:
+            Tuple of (result, shared) where `shared` is True if this caller
+            received the result of another caller's execution.
+        
+        Raises:
+            Whatever `fn` raised — also re-raised in coalesced callers.
+        """
+        with self._lock:
+            call = self._calls.get((key, token))
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[(key, token)] = call
+                entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+                entry[1] += 1
+                leader = True
+        
+        if not leader:
+            logger.info(f"Coalescing with in-flight call for {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        key_lock = entry[0]
+        try:
+            with key_lock:
+                call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[(key, token)]
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+            call.done.set()
+
+
+if __name__ == "__main__":
+    import time
+    
+    print("=== Single Flight Test ===\n")
+    
+    flight = SingleFlight()
+    executions = []
+    active = {"now": 0, "max": 0}
+    counter_lock = threading.Lock()
+    
+    def work(token):
+        def fn():
+            with counter_lock:
+                executions.append(token)
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+            time.sleep(0.05)
+            with counter_lock:
+                active["now"] -= 1
+            return f"ingested {token}"
+        return fn
+    
+    # 16 identical uploads and 4 different versions of the same file, all at once
+    results = []
+    barrier = threading.Barrier(20)
+    
+    def caller(token):
+        barrier.wait()
+        results.append(flight.run(("alice", "report.pdf"), token, work(token)))
+    
+    threads = [threading.Thread(target=caller, args=("hash-a",)) for _ in range(16)]
+    threads += [threading.Thread(target=caller, args=(f"hash-{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    shared = sum(1 for _, was_shared in results if was_shared)
+    print(f"✅ Calls: {len(results)}, executions: {len(executions)}, shared results: {shared}")
+    print(f"✅ Max concurrent executions for one key: {active['max']}")
+    
+    assert executions.count("hash-a") == 1, "Identical overlapping calls should run once"
+    assert len(executions) == 5, "Each distinct token should run exactly once"
+    assert active["max"] == 1, "Calls for the same key must not overlap"
+    assert not flight._calls and not flight._key_locks, "Registries should be empty afterwards"
+    
+    # Errors propagate to coalesced callers
+    def failing():
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+    
+    errors = []
+    
+    def failing_caller():
+        try:
+            flight.run("k", "t", failing)
+        except RuntimeError as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=failing_caller) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 3, "Every coalesced caller should see the error"
+    print("✅ Errors propagate to coalesced callers")
+    
+    print("\n✅ All tests passed!")
@@ -0,0 +1,376 @@
+"""
+Staged Pipeline — concurrent stages connected by bounded queues.
+
+Used by ProcessingPipeline so that the stages of an ingestion overlap:
+while later pages are still being extracted, earlier chunk batches are
+already being hashed and upserted to Pinecone.
+
+    source ──▶ [queue] ──▶ stage 1 ──▶ [queue] ──▶ stage 2 ──▶ ... ──▶ results
+
+- Every stage runs on its own worker thread(s)
+- Queues are bounded, so a slow stage (e.g. the network upsert) applies
+  backpressure to the stages before it instead of buffering the whole document
+- The first error in any stage stops the pipeline and is re-raised by `run`
+- Each stage reports items in/out, busy time, time blocked on a full queue
+  and current/max input queue depth (also readable while the run is in progress)
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()       # end-of-stream marker, one per downstream worker
+_POLL_SECONDS = 0.1    # how often blocked workers check whether the run was aborted
+
+
+class _Aborted(Exception):
+    """Raised inside a worker when another stage has failed."""
+
+
+class Stage:
+    """One processing step of a StagedPipeline."""
+    
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        flat: bool = False,
+        flush: Optional[Callable[[], Iterable[Any]]] = None
+    ):
+        """
+        Initialize a stage.
+        
+        Args:
+            name: Stage name used in metrics and logs.
+            fn: Called once per input item. Returns the output item, or None to
+                emit nothing.
+            workers: Number of worker threads. Stages with more than one worker
+                     do not preserve item order.
+            flat: If True, `fn` returns an iterable and each element is emitted.
+            flush: Called once after the last input item; every element of the
+                   returned iterable is emitted (for stages that buffer items).
+        """
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker")
+        
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.flat = flat
+        self.flush = flush
+        self.queue: Optional[queue.Queue] = None
+        
+        self._lock = threading.Lock()
+        self._items_in = 0
+        self._items_out = 0
+        self._busy_seconds = 0.0
+        self._blocked_seconds = 0.0
+        self._max_queue_depth = 0
+    
+    def _record(self, items_in: int, items_out: int, busy: float, blocked: float) -> None:
+        with self._lock:
+            self._items_in += items_in
+            self._items_out += items_out
+            self._busy_seconds += busy
+            self._blocked_seconds += blocked
+    
+    def _observe_depth(self) -> None:
+        depth = self.queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Current stage metrics.
+        
+        Returns:
+            Dictionary with the structure:
+            {
+                "workers": 2,
+                "items_in": 40,
+                "items_out": 40,
+                "busy_seconds": 3.1,
+                "blocked_seconds": 0.2,
+                "queue_depth": 0,
+                "max_queue_depth": 4
+            }
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "items_in": self._items_in,
+                "items_out": self._items_out,
+                "busy_seconds": round(self._busy_seconds, 4),
+                "blocked_seconds": round(self._blocked_seconds, 4),
+                "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+                "max_queue_depth": self._max_queue_depth
+            }
+
+
+class StagedPipeline:
+    """Runs a source iterable through a chain of Stages on worker threads."""
+    
+    def __init__(self, stages: List[Stage], queue_size: int = 4, source_name: str = "load"):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            stages: Stages in processing order.
+            queue_size: Capacity of each stage's input queue (backpressure bound).
+            source_name: Name reported for the thread that iterates the source.
+        """
+        if not stages:
+            raise ValueError("StagedPipeline needs at least one stage")
+        
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.source = Stage(source_name, fn=None)
+        self._results: queue.Queue = queue.Queue()
+        self._abort = threading.Event()
+        self._errors: List[BaseException] = []
+        self._remaining: Dict[str, int] = {}
+        self._remaining_lock = threading.Lock()
+    
+    # ── Queue helpers (abort-aware) ──────────────────────────────────────
+    
+    def _put(self, target: queue.Queue, item: Any) -> float:
+        """Put with backpressure; returns the seconds spent blocked."""
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                target.put(item, timeout=_POLL_SECONDS)
+                return time.perf_counter() - start
+            except queue.Full:
+                continue
+    
+    def _get(self, source: queue.Queue) -> Any:
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                return source.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+    
+    def _emit(self, stage: Stage, downstream: Optional[Stage], item: Any) -> float:
+        if downstream is None:
+            self._results.put(item)
+            return 0.0
+        blocked = self._put(downstream.queue, item)
+        downstream._observe_depth()
+        return blocked
+    
+    def _finish(self, downstream: Optional[Stage]) -> None:
+        """Send one end-of-stream marker per downstream worker."""
+        if downstream is None:
+            return
+        for _ in range(downstream.workers):
+            self._put(downstream.queue, _DONE)
+    
+    def _fail(self, stage: Stage, error: BaseException) -> None:
+        logger.error(f"Stage '{stage.name}' failed: {error}")
+        self._errors.append(error)
+        self._abort.set()
+    
+    # ── Workers ──────────────────────────────────────────────────────────
+    
+    def _run_source(self, items: Iterable[Any]) -> None:
+        first = self.stages[0]
+        try:
+            iterator = iter(items)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self.source._record(0, 0, time.perf_counter() - start, 0.0)
+                    break
+                busy = time.perf_counter() - start
+                blocked = self._emit(self.source, first, item)
+                self.source._record(0, 1, busy, blocked)
+            self._finish(first)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            self._fail(self.source, e)
+    
+    def _run_stage(self, index: int) -> None:
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        
+        def emit_all(outputs: Iterable[Any], busy: float) -> None:
+            emitted, blocked = 0, 0.0
+            for output in outputs:
+                if output is not None:
+                    blocked += self._emit(stage, downstream, output)
+                    emitted += 1
+            stage._record(0, emitted, busy, blocked)
+        
+        try:
+            while True:
+                item = self._get(stage.queue)
+                if item is _DONE:
+                    break
+                
+                start = time.perf_counter()
+                output = stage.fn(item)
+                busy = time.perf_counter() - start
+                stage._record(1, 0, 0.0, 0.0)
+                emit_all(output if stage.flat else [output], busy)
+            
+            # The last worker of a stage flushes it and signals end-of-stream
+            with self._remaining_lock:
+                self._remaining[stage.name] -= 1
+                last = self._remaining[stage.name] == 0
+            if last:
+                if stage.flush is not None:
+                    start = time.perf_counter()
+                    flushed = list(stage.flush())
+                    emit_all(flushed, time.perf_counter() - start)
+                self._finish(downstream)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            self._fail(stage, e)
+    
+    # ── Public API ───────────────────────────────────────────────────────
+    
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """
+        Feed `items` through all stages and collect the last stage's outputs.
+        
+        Args:
+            items: Source iterable; iterated on its own thread (e.g. a page generator).
+        
+        Returns:
+            Outputs of the last stage (in completion order).
+        
+        Raises:
+            The first exception raised by the source or any stage.
+        """
+        for stage in self.stages:
+            stage.queue = queue.Queue(maxsize=self.queue_size)
+            self._remaining[stage.name] = stage.workers
+        
+        threads = [threading.Thread(target=self._run_source, args=(items,), name=f"stage-{self.source.name}", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=self._run_stage, args=(index,), name=f"stage-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ]
+        
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if self._errors:
+            raise self._errors[0]
+        
+        results = []
+        while not self._results.empty():
+            results.append(self._results.get_nowait())
+        return results
+    
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Metrics of the source and every stage, keyed by stage name."""
+        metrics = {self.source.name: self.source.metrics()}
+        for stage in self.stages:
+            metrics[stage.name] = stage.metrics()
+        return metrics
+    
+    def summary(self) -> str:
+        """One-line busy-time / queue-depth summary for logging."""
+        return ", ".join(
+            f"{name} {m['busy_seconds']:.2f}s (q≤{m['max_queue_depth']})"
+            for name, m in self.metrics().items()
+        )
+
+
+if __name__ == "__main__":
+    print("=== Staged Pipeline Test ===\n")
+    
+    events = []
+    events_lock = threading.Lock()
+    
+    def log_event(name):
+        with events_lock:
+            events.append((name, time.perf_counter()))
+    
+    def pages(n=20):
+        for i in range(n):
+            time.sleep(0.02)  # page extraction
+            log_event("page")
+            yield i
+    
+    def chunk(page):
+        return [page * 10 + j for j in range(3)]
+    
+    def upsert(batch_item):
+        log_event("upsert")
+        time.sleep(0.03)  # network round trip
+        return batch_item
+    
+    buffered = []
+    
+    def rebatch(item):
+        buffered.append(item)
+        if len(buffered) >= 6:
+            batch = list(buffered)
+            buffered.clear()
+            return [batch]
+        return []
+    
+    def flush():
+        return [list(buffered)] if buffered else []
+    
+    # Sequential baseline: same work, one step after another
+    start = time.perf_counter()
+    all_items = [c for p in pages() for c in chunk(p)]
+    for i in range(0, len(all_items), 6):
+        upsert(all_items[i:i + 6])
+    sequential = time.perf_counter() - start
+    events.clear()
+    
+    staged = StagedPipeline([
+        Stage("chunk", chunk, flat=True),
+        Stage("batch", rebatch, flat=True, flush=flush),
+        Stage("upsert", upsert, workers=2),
+    ], queue_size=2)
+    start = time.perf_counter()
+    batches = staged.run(pages())
+    elapsed = time.perf_counter() - start
+    
+    first_upsert = min(t for name, t in events if name == "upsert")
+    last_page = max(t for name, t in events if name == "page")
+    
+    print(f"✅ {sum(len(b) for b in batches)} items in {len(batches)} batches")
+    print(f"✅ Sequential {sequential:.2f}s → staged {elapsed:.2f}s ({sequential / elapsed:.1f}x)")
+    print(f"✅ First upsert started {(last_page - first_upsert) * 1000:.0f} ms before the last page was extracted")
+    for name, m in staged.metrics().items():
+        print(f"   {name:7s}: {m}")
+    
+    assert sorted(x for b in batches for x in b) == all_items, "Every item should arrive exactly once"
+    assert first_upsert < last_page, "Upserts should overlap with extraction"
+    assert staged.metrics()["upsert"]["items_in"] == len(batches)
+    
+    # Errors stop the pipeline and are re-raised
+    def failing(item):
+        if item == 5:
+            raise RuntimeError("boom")
+        return item
+    
+    try:
+        StagedPipeline([Stage("fail", failing), Stage("sink", lambda x: x)], queue_size=1).run(range(1000))
+        raise AssertionError("Error should propagate")
+    except RuntimeError as e:
+        print(f"✅ Stage error propagated: {e}")
+    
+    print("\n✅ All tests passed!")
@@ -0,0 +1 @@
+"""Retrieval module — lexical (FTS5) index, hybrid dense + lexical search and context window expansion."""
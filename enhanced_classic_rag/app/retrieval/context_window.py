@@ -0,0 +1,286 @@
+"""
+Context Window — expands retrieved chunks with their neighbours before generation.
+
+Chunks are kept small so retrieval stays precise, but the LLM often needs
+the sentences around a hit. Instead of raising top_k (more vector reads and
+reranking), each text hit is widened to the active chunks at
+chunk_index ± window of the same document version, read from local storage:
+
+    document_chunks   (document_id, chunk_index) → text_hash
+    chunk_texts       text_hash → text (ChunkTextStore)
+
+Expansion adds no vector store queries: one query locates the hits, one
+reads the neighbour rows and one reads their text. Neighbours are added
+nearest-first, round-robin over the hits in rank order, until the token
+budget is spent, so the best hits are widened first. Windows that touch or
+overlap are merged into one context entry, and the text the chunker repeats
+between consecutive chunks (TEXT_CHUNK_OVERLAP) is not duplicated.
+
+Table chunks hold a whole table (see Chunker.chunk_tables), so they are
+returned as they are; text windows never reach into table chunks.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # rough token estimate for English text
+MIN_OVERLAP = 8      # shorter suffix/prefix matches are treated as coincidence
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text (ceil(characters / CHARS_PER_TOKEN))."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def join_overlapping(left: str, right: str, max_overlap: int) -> str:
+    """
+    Concatenate consecutive chunks, dropping the text they share.
+    
+    Args:
+        left: Earlier chunk.
+        right: Following chunk.
+        max_overlap: Longest shared text to look for (the chunker's overlap).
+    
+    Returns:
+        left + the part of right that does not repeat the end of left.
+    """
+    for size in range(min(len(left), len(right), max_overlap), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left} {right}"
+
+
+class ContextExpander:
+    """Widens search hits to neighbouring chunks within a token budget."""
+    
+    def __init__(
+        self,
+        db_manager,
+        text_store,
+        window: int = 1,
+        token_budget: int = 2000,
+        max_overlap: int = 80
+    ):
+        """
+        Initialize context expander.
+        
+        Args:
+            db_manager: SQLiteManager holding the chunk rows.
+            text_store: ChunkTextStore holding the chunk text.
+            window: Neighbouring chunk indexes added on each side of a hit.
+            token_budget: Maximum estimated tokens of all returned context,
+                          hits included; hits are never dropped.
+            max_overlap: Chunk overlap in characters (TEXT_CHUNK_OVERLAP).
+        """
+        self.db_manager = db_manager
+        self.text_store = text_store
+        self.window = window
+        self.token_budget = token_budget
+        self.max_overlap = max_overlap
+    
+    def expand(
+        self,
+        hits: List[Dict[str, Any]],
+        username: str,
+        window: Optional[int] = None,
+        token_budget: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Expand hydrated search hits with their neighbouring chunks.
+        
+        Args:
+            hits: Search hits in rank order (with 'id', 'source' and 'chunk_text').
+            username: Namespace of the hits.
+            window: Overrides the configured window (0 disables expansion).
+            token_budget: Overrides the configured token budget.
+        
+        Returns:
+            Context entries in rank order. An expanded entry is a copy of the
+            best hit of its window with 'chunk_text' set to the window's text
+            and 'chunk_ids', 'hit_ids', 'pages' and 'window' (first and last
+            chunk_index) added. Hits that cannot be expanded are returned as is.
+        """
+        window = self.window if window is None else window
+        budget = self.token_budget if token_budget is None else token_budget
+        if window <= 0 or not hits:
+            return hits
+        
+        positions = self.db_manager.locate_chunks(username, [(hit.get("source"), hit["id"]) for hit in hits])
+        anchors: Dict[Tuple[int, int], int] = {}  # (document_id, chunk_index) → rank of the best hit there
+        for rank, hit in enumerate(hits):
+            position = positions.get(hit["id"])
+            if position and position["content_type"] == "text":
+                anchors.setdefault((position["document_id"], position["chunk_index"]), rank)
+        if not anchors:
+            return hits
+        
+        ranges = [(doc_id, index - window, index + window) for doc_id, index in anchors]
+        rows = {(row["document_id"], row["chunk_index"]): row for row in self.db_manager.get_chunk_ranges(ranges)}
+        texts = self.text_store.get_many(row["text_hash"] for row in rows.values())
+        
+        # Hits first: their text is always kept
+        used = sum(estimate_tokens(hit.get("chunk_text") or "") for hit in hits)
+        selected = {key: hits[rank].get("chunk_text") or "" for key, rank in anchors.items()}
+        added = self._grow(anchors, rows, texts, selected, window, budget - used)
+        
+        entries = self._merge(hits, anchors, rows, selected, ranges)
+        logger.info(
+            f"Context expansion: {len(anchors)} hits + {added} neighbours "
+            f"→ {len(entries)} context entries (window ±{window})"
+        )
+        return entries
+    
+    def _grow(
+        self,
+        anchors: Dict[Tuple[int, int], int],
+        rows: Dict[Tuple[int, int], Dict],
+        texts: Dict[str, str],
+        selected: Dict[Tuple[int, int], str],
+        window: int,
+        budget: int
+    ) -> int:
+        """Add neighbours nearest-first, round-robin in rank order; return how many were added."""
+        # Neighbours of each anchor on each side, nearest first; chunk indexes
+        # dropped by the chunk filter leave gaps that do not stop a window
+        sides = []
+        for (doc_id, index), _ in sorted(anchors.items(), key=lambda item: item[1]):
+            left = [(doc_id, i) for i in range(index - 1, index - window - 1, -1) if (doc_id, i) in rows]
+            right = [(doc_id, i) for i in range(index + 1, index + window + 1) if (doc_id, i) in rows]
+            sides += [left, right]
+        
+        added = 0
+        for step in range(window):
+            for side in sides:
+                if step >= len(side) or side[step] in selected:
+                    continue
+                # Windows stay contiguous: the next-nearer neighbour must already be in
+                if step and side[step - 1] not in selected:
+                    continue
+                text = texts.get(rows[side[step]]["text_hash"])
+                if not text or estimate_tokens(text) > budget:
+                    continue
+                selected[side[step]] = text
+                budget -= estimate_tokens(text)
+                added += 1
+        return added
+    
+    def _merge(
+        self,
+        hits: List[Dict[str, Any]],
+        anchors: Dict[Tuple[int, int], int],
+        rows: Dict[Tuple[int, int], Dict],
+        selected: Dict[Tuple[int, int], str],
+        ranges: List[Tuple[int, int, int]]
+    ) -> List[Dict[str, Any]]:
+        """Group selected chunks into contiguous windows and build one entry per window."""
+        covered = {(doc_id, i) for doc_id, first, last in ranges for i in range(first, last + 1)}
+        
+        def contiguous(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+            # Same document, and every index in between is a selected chunk or has no active row
+            return a[0] == b[0] and all(
+                (a[0], i) in covered and ((a[0], i) in selected or (a[0], i) not in rows)
+                for i in range(a[1] + 1, b[1])
+            )
+        
+        windows: List[List[Tuple[int, int]]] = []
+        for key in sorted(selected):
+            if windows and contiguous(windows[-1][-1], key):
+                windows[-1].append(key)
+            else:
+                windows.append([key])
+        
+        entries: Dict[int, Dict[str, Any]] = {}  # rank of the window's best hit → entry
+        for keys in windows:
+            ranks = sorted(anchors[key] for key in keys if key in anchors)
+            best = hits[ranks[0]]
+            
+            text = selected[keys[0]]
+            for key in keys[1:]:
+                text = join_overlapping(text, selected[key], self.max_overlap)
+            
+            entry = dict(best)
+            entry["chunk_text"] = text
+            entry["chunk_ids"] = [rows[key]["chunk_id"] if key in rows else hits[anchors[key]]["id"] for key in keys]
+            entry["hit_ids"] = [hits[rank]["id"] for rank in ranks]
+            entry["pages"] = sorted({rows[key]["page_number"] if key in rows else hits[anchors[key]].get("page_number")
+                                     for key in keys} - {None})
+            entry["window"] = [keys[0][1], keys[-1][1]]
+            entries[ranks[0]] = entry
+        
+        # Hits merged into a better-ranked window are dropped; the rest keep their place
+        merged = set(anchors.values()) - set(entries)
+        return [entries.get(rank, hit) for rank, hit in enumerate(hits) if rank not in merged]
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from app.db.sqlite_manager import SQLiteManager
+    from app.db.chunk_text_store import ChunkTextStore
+    from app.ingestion.chunk_hasher import text_digest
+    from app.ingestion.chunker import Chunker
+    
+    print("=== Context Window Test ===\n")
+    
+    db = SQLiteManager(os.path.join(tempfile.mkdtemp(), "context_test.db"))
+    store = ChunkTextStore(db)
+    
+    # One document: two pages of overlapping text chunks and a table chunk
+    sentences = [f"Sentence {i} of the annual report discusses topic {i % 7}." for i in range(60)]
+    chunker = Chunker(text_chunk_size=200, text_chunk_overlap=50)
+    chunks = chunker.chunk_text([
+        {"page_number": 1, "text": " ".join(sentences[:30])},
+        {"page_number": 2, "text": " ".join(sentences[30:])},
+    ])
+    chunks += chunker.chunk_tables([{"page_number": 2, "table_index": 0, "table_string": "| a | b |\n| 1 | 2 |"}],
+                                   start_index=len(chunks))
+    
+    doc_id = db.insert_document("report.pdf", "alice", "hash-v1", version=1, status="completed")
+    for chunk in chunks:
+        chunk.chunk_hash = f"h{chunk.chunk_index:03d}"
+        chunk.text_hash = text_digest(chunk.chunk_text)
+        chunk.hash_algorithm, chunk.normalization_version = "sha256", 2
+        chunk.chunk_id = f"report_v1_chunk{chunk.chunk_index}"
+        chunk.source, chunk.username, chunk.version = "report.pdf", "alice", 1
+    db.insert_chunk_records(doc_id, chunks)
+    store.put_chunks(chunks)
+    text_count = sum(chunk.content_type == "text" for chunk in chunks)
+    print(f"Document: {text_count} text chunks + 1 table chunk")
+    
+    def hit(index):
+        chunk = chunks[index]
+        return {"id": chunk.chunk_id, "score": 1.0 - index / 100, "source": "report.pdf",
+                "page_number": chunk.page_number, "content_type": chunk.content_type, "chunk_text": chunk.chunk_text}
+    
+    expander = ContextExpander(db, store, window=1, token_budget=10_000, max_overlap=50)
+    
+    # A single hit grows to its two neighbours, without repeating the overlap
+    [entry] = expander.expand([hit(5)], "alice")
+    assert entry["window"] == [4, 6] and entry["hit_ids"] == [chunks[5].chunk_id]
+    assert entry["chunk_text"].startswith(chunks[4].chunk_text) and entry["chunk_text"].endswith(chunks[6].chunk_text)
+    assert len(entry["chunk_text"]) < sum(len(chunks[i].chunk_text) + 1 for i in (4, 5, 6))
+    print(f"✅ ±1 window: chunks {entry['window']} ({len(entry['chunk_text'])} chars, "
+          f"vs {sum(len(chunks[i].chunk_text) for i in (4, 5, 6))} concatenated)")
+    
+    # Overlapping windows merge into one entry at the better hit's rank
+    entries = expander.expand([hit(9), hit(text_count), hit(7)], "alice")
+    assert [e.get("window") for e in entries] == [[6, 10], None]
+    assert entries[0]["hit_ids"] == [chunks[9].chunk_id, chunks[7].chunk_id]
+    assert entries[1]["content_type"] == "table"
+    print(f"✅ Hits 9 and 7 merged into window {entries[0]['window']}; table hit returned as is")
+    
+    # The token budget limits growth, best hit first; hits themselves are kept
+    base = estimate_tokens(chunks[3].chunk_text) + estimate_tokens(chunks[12].chunk_text)
+    tight = base + estimate_tokens(chunks[2].chunk_text) + 1
+    entries = expander.expand([hit(3), hit(12)], "alice", window=2, token_budget=tight)
+    assert entries[0]["window"] == [2, 3] and entries[1]["window"] == [12, 12]
+    assert sum(estimate_tokens(e["chunk_text"]) for e in entries) <= tight
+    print(f"✅ Budget of {tight} tokens: windows {[e['window'] for e in entries]}")
+    
+    assert expander.expand([hit(3)], "alice", window=0) == [hit(3)]
+    assert expander.expand([hit(3)], "bob") == [hit(3)]
+    print("✅ Window 0 and unknown chunks leave hits unchanged")
+    
+    print("\n✅ All tests passed!")
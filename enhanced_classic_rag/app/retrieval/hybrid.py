@@ -0,0 +1,269 @@
+"""
+Hybrid Retriever — dense (Pinecone) + lexical (FTS5 BM25) retrieval with reciprocal-rank fusion.
+
+Both retrievers run concurrently for the same query, namespace and metadata
+filter; their rankings are merged with reciprocal-rank fusion (RRF):
+
+    score(chunk) = Σ over retrievers  1 / (k + rank)
+
+RRF needs no score calibration between BM25 and cosine similarity, and a
+chunk ranked highly by either retriever surfaces — exact identifiers via the
+lexical side, paraphrases via the dense side — without raising top_k.
+
+benchmark() measures recall@k, MRR and latency of any set of retrievers on a
+labelled query set (`python main.py benchmark-retrieval`); running this module
+does the same on a synthetic corpus.
+"""
+
+import time
+import asyncio
+import logging
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.retrieval.lexical_index import LexicalIndex
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    k: int = 60,
+    top_k: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked hit lists with reciprocal-rank fusion.
+    
+    Args:
+        rankings: Retriever name → hits in rank order (each with an 'id').
+        k: RRF constant; larger values flatten the advantage of top ranks.
+        top_k: Number of fused results to return.
+    
+    Returns:
+        Hits ordered by fused score. Each is the first retriever's hit with
+        'score' set to the RRF score and 'ranks' mapping retriever → 1-based rank.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    
+    for name, hits in rankings.items():
+        for rank, hit in enumerate(hits, 1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = fused[hit["id"]] = {**hit, "score": 0.0, "ranks": {}}
+            entry["score"] += 1.0 / (k + rank)
+            entry["ranks"][name] = rank
+    
+    ordered = sorted(fused.values(), key=lambda hit: (-hit["score"], min(hit["ranks"].values())))
+    return ordered[:top_k]
+
+
+class HybridRetriever:
+    """Runs dense and lexical retrieval concurrently and fuses the rankings."""
+    
+    def __init__(self, vector_store, lexical_index: LexicalIndex, rrf_k: int = 60):
+        """
+        Initialize hybrid retriever.
+        
+        Args:
+            vector_store: VectorStore for dense retrieval.
+            lexical_index: LexicalIndex for BM25 retrieval.
+            rrf_k: Reciprocal-rank fusion constant.
+        """
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lexical")
+    
+    def _fuse(self, dense: List[Dict], lexical: List[Dict], top_k: int, namespace: str) -> List[Dict]:
+        hits = reciprocal_rank_fusion({"dense": dense, "lexical": lexical}, k=self.rrf_k, top_k=top_k)
+        logger.info(
+            f"Hybrid search in namespace '{namespace}': {len(dense)} dense + {len(lexical)} lexical "
+            f"→ {len(hits)} fused results"
+        )
+        return hits
+    
+    def search(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Hybrid search: both retrievers fetch top_k candidates concurrently, RRF picks top_k.
+        
+        Args:
+            query: Search query.
+            namespace: Namespace to search in.
+            top_k: Number of results to return.
+            metadata_filter: Pinecone metadata filter, applied by both retrievers.
+        
+        Returns:
+            Fused results with metadata, RRF 'score' and per-retriever 'ranks'.
+        """
+        lexical = self._pool.submit(self.lexical_index.search, query, namespace, top_k, metadata_filter)
+        dense = self.vector_store.search(query, namespace, top_k, metadata_filter)
+        return self._fuse(dense, lexical.result(), top_k, namespace)
+    
+    async def asearch(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Hybrid search without blocking the event loop (see search())."""
+        dense, lexical = await asyncio.gather(
+            self.vector_store.asearch(query, namespace, top_k, metadata_filter),
+            asyncio.to_thread(self.lexical_index.search, query, namespace, top_k, metadata_filter)
+        )
+        return self._fuse(dense, lexical, top_k, namespace)
+
+
+def benchmark(
+    retrievers: Dict[str, Callable[[str], List[Dict[str, Any]]]],
+    queries: List[Dict[str, Any]],
+    k: int = 5
+) -> Dict[str, Dict[str, float]]:
+    """
+    Measure retrieval quality and latency on a labelled query set.
+    
+    Args:
+        retrievers: Name → callable(query) returning ranked hits (with 'id').
+        queries: Dictionaries with 'query' and 'relevant' (list of relevant chunk IDs).
+        k: Cut-off for recall and MRR.
+    
+    Returns:
+        Name → {"recall": mean recall@k, "mrr": mean reciprocal rank@k,
+        "p50_ms": ..., "p95_ms": ...}.
+    """
+    report = {}
+    
+    for name, retrieve in retrievers.items():
+        recalls, reciprocal_ranks, latencies = [], [], []
+        
+        for item in queries:
+            relevant = set(item["relevant"])
+            start = time.perf_counter()
+            ids = [hit["id"] for hit in retrieve(item["query"])][:k]
+            latencies.append((time.perf_counter() - start) * 1000)
+            
+            recalls.append(len(relevant.intersection(ids)) / len(relevant) if relevant else 0.0)
+            first = next((rank for rank, chunk_id in enumerate(ids, 1) if chunk_id in relevant), None)
+            reciprocal_ranks.append(1.0 / first if first else 0.0)
+        
+        latencies.sort()
+        report[name] = {
+            "recall": round(statistics.mean(recalls), 4),
+            "mrr": round(statistics.mean(reciprocal_ranks), 4),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        }
+    return report
+
+
+def print_benchmark(report: Dict[str, Dict[str, float]], k: int) -> None:
+    """Print a benchmark() report as a table."""
+    print(f"{'retriever':24s}{f'recall@{k}':>11s}{'MRR':>8s}{'p50 ms':>9s}{'p95 ms':>9s}")
+    for name, row in report.items():
+        print(f"{name:24s}{row['recall']:11.3f}{row['mrr']:8.3f}{row['p50_ms']:9.1f}{row['p95_ms']:9.1f}")
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+    from collections import Counter
+    from app.db.sqlite_manager import SQLiteManager
+    from app.db.chunk_text_store import ChunkTextStore
+    from app.ingestion.chunk_record import ChunkRecord
+    
+    print("=== Hybrid Retrieval Test ===\n")
+    
+    # RRF: a chunk ranked well by both retrievers beats one ranked first by only one
+    fused = reciprocal_rank_fusion(
+        {"dense": [{"id": "a"}, {"id": "b"}, {"id": "c"}], "lexical": [{"id": "d"}, {"id": "b"}]},
+        k=60, top_k=3
+    )
+    assert [hit["id"] for hit in fused] == ["b", "a", "d"] and fused[0]["ranks"] == {"dense": 2, "lexical": 2}
+    print(f"✅ RRF order: {[hit['id'] for hit in fused]}")
+    
+    # Synthetic benchmark: invoice chunks with unique IDs + topical chunks.
+    # The simulated dense retriever matches synonyms but (like embedding models)
+    # cannot tell identifiers apart; the lexical index is the real FTS5 index.
+    random.seed(7)
+    synonyms = {
+        "revenue": "sales", "profit": "earnings", "cost": "expense", "employee": "staff",
+        "customer": "client", "contract": "agreement", "growth": "increase", "risk": "exposure",
+        "market": "sector", "forecast": "projection", "supplier": "vendor", "debt": "liabilities",
+        "quarter": "period", "margin": "spread", "product": "offering", "region": "territory",
+    }
+    canonical = {**{word: word for word in synonyms}, **{syn: word for word, syn in synonyms.items()}}
+    filler = "the company reported during this year with significant strategic operational results".split()
+    
+    chunks, queries = [], []
+    for i in range(150):
+        invoice = f"INV-{10000 + i * 37}"
+        chunks.append((f"inv_{i}", f"Invoice {invoice} for consulting services was issued to the client and paid."))
+        if i % 3 == 0:
+            queries.append({"query": f"status of invoice {invoice}", "relevant": [f"inv_{i}"]})
+    for i in range(150):
+        words = random.sample(list(synonyms), 4)
+        chunks.append((f"topic_{i}", " ".join(words + random.sample(filler, 6)) + "."))
+        if i % 3 == 0:
+            queries.append({"query": " ".join(synonyms[word] for word in words[:3]), "relevant": [f"topic_{i}"]})
+    
+    def bag(text: str) -> Counter:
+        tokens = [token.strip(".,?").lower() for token in text.split()]
+        return Counter(canonical.get(token, token) for token in tokens if not any(ch.isdigit() for ch in token))
+    
+    bags = {chunk_id: bag(text) for chunk_id, text in chunks}
+    texts = dict(chunks)
+    
+    class SimulatedDense:
+        """Bag-of-concepts cosine with ~40 ms network latency."""
+        
+        def search(self, query, namespace, top_k=10, metadata_filter=None):
+            time.sleep(0.04)
+            q = bag(query)
+            scored = []
+            for chunk_id, vector in bags.items():
+                dot = sum(q[token] * vector[token] for token in q)
+                norm = (sum(v * v for v in q.values()) * sum(v * v for v in vector.values())) ** 0.5 or 1
+                scored.append((dot / norm, chunk_id))
+            scored.sort(key=lambda pair: (-pair[0], pair[1]))
+            return [{"id": chunk_id, "score": score, "chunk_text": texts[chunk_id]} for score, chunk_id in scored[:top_k]]
+    
+    db = SQLiteManager(os.path.join(tempfile.mkdtemp(), "hybrid_test.db"))
+    text_store = ChunkTextStore(db)
+    lexical = LexicalIndex(db, text_store)
+    records = []
+    for chunk_id, text in chunks:
+        record = ChunkRecord(text, page_number=1)
+        record.chunk_id, record.source, record.version, record.date = chunk_id, "corpus.pdf", 1, "2024-05-01T00:00:00"
+        record.chunk_hash = chunk_id
+        records.append(record)
+    text_store.put_chunks(records)
+    lexical.add_chunks("bench", records)
+    
+    dense = SimulatedDense()
+    hybrid = HybridRetriever(dense, lexical)
+    k = 5
+    report = benchmark({
+        f"dense top_k={k}": lambda q: dense.search(q, "bench", k),
+        f"lexical top_k={k}": lambda q: lexical.search(q, "bench", k),
+        f"hybrid top_k={k} (RRF)": lambda q: hybrid.search(q, "bench", k),
+    }, queries, k=k)
+    
+    print(f"\nSynthetic benchmark: {len(chunks)} chunks, {len(queries)} queries "
+          f"(half exact invoice IDs, half paraphrases)\n")
+    print_benchmark(report, k)
+    
+    hybrid_row, dense_row = report[f"hybrid top_k={k} (RRF)"], report[f"dense top_k={k}"]
+    assert hybrid_row["recall"] > dense_row["recall"] and hybrid_row["recall"] >= report[f"lexical top_k={k}"]["recall"]
+    assert hybrid_row["p50_ms"] < dense_row["p50_ms"] + 20  # lexical runs alongside the dense call
+    print(f"\n✅ Hybrid recall@{k} {hybrid_row['recall']:.2f} vs dense {dense_row['recall']:.2f}, "
+          f"+{hybrid_row['p50_ms'] - dense_row['p50_ms']:.1f} ms p50")
+    
+    print("\n✅ All tests passed!")
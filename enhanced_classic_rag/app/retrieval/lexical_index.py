@@ -0,0 +1,657 @@
+"""
+Lexical Index — SQLite FTS5 (BM25) index of chunk text, per namespace.
+
+Dense retrieval handles paraphrases well but misses exact tokens such as
+ticker symbols, invoice numbers or clause IDs; the lexical index answers
+those with BM25 over the same chunks. It lives in the metadata database:
+
+    lexical_chunks (
+        id INTEGER PRIMARY KEY,  -- FTS rowid
+        username TEXT,           -- namespace
+        chunk_id TEXT,           -- Pinecone record ID, unique per namespace
+        chunk_hash TEXT,         -- ChunkHasher hash (returned on hits)
+        text_hash TEXT,          -- key of the indexed text in the chunk text store
+        source TEXT,
+        version INTEGER,
+        page_number INTEGER,
+        content_type TEXT,
+        table_index INTEGER,
+        date TEXT,
+        timestamp INTEGER
+    )
+    lexical_namespaces (
+        id INTEGER PRIMARY KEY,  -- FTS table of the namespace: lexical_fts_<id>
+        username TEXT UNIQUE
+    )
+    lexical_fts_<id>             -- contentless FTS5 (content=''), one per namespace
+
+Each namespace has its own FTS5 table, so BM25 statistics (document count,
+average length, term frequencies) are per namespace and a query only reads
+that namespace's postings. The tables are contentless: chunk text is stored
+once, compressed, in the chunk text store (ChunkTextStore), and the index
+keeps only its postings. Text is indexed as read back from the store, and
+FTS5 needs the same text again to delete an entry, which is also read from
+the store by the entry's text hash. Hits carry the text hash and no text;
+they are hydrated from the store like vector search hits.
+
+The pipeline writes it in the same transaction that commits a document
+version (added chunks inserted, removed chunks deleted, retained chunks
+re-stamped with their page, version and date; their indexed text is kept,
+like the text of their chunk row), so it always holds exactly
+the chunks of active versions — the same set as the Pinecone namespace.
+Chunks ingested before the index existed are copied from Pinecone with
+`python main.py lexical-backfill`; an index in the earlier layout (one
+global FTS table over an uncompressed text copy) is converted on startup.
+"""
+
+import re
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.db.sqlite_manager import SQLiteManager
+from app.db.chunk_text_store import ChunkTextStore
+from app.db.migrations import ensure_column
+from app.ingestion.chunk_hasher import text_digest
+from app.ingestion.chunk_record import ChunkRecord
+
+logger = logging.getLogger(__name__)
+
+# Metadata filter fields (see app.vectorstore.search_filter) → lexical_chunks columns
+FILTER_COLUMNS = {
+    "source": "source",
+    "version": "version",
+    "content_type": "content_type",
+    "timestamp": "timestamp",
+    "page_number": "page_number",
+}
+FILTER_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# Identifiers stay whole ("INV-2024-001", "AAPL.O", "4.2(b)") so they match as phrases
+TERM_PATTERN = re.compile(r"\w+(?:[-./:()]\w+\)?)*")
+
+
+def to_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression: each term quoted as a phrase, OR-ed.
+    
+    Quoting neutralizes FTS5 syntax in user input (AND/NEAR/column filters/quotes);
+    BM25 then ranks chunks containing more (and rarer) terms first.
+    
+    Returns:
+        The MATCH expression, or None if the query has no searchable terms.
+    """
+    terms = list(dict.fromkeys(term.lower() for term in TERM_PATTERN.findall(query)))
+    if not terms:
+        return None
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def filter_sql(metadata_filter: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """
+    Translate a Pinecone metadata filter into a SQL condition on lexical_chunks (alias c).
+    
+    Supports the filters built by search_filter.build_filter ($and / $or of
+    $eq/$in/range conditions on source, version, content_type, timestamp and
+    page_number), so both retrievers of a hybrid search see the same subset.
+    
+    Returns:
+        (sql, params), e.g. ("c.source = ? AND c.page_number >= ?", ["a.pdf", 3]).
+    
+    Raises:
+        ValueError: On unsupported fields or operators.
+    """
+    if not metadata_filter:
+        return "1", []
+    
+    clauses, params = [], []
+    for condition in metadata_filter.get("$and", [metadata_filter]):
+        for field, ops in condition.items():
+            if field in ("$and", "$or"):
+                subclauses = []
+                for sub in ops:
+                    sub_sql, sub_params = filter_sql(sub)
+                    subclauses.append(f"({sub_sql})")
+                    params.extend(sub_params)
+                clauses.append("(" + f" {field[1:].upper()} ".join(subclauses) + ")")
+                continue
+            if field not in FILTER_COLUMNS:
+                raise ValueError(f"Lexical search cannot filter on '{field}'")
+            column = f"c.{FILTER_COLUMNS[field]}"
+            if not isinstance(ops, dict):
+                ops = {"$eq": ops}
+            
+            for op, value in ops.items():
+                if op in ("$in", "$nin"):
+                    values = list(value)
+                    clauses.append(f"{column} {'NOT IN' if op == '$nin' else 'IN'} ({', '.join('?' * len(values))})")
+                    params.extend(values)
+                elif op in FILTER_OPERATORS:
+                    clauses.append(f"{column} {FILTER_OPERATORS[op]} ?")
+                    params.append(value)
+                else:
+                    raise ValueError(f"Lexical search does not support filter operator '{op}'")
+    
+    return " AND ".join(clauses) or "1", params
+
+
+class LexicalIndex:
+    """BM25 keyword index of active chunks, one contentless FTS5 table per namespace."""
+    
+    def __init__(self, db_manager: SQLiteManager, text_store: ChunkTextStore):
+        """
+        Initialize lexical index (creates its tables if needed).
+        
+        Args:
+            db_manager: Metadata database manager; the index shares its connections
+                        and transactions.
+            text_store: Chunk text store the indexed text is read from.
+        
+        Raises:
+            RuntimeError: If the SQLite library was built without FTS5.
+        """
+        self.db_manager = db_manager
+        self.text_store = text_store
+        self.ensure_schema()
+    
+    def ensure_schema(self) -> None:
+        """Create the lexical tables (converting an index in the earlier layout)."""
+        with self.db_manager.transaction() as conn:
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.lexical_probe USING fts5(x, content='')")
+                conn.execute("DROP TABLE temp.lexical_probe")
+            except Exception as e:
+                raise RuntimeError(
+                    f"SQLite FTS5 is not available ({e}); set LEXICAL_INDEX_ENABLED=false"
+                ) from e
+            
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(lexical_chunks)")}
+            legacy = "chunk_text" in columns
+            if legacy:
+                for trigger in ("lexical_chunks_ai", "lexical_chunks_ad", "lexical_chunks_au"):
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.execute("DROP TABLE IF EXISTS lexical_fts")
+                conn.execute("ALTER TABLE lexical_chunks RENAME TO lexical_chunks_legacy")
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_chunks (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    text_hash TEXT,
+                    source TEXT,
+                    version INTEGER,
+                    page_number INTEGER,
+                    content_type TEXT,
+                    table_index INTEGER,
+                    date TEXT,
+                    timestamp INTEGER,
+                    UNIQUE (username, chunk_id)
+                )
+            """)
+            if ensure_column(conn, "lexical_chunks", "text_hash", "TEXT"):
+                # Entries indexed when texts were keyed by chunk hash used their chunk row's text
+                conn.execute("""
+                    UPDATE lexical_chunks
+                    SET text_hash = (
+                        SELECT dc.text_hash FROM document_chunks dc
+                        WHERE dc.username = lexical_chunks.username
+                          AND dc.chunk_id = lexical_chunks.chunk_id AND dc.is_active = 1
+                    )
+                """)
+            # Compaction keeps the texts of indexed chunks (see Compactor.purge_expired)
+            conn.execute("DROP INDEX IF EXISTS idx_lexical_chunks_hash")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_lexical_chunks_text ON lexical_chunks (text_hash)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_namespaces (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT NOT NULL UNIQUE
+                )
+            """)
+            
+            if legacy:
+                self._convert_legacy(conn)
+    
+    def _convert_legacy(self, conn) -> None:
+        """Move an index in the earlier layout (global FTS table over a text copy) to this one."""
+        rows = conn.execute("""
+            SELECT l.username, l.chunk_id, dc.chunk_hash, l.source, l.version, l.page_number,
+                   l.content_type, l.table_index, l.date, l.timestamp, l.chunk_text
+            FROM lexical_chunks_legacy l
+            JOIN document_chunks dc
+              ON dc.username = l.username AND dc.chunk_id = l.chunk_id AND dc.is_active = 1
+            ORDER BY l.username, l.id
+        """).fetchall()
+        
+        keys = self.text_store.put(row["chunk_text"] for row in rows)
+        by_user: Dict[str, List[Tuple]] = {}
+        for row in rows:
+            by_user.setdefault(row["username"], []).append(
+                (row["chunk_id"], row["chunk_hash"], keys[row["chunk_text"]], *tuple(row)[3:10])
+            )
+        for username, user_rows in by_user.items():
+            self._insert_rows(username, user_rows)
+        
+        conn.execute("DROP TABLE lexical_chunks_legacy")
+        logger.info(f"Converted lexical index to per-namespace contentless FTS5 ({len(rows)} chunks)")
+    
+    # ── Namespaces ───────────────────────────────────────────────────────
+    
+    def _fts_table(self, conn, username: str, create: bool = False) -> Optional[str]:
+        """Name of a namespace's FTS5 table; None if it has none (and `create` is off)."""
+        row = conn.execute("SELECT id FROM lexical_namespaces WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            if not create:
+                return None
+            namespace_id = conn.execute(
+                "INSERT INTO lexical_namespaces (username) VALUES (?)", (username,)
+            ).lastrowid
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE lexical_fts_{namespace_id} USING fts5(
+                    chunk_text,
+                    content='',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            return f"lexical_fts_{namespace_id}"
+        return f"lexical_fts_{row['id']}"
+    
+    def _index_text(self, conn, fts: str, entries: List[Tuple[int, str]], delete: bool = False) -> int:
+        """
+        Add (or delete) FTS entries for (rowid, text_hash) pairs, with text from the store.
+        
+        A contentless table deletes an entry by tokenizing its original text
+        again. If that text is gone, the entry's postings stay behind; they
+        never surface (search joins lexical_chunks) but still count in BM25
+        statistics until the namespace is re-indexed.
+        
+        Returns:
+            Number of entries whose text was found.
+        """
+        if not entries:
+            return 0
+        
+        texts = self.text_store.get_many(text_hash for _, text_hash in entries)
+        found = [(rowid, texts[text_hash]) for rowid, text_hash in entries if text_hash in texts]
+        if delete:
+            conn.executemany(f"INSERT INTO {fts}({fts}, rowid, chunk_text) VALUES ('delete', ?, ?)", found)
+        else:
+            conn.executemany(f"INSERT INTO {fts}(rowid, chunk_text) VALUES (?, ?)", found)
+        
+        if len(found) < len(entries):
+            logger.warning(
+                f"{len(entries) - len(found)} chunk texts missing from the text store; "
+                f"{'their stale postings remain' if delete else 'not indexed'} in {fts}"
+            )
+        return len(found)
+    
+    # ── Writes ───────────────────────────────────────────────────────────
+    
+    def add_chunks(self, username: str, chunks: Iterable[ChunkRecord]) -> int:
+        """
+        Index chunks (replacing existing entries with the same chunk ID).
+        
+        Args:
+            username: Namespace.
+            chunks: Hashed ChunkRecords with metadata (see MetadataBuilder) whose
+                    text is already in the text store (the pipeline stores it
+                    before the upsert).
+        
+        Returns:
+            Number of chunks indexed.
+        """
+        rows = []
+        for chunk in chunks:
+            record = chunk.to_pinecone_record()
+            rows.append((
+                record["_id"],
+                record["chunk_hash"],
+                chunk.text_hash or text_digest(chunk.chunk_text),
+                record["source"],
+                record["version"],
+                record["page_number"],
+                record["content_type"],
+                record.get("table_index"),
+                record["date"],
+                record.get("timestamp"),
+            ))
+        return self._insert_rows(username, rows)
+    
+    def add_records(self, username: str, records: Iterable[Dict[str, Any]]) -> int:
+        """Index records in Pinecone field format ('_id' or 'id', 'chunk_hash', 'chunk_text', metadata fields)."""
+        records = [record for record in records if record.get("chunk_text") and record.get("chunk_hash")]
+        keys = self.text_store.put(record["chunk_text"] for record in records)
+        
+        rows = [
+            (
+                record.get("_id") or record["id"],
+                record["chunk_hash"],
+                keys[record["chunk_text"]],
+                record.get("source"),
+                record.get("version"),
+                record.get("page_number"),
+                record.get("content_type"),
+                record.get("table_index"),
+                record.get("date"),
+                record.get("timestamp"),
+            )
+            for record in records
+        ]
+        return self._insert_rows(username, rows)
+    
+    def _insert_rows(self, username: str, rows: List[Tuple]) -> int:
+        """Upsert (chunk_id, chunk_hash, text_hash, metadata...) rows; text is re-indexed only if it changed."""
+        if not rows:
+            return 0
+        
+        with self.db_manager.transaction() as conn:
+            fts = self._fts_table(conn, username, create=True)
+            
+            stale, fresh = [], []
+            for row in rows:
+                chunk_id, text_hash = row[0], row[2]
+                existing = conn.execute(
+                    "SELECT id, text_hash FROM lexical_chunks WHERE username = ? AND chunk_id = ?",
+                    (username, chunk_id)
+                ).fetchone()
+                if existing is not None and existing["text_hash"] == text_hash:
+                    conn.execute("""
+                        UPDATE lexical_chunks
+                        SET chunk_hash = ?, source = ?, version = ?, page_number = ?, content_type = ?,
+                            table_index = ?, date = ?, timestamp = ?
+                        WHERE id = ?
+                    """, (row[1], *row[3:], existing["id"]))
+                    continue
+                if existing is not None:
+                    stale.append((existing["id"], existing["text_hash"]))
+                    conn.execute("DELETE FROM lexical_chunks WHERE id = ?", (existing["id"],))
+                rowid = conn.execute("""
+                    INSERT INTO lexical_chunks
+                    (username, chunk_id, chunk_hash, text_hash, source, version, page_number, content_type,
+                     table_index, date, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (username, *row)).lastrowid
+                fresh.append((rowid, text_hash))
+            
+            self._index_text(conn, fts, stale, delete=True)
+            self._index_text(conn, fts, fresh)
+        
+        logger.info(f"Indexed {len(rows)} chunks for lexical search in '{username}' ({len(fresh)} tokenized)")
+        return len(rows)
+    
+    def remove_chunks(self, username: str, chunk_ids: List[str]) -> int:
+        """Remove chunks from the index; returns the number removed."""
+        if not chunk_ids:
+            return 0
+        
+        with self.db_manager.transaction() as conn:
+            fts = self._fts_table(conn, username)
+            if fts is None:
+                return 0
+            
+            entries = []
+            for chunk_id in chunk_ids:
+                row = conn.execute(
+                    "SELECT id, text_hash FROM lexical_chunks WHERE username = ? AND chunk_id = ?",
+                    (username, chunk_id)
+                ).fetchone()
+                if row is not None:
+                    entries.append((row["id"], row["text_hash"]))
+            
+            self._index_text(conn, fts, entries, delete=True)
+            conn.executemany("DELETE FROM lexical_chunks WHERE id = ?", [(rowid,) for rowid, _ in entries])
+            return len(entries)
+    
+    def update_carried(
+        self,
+        username: str,
+        carried: List[Tuple[str, str, int]],
+        version: int,
+        date: str
+    ) -> int:
+        """
+        Re-stamp chunks carried forward to a new document version.
+        
+        The indexed text is kept (as is the text of the chunk row), so no
+        entry is re-tokenized; only the hash of entries stored under a legacy
+        scheme is rewritten.
+        
+        Args:
+            username: Namespace.
+            carried: (chunk_id, chunk_hash, page_number) with the chunks' new hash
+                (rewritten when a legacy hash scheme is upgraded) and page.
+            version: New document version.
+            date: Ingestion date (ISO) of the new version.
+        
+        Returns:
+            Number of chunks updated.
+        """
+        if not carried:
+            return 0
+        
+        timestamp = int(datetime.fromisoformat(date).timestamp())
+        with self.db_manager.transaction() as conn:
+            fts = self._fts_table(conn, username)
+            if fts is None:
+                return 0
+            
+            return conn.executemany("""
+                UPDATE lexical_chunks SET chunk_hash = ?, page_number = ?, version = ?, date = ?, timestamp = ?
+                WHERE username = ? AND chunk_id = ?
+            """, [
+                (chunk_hash, page_number, version, date, timestamp, username, chunk_id)
+                for chunk_id, chunk_hash, page_number in carried
+            ]).rowcount
+    
+    # ── Reads ────────────────────────────────────────────────────────────
+    
+    def search(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 keyword search within a namespace.
+        
+        Args:
+            query: Search query (free text; FTS5 syntax is escaped).
+            namespace: Namespace (username) to search in.
+            top_k: Number of results to return.
+            metadata_filter: Pinecone metadata filter (see filter_sql).
+        
+        Returns:
+            Results shaped like text-free PineconeManager.search hits, plus the
+            'text_hash' of the indexed text; 'chunk_text' is empty (hydrate
+            them from the chunk text store);
+            'score' is the BM25 score (higher is better).
+        """
+        match = to_match_query(query)
+        if match is None:
+            return []
+        
+        condition, params = filter_sql(metadata_filter)
+        
+        with self.db_manager.transaction() as conn:
+            fts = self._fts_table(conn, namespace)
+            if fts is None:
+                return []
+            rows = conn.execute(f"""
+                SELECT c.chunk_id, c.chunk_hash, c.text_hash, c.source, c.version, c.page_number, c.content_type,
+                       c.table_index, c.date, bm25({fts}) AS rank
+                FROM {fts}
+                JOIN lexical_chunks c ON c.id = {fts}.rowid
+                WHERE {fts} MATCH ?
+                AND {condition}
+                ORDER BY rank
+                LIMIT ?
+            """, [match, *params, top_k]).fetchall()
+        
+        return [
+            {
+                "id": row["chunk_id"],
+                "score": -row["rank"],
+                "chunk_text": "",
+                "chunk_hash": row["chunk_hash"],
+                "text_hash": row["text_hash"],
+                "source": row["source"] or "",
+                "page_number": row["page_number"] or 0,
+                "content_type": row["content_type"] or "",
+                "version": row["version"] or 1,
+                "date": row["date"] or "",
+                "table_index": row["table_index"],
+            }
+            for row in rows
+        ]
+    
+    def missing_chunks(self, username: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """
+        Active chunks (per the metadata database) that are not indexed yet.
+        
+        Returns:
+            List of (username, chunk_id, chunk_hash), grouped by username.
+        """
+        sql = """
+            SELECT dc.username, dc.chunk_id, dc.chunk_hash
+            FROM document_chunks dc
+            WHERE dc.is_active = 1
+            AND NOT EXISTS (
+                SELECT 1 FROM lexical_chunks c
+                WHERE c.username = dc.username AND c.chunk_id = dc.chunk_id
+            )
+        """
+        params: List[Any] = []
+        if username:
+            sql += " AND dc.username = ?"
+            params.append(username)
+        sql += " ORDER BY dc.username, dc.id"
+        
+        with self.db_manager.transaction() as conn:
+            return [(row["username"], row["chunk_id"], row["chunk_hash"]) for row in conn.execute(sql, params)]
+    
+    def backfill(self, vector_store, username: Optional[str] = None, batch_size: int = 100) -> Dict[str, int]:
+        """
+        Index active chunks that predate the lexical index, fetching their metadata from Pinecone.
+        
+        Safe to re-run: only chunks still missing from the index are fetched.
+        Chunk hashes come from the metadata database; texts fetched along
+        with the records are put in the text store if they are not there yet.
+        
+        Args:
+            vector_store: VectorStore to fetch records from.
+            username: Restrict to one namespace.
+            batch_size: Records fetched per request.
+        
+        Returns:
+            Dictionary with 'missing', 'indexed' and 'not_found' counts.
+        """
+        missing = self.missing_chunks(username)
+        report = {"missing": len(missing), "indexed": 0, "not_found": 0}
+        
+        by_user: Dict[str, Dict[str, str]] = {}
+        for user, chunk_id, chunk_hash in missing:
+            by_user.setdefault(user, {})[chunk_id] = chunk_hash
+        
+        for user, hashes in by_user.items():
+            chunk_ids = list(hashes)
+            for i in range(0, len(chunk_ids), batch_size):
+                batch = chunk_ids[i:i + batch_size]
+                records = vector_store.fetch_records(batch, user)
+                for record in records:
+                    record["chunk_hash"] = hashes[record.get("_id") or record["id"]]
+                report["indexed"] += self.add_records(user, records)
+                report["not_found"] += len(batch) - len(records)
+        
+        logger.info(
+            f"✅ Lexical backfill: {report['indexed']}/{report['missing']} chunks indexed "
+            f"({report['not_found']} not found in Pinecone)"
+        )
+        return report
+    
+    def count(self, username: Optional[str] = None) -> int:
+        """Number of indexed chunks (in one namespace, or in total)."""
+        with self.db_manager.transaction() as conn:
+            if username:
+                return conn.execute(
+                    "SELECT COUNT(*) FROM lexical_chunks WHERE username = ?", (username,)
+                ).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM lexical_chunks").fetchone()[0]
+
+
+if __name__ == "__main__":
+    import os
+    import hashlib
+    import tempfile
+    
+    print("=== Lexical Index Test ===\n")
+    
+    db = SQLiteManager(os.path.join(tempfile.mkdtemp(), "lexical_test.db"))
+    text_store = ChunkTextStore(db)
+    index = LexicalIndex(db, text_store)
+    
+    def make_chunk(chunk_id, text, page, content_type="text", source="report.pdf"):
+        chunk = ChunkRecord(text, page_number=page, content_type=content_type)
+        chunk.chunk_hash = hashlib.sha256(text.encode()).hexdigest()
+        chunk.text_hash = text_digest(text)
+        chunk.chunk_id = chunk_id
+        chunk.source = source
+        chunk.username = "alice"
+        chunk.version = 1
+        chunk.date = "2024-05-01T10:00:00"
+        return chunk
+    
+    def add(username, chunks):
+        text_store.put_chunks(chunks)  # the pipeline stores text before indexing
+        return index.add_chunks(username, chunks)
+    
+    def postings(username, term):
+        with db.transaction() as conn:
+            fts = index._fts_table(conn, username)
+            return conn.execute(f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?", (f'"{term}"',)).fetchone()[0]
+    
+    add("alice", [
+        make_chunk("r_c0", "Invoice INV-2024-0042 was paid on 3 March.", 1),
+        make_chunk("r_c1", "Revenue grew 12% year over year, driven by AAPL exposure.", 2),
+        make_chunk("r_c2", "Clause 4.2(b) limits liability to fees paid.", 3),
+        make_chunk("r_c3", "Ticker | Weight\n--- | ---\nAAPL | 7.1\nMSFT | 6.3", 4, "table"),
+    ])
+    add("bob", [make_chunk("r_c0", "Invoice INV-2024-0042 belongs to bob too.", 1)])
+    
+    hits = index.search("who paid INV-2024-0042?", "alice", top_k=3)
+    assert hits[0]["id"] == "r_c0" and all(hit["source"] == "report.pdf" for hit in hits)
+    assert hits[0]["chunk_text"] == "" and text_store.hydrate(hits) == []
+    assert hits[0]["chunk_text"].startswith("Invoice INV-2024-0042")
+    print(f"✅ Exact identifier: {hits[0]['id']} (score {hits[0]['score']:.3f}), text hydrated by text_hash")
+    
+    assert index.search("clause 4.2(b)", "alice", 1)[0]["id"] == "r_c2"
+    assert [hit["id"] for hit in index.search("AAPL", "alice", 5, {"content_type": {"$eq": "table"}})] == ["r_c3"]
+    assert [hit["id"] for hit in index.search("AAPL", "alice", 5, {"page_number": {"$lte": 2}})] == ["r_c1"]
+    either = {"$or": [{"content_type": {"$eq": "table"}}, {"page_number": {"$eq": 2}, "version": {"$lte": 1}}]}
+    assert sorted(hit["id"] for hit in index.search("AAPL", "alice", 5, either)) == ["r_c1", "r_c3"]
+    print("✅ Clause IDs and metadata filters")
+    
+    assert to_match_query('NEAR(" AND title:x') == '"near" OR "and" OR "title:x"'
+    assert index.search('" OR NOT *', "alice") == []
+    print("✅ FTS5 syntax in queries is escaped")
+    
+    # Namespaces have their own FTS tables (and BM25 statistics)
+    assert (postings("alice", "invoice"), postings("bob", "invoice"), postings("bob", "aapl")) == (1, 1, 0)
+    assert index.search("anything", "carol") == []
+    print("✅ One FTS table per namespace")
+    
+    add("alice", [make_chunk("r_c1", "Revenue grew 15% on services.", 2)])  # re-index
+    assert postings("alice", "aapl") == 1 and postings("alice", "services") == 1  # old text unindexed
+    assert index.search("AAPL", "alice", 5, {"page_number": {"$lte": 2}}) == []
+    assert index.search("services", "alice", 1)[0]["id"] == "r_c1"
+    clause_hash = make_chunk("r_c2", "Clause 4.2(b) limits liability to fees paid.", 3).chunk_hash
+    assert index.update_carried("alice", [("r_c2", clause_hash, 9)], 2, "2024-06-01T09:00:00") == 1
+    moved = index.search("clause 4.2(b)", "alice", 1, {"version": {"$eq": 2}})[0]
+    assert (moved["page_number"], moved["date"]) == (9, "2024-06-01T09:00:00")
+    assert index.remove_chunks("alice", ["r_c0"]) == 1
+    assert postings("alice", "invoice") == 0 and postings("bob", "invoice") == 1
+    assert index.search("INV-2024-0042", "bob")[0]["id"] == "r_c0"  # namespaces are isolated
+    print(f"✅ Update/remove keep FTS in sync ({index.count('alice')} chunks for alice, {index.count()} total)")
+    
+    print("\n✅ All tests passed!")
@@ -0,0 +1,203 @@
+"""
+Vector Store — the interface the pipeline, CLI and API use for vector storage.
+
+Implementations:
+- PineconeManager: the Pinecone index (integrated embedding and reranking)
+- FakeVectorStore: in-process store with configurable latency and error
+  injection, for offline benchmarks and tests
+- RecordingVectorStore: wraps another store and records its responses and
+  latencies to a JSONL file
+- ReplayVectorStore: answers from such a recording with the recorded latencies
+
+create_vector_store() picks the implementation from settings.VECTOR_STORE,
+so the same ingestion runs and API load tests can be pointed at Pinecone or
+at a reproducible offline stand-in without code changes.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Protocol, runtime_checkable
+
+from app.core.config import settings
+from app.ingestion.chunk_record import ChunkRecord
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORES = ("pinecone", "fake", "record", "replay")
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """
+    Operations on a namespaced vector index.
+    
+    Search and rerank hits are dictionaries with 'id', 'score', 'chunk_text',
+    'chunk_hash', 'source', 'page_number', 'content_type', 'version' and
+    'date'; 'chunk_text' is empty when the store was created with
+    return_text=False (the chunk text store hydrates it). rerank_documents()
+    reorders hits the caller already has (with text) and sets their 'score'
+    to the rerank score, keeping the old one as 'retrieval_score'. Write
+    reports have the shape returned by batch_executor.summarize().
+    """
+    
+    def ensure_namespace_exists(self, namespace: str) -> None:
+        ...
+    
+    def execute_batches(
+        self,
+        namespace: str,
+        upserts: Optional[List[ChunkRecord]] = None,
+        deletes: Optional[List[str]] = None,
+        updates: Optional[List[Dict[str, Any]]] = None,
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        ...
+    
+    def upsert_chunks(self, chunks: List[ChunkRecord], namespace: str) -> int:
+        ...
+    
+    def delete_chunks(self, chunk_ids: List[str], namespace: str) -> int:
+        ...
+    
+    def update_chunk_metadata(self, updates: List[Dict[str, Any]], namespace: str) -> int:
+        ...
+    
+    def fetch_records(self, chunk_ids: List[str], namespace: str) -> List[Dict[str, Any]]:
+        ...
+    
+    def search(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        ...
+    
+    async def asearch(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        ...
+    
+    def rerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        ...
+    
+    async def arerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        ...
+    
+    def rerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        ...
+    
+    async def arerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        ...
+    
+    def get_stats(self) -> Dict[str, Any]:
+        ...
+    
+    async def aget_stats(self) -> Dict[str, Any]:
+        ...
+    
+    async def aclose(self) -> None:
+        ...
+
+
+def create_vector_store(kind: Optional[str] = None) -> VectorStore:
+    """
+    Create the configured vector store.
+    
+    Args:
+        kind: 'pinecone', 'fake', 'record' (Pinecone, responses recorded to
+              VECTOR_STORE_RECORDING) or 'replay' (answers from that recording).
+              Defaults to settings.VECTOR_STORE.
+    
+    Raises:
+        ValueError: On an unknown kind.
+    """
+    kind = (kind or settings.VECTOR_STORE).lower()
+    if kind not in VECTOR_STORES:
+        raise ValueError(f"Unknown vector store '{kind}' (expected one of {', '.join(VECTOR_STORES)})")
+    
+    if kind == "fake":
+        from app.vectorstore.fake_store import FakeVectorStore
+        
+        logger.info(
+            f"Using in-process fake vector store (latency: {settings.VECTOR_STORE_LATENCY}, "
+            f"errors: {settings.VECTOR_STORE_ERRORS}, seed: {settings.VECTOR_STORE_SEED})"
+        )
+        return FakeVectorStore(
+            latency=settings.VECTOR_STORE_LATENCY,
+            errors=settings.VECTOR_STORE_ERRORS,
+            seed=settings.VECTOR_STORE_SEED,
+            return_text=not settings.CHUNK_TEXT_STORE_ENABLED,
+            **_write_settings()
+        )
+    
+    if kind == "replay":
+        from app.vectorstore.recording import ReplayVectorStore
+        
+        logger.info(f"Replaying vector store responses from {settings.VECTOR_STORE_RECORDING}")
+        return ReplayVectorStore(
+            settings.VECTOR_STORE_RECORDING,
+            latency=settings.VECTOR_STORE_LATENCY,
+            errors=settings.VECTOR_STORE_ERRORS,
+            seed=settings.VECTOR_STORE_SEED,
+            return_text=not settings.CHUNK_TEXT_STORE_ENABLED,
+            **_write_settings()
+        )
+    
+    from app.vectorstore.pinecone_manager import PineconeManager
+    
+    store = PineconeManager(
+        api_key=settings.PINECONE_API_KEY,
+        index_name=settings.PINECONE_INDEX_NAME,
+        cloud=settings.PINECONE_CLOUD,
+        region=settings.PINECONE_REGION,
+        embedding_model=settings.EMBEDDING_MODEL,
+        rerank_model=settings.RERANKER_MODEL,
+        return_text=not settings.CHUNK_TEXT_STORE_ENABLED,
+        **_write_settings()
+    )
+    
+    if kind == "record":
+        from app.vectorstore.recording import RecordingVectorStore
+        
+        logger.info(f"Recording vector store responses to {settings.VECTOR_STORE_RECORDING}")
+        return RecordingVectorStore(store, settings.VECTOR_STORE_RECORDING)
+    return store
+
+
+def _write_settings() -> Dict[str, Any]:
+    return {
+        "batch_size": settings.UPSERT_BATCH_SIZE,
+        "max_concurrency": settings.PINECONE_MAX_CONCURRENCY,
+        "records_per_second": settings.PINECONE_RECORDS_PER_SECOND,
+        "requests_per_second": settings.PINECONE_REQUESTS_PER_SECOND,
+        "max_retries": settings.PINECONE_MAX_RETRIES,
+    }
@@ -0,0 +1,306 @@
+"""
+Batch Executor — concurrent, rate-limited execution of Pinecone write batches.
+
+Used by PineconeManager for upserts, deletes and metadata updates:
+- Batches run concurrently on a shared thread pool (one pool per manager, so
+  concurrent ingestions share it too)
+- A token bucket per dimension (records/sec and requests/sec) keeps the
+  combined traffic under the account's limits; 0 disables a limit
+- Transient failures (HTTP 429/5xx, connection errors, timeouts) are retried
+  with exponential backoff and full jitter; other errors fail the batch at once
+- Every batch yields a structured result (op, size, attempts, status, error,
+  seconds), so callers can acknowledge completed batches individually
+"""
+
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    from urllib3.exceptions import HTTPError as _TransportError
+except ImportError:  # urllib3 ships with the Pinecone SDK
+    _TransportError = ConnectionError
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed request is worth retrying (throttling, server or network errors)."""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if status is not None:
+        return int(status) in TRANSIENT_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError, _TransportError))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; `acquire` blocks until enough tokens are available."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize bucket.
+        
+        Args:
+            rate: Tokens added per second (0 or less disables the limit).
+            capacity: Maximum burst (defaults to one second's worth of tokens).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take `tokens` from the bucket, waiting for them if necessary.
+        
+        Requests larger than the capacity are allowed once the bucket is full
+        (and drive it negative), so oversized batches still make progress.
+        
+        Returns:
+            Seconds spent waiting.
+        """
+        if self.rate <= 0:
+            return 0.0
+        
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            
+            time.sleep(delay)
+            waited += delay
+
+
+class BatchExecutor:
+    """Runs write batches concurrently under shared rate limits, with retries."""
+    
+    def __init__(
+        self,
+        max_workers: int = 4,
+        records_per_second: float = 0,
+        requests_per_second: float = 0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0
+    ):
+        """
+        Initialize executor.
+        
+        Args:
+            max_workers: Batches in flight at once.
+            records_per_second: Record rate limit shared by all batches (0 = unlimited).
+            requests_per_second: Request rate limit shared by all batches (0 = unlimited).
+            max_retries: Retries of a batch after a transient failure.
+            backoff_base: First retry delay ceiling in seconds (doubles per attempt).
+            backoff_max: Upper bound of a retry delay.
+        """
+        self.max_workers = max(1, max_workers)
+        self.records = TokenBucket(records_per_second)
+        self.requests = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pinecone")
+    
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    def _run_batch(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        throttled = 0.0
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            throttled += self.requests.acquire(task["requests"])
+            throttled += self.records.acquire(task["size"])
+            try:
+                task["fn"]()
+                status, error = "ok", None
+                break
+            except Exception as e:
+                if attempt > self.max_retries or not is_transient(e):
+                    status, error = "failed", str(e)
+                    logger.error(f"{task['op']} batch {task['index']} failed after {attempt} attempt(s): {e}")
+                    break
+                delay = self._backoff(attempt - 1)
+                logger.warning(f"{task['op']} batch {task['index']} attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+        
+        return {
+            "op": task["op"],
+            "index": task["index"],
+            "ids": task["ids"],
+            "size": task["size"],
+            "attempts": attempt,
+            "status": status,
+            "error": error,
+            "throttled_seconds": round(throttled, 4),
+            "seconds": round(time.perf_counter() - start, 4)
+        }
+    
+    def run(
+        self,
+        tasks: Sequence[Dict[str, Any]],
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute batches concurrently and wait for all of them.
+        
+        Args:
+            tasks: Batches, each a dict with 'op', 'fn' (no-argument callable
+                   sending the batch), 'ids', 'size' (records) and optionally
+                   'requests' (API calls the batch makes, default 1).
+            on_success: Called with each successful batch's result as soon as
+                        it completes (e.g. to acknowledge it in the journal).
+        
+        Returns:
+            Per-batch results in task order.
+        """
+        futures = {}
+        for index, task in enumerate(tasks):
+            task = dict(task, index=index, requests=task.get("requests", 1))
+            futures[self._pool.submit(self._run_batch, task)] = index
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(futures)
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_success is not None and result["status"] == "ok":
+                on_success(result)
+        return results
+    
+    def shutdown(self) -> None:
+        """Stop the worker threads (waits for batches in flight)."""
+        self._pool.shutdown(wait=True)
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """
+    Aggregate per-batch results.
+    
+    Returns:
+        Dictionary with the structure:
+        {
+            "upsert": 960, "delete": 300, "update": 40,   # records written per op
+            "batches": 25, "failed_batches": 0, "retries": 2,
+            "throttled_seconds": 0.4, "elapsed_seconds": 1.8,
+            "errors": ["delete batch 3: ..."],
+            "results": [...]                              # per-batch results
+        }
+    """
+    summary: Dict[str, Any] = {"upsert": 0, "delete": 0, "update": 0}
+    for result in results:
+        if result["status"] == "ok":
+            summary[result["op"]] = summary.get(result["op"], 0) + result["size"]
+    
+    summary.update({
+        "batches": len(results),
+        "failed_batches": sum(1 for r in results if r["status"] != "ok"),
+        "retries": sum(r["attempts"] - 1 for r in results),
+        "throttled_seconds": round(sum(r["throttled_seconds"] for r in results), 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "errors": [f"{r['op']} batch {r['index']}: {r['error']}" for r in results if r["status"] != "ok"],
+        "results": results
+    })
+    return summary
+
+
+def raise_on_failure(report: Dict[str, Any], action: str) -> None:
+    """
+    Raise if any batch of a summarize() report failed.
+    
+    Raises:
+        RuntimeError: Naming the action, the failed batch count and the first error.
+    """
+    if report["failed_batches"]:
+        raise RuntimeError(
+            f"Error {action}: {report['failed_batches']}/{report['batches']} batches failed "
+            f"({report['errors'][0]})"
+        )
+
+
+if __name__ == "__main__":
+    print("=== Batch Executor Test ===\n")
+    
+    class Throttled(Exception):
+        status = 429
+    
+    def fake_request(latency=0.05):
+        time.sleep(latency)
+    
+    # Serial baseline vs. concurrent execution: 40 upsert + 20 delete batches
+    tasks = (
+        [{"op": "upsert", "fn": fake_request, "ids": [f"u{i}"], "size": 96} for i in range(40)]
+        + [{"op": "delete", "fn": fake_request, "ids": [f"d{i}"], "size": 100} for i in range(20)]
+    )
+    
+    start = time.perf_counter()
+    for task in tasks:
+        task["fn"]()
+    serial = time.perf_counter() - start
+    
+    executor = BatchExecutor(max_workers=8)
+    start = time.perf_counter()
+    report = summarize(executor.run(tasks), time.perf_counter() - start)
+    print(f"✅ {report['batches']} batches: serial {serial:.2f}s → concurrent {report['elapsed_seconds']:.2f}s "
+          f"({serial / report['elapsed_seconds']:.1f}x)")
+    assert report["upsert"] == 40 * 96 and report["delete"] == 20 * 100 and not report["failed_batches"]
+    
+    # Shared rate limit: 20 requests/sec caps 20 batches at ~1s regardless of workers
+    limited = BatchExecutor(max_workers=8, requests_per_second=20)
+    start = time.perf_counter()
+    limited.run([{"op": "upsert", "fn": lambda: None, "ids": [], "size": 1} for _ in range(40)])
+    elapsed = time.perf_counter() - start
+    print(f"✅ Rate limit: 40 requests at 20 req/s took {elapsed:.2f}s")
+    assert 0.9 < elapsed < 1.6, elapsed
+    
+    limited = BatchExecutor(max_workers=8, records_per_second=1000)
+    start = time.perf_counter()
+    limited.run([{"op": "upsert", "fn": lambda: None, "ids": [], "size": 250} for _ in range(12)])
+    elapsed = time.perf_counter() - start
+    print(f"✅ Rate limit: 3000 records at 1000 rec/s took {elapsed:.2f}s")
+    assert 1.8 < elapsed < 2.5, elapsed
+    
+    # Retries: transient errors are retried with backoff, permanent ones are not
+    attempts = {"flaky": 0, "broken": 0}
+    
+    def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise Throttled("429 Too Many Requests")
+    
+    def broken():
+        attempts["broken"] += 1
+        raise ValueError("400 Bad Request: invalid vector")
+    
+    acked = []
+    retrying = BatchExecutor(max_workers=2, max_retries=3, backoff_base=0.01)
+    results = retrying.run(
+        [
+            {"op": "upsert", "fn": flaky, "ids": ["a", "b"], "size": 2},
+            {"op": "delete", "fn": broken, "ids": ["c"], "size": 1},
+        ],
+        on_success=lambda result: acked.extend(result["ids"])
+    )
+    report = summarize(results, 0.0)
+    assert results[0]["status"] == "ok" and results[0]["attempts"] == 3
+    assert results[1]["status"] == "failed" and attempts["broken"] == 1
+    assert acked == ["a", "b"] and report["failed_batches"] == 1
+    print(f"✅ Retries: flaky batch succeeded after {results[0]['attempts']} attempts, "
+          f"permanent error failed without retry ({report['errors'][0]})")
+    
+    print("\n✅ All tests passed!")
@@ -0,0 +1,575 @@
+"""
+Fake Vector Store — in-process VectorStore for offline benchmarks and tests.
+
+Behaves like the Pinecone index the rest of the system talks to:
+- Records are kept per namespace in memory (same fields as Pinecone records)
+- Search scores chunks by query-term overlap and honours metadata filters;
+  rerank re-scores the candidates and returns the top_n; rerank_documents
+  re-scores candidates passed in by the caller the same way
+- Writes go through the same BatchExecutor as PineconeManager (batching,
+  concurrency, rate limits, retries), so ingestion throughput reflects the
+  configured write settings
+- Every request sleeps for a latency drawn from a profile (log-normal per
+  operation, fitted to a p50/p99 pair, or empirical samples from a recording)
+- Requests fail at a configurable rate with HTTP-like status codes (429/5xx),
+  which the executor retries exactly as it would Pinecone's
+
+A seed makes latencies and injected errors reproducible (for sequential
+callers; under concurrency the same draws are dealt in arrival order).
+"""
+
+import re
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.ingestion.chunk_record import ChunkRecord
+from app.vectorstore.batch_executor import BatchExecutor, raise_on_failure, summarize
+from app.vectorstore.search_filter import matches
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("upsert", "delete", "update", "search", "rerank", "rerank_documents", "fetch", "stats")
+
+# (p50 ms, p99 ms) per request; upsert is per batch, update per chunk
+LATENCY_PROFILES: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "instant": {},
+    "local": {op: (1.0, 5.0) for op in OPERATIONS},
+    "serverless": {
+        "upsert": (180.0, 900.0), "delete": (60.0, 300.0), "update": (25.0, 150.0),
+        "search": (45.0, 250.0), "rerank": (140.0, 700.0), "rerank_documents": (95.0, 450.0),
+        "fetch": (40.0, 200.0), "stats": (30.0, 150.0),
+    },
+    "degraded": {
+        "upsert": (360.0, 4000.0), "delete": (120.0, 1500.0), "update": (50.0, 800.0),
+        "search": (90.0, 2000.0), "rerank": (280.0, 4000.0), "rerank_documents": (190.0, 2500.0),
+        "fetch": (80.0, 1000.0), "stats": (60.0, 800.0),
+    },
+}
+
+# (failure rate per request, status codes drawn uniformly)
+ERROR_PROFILES: Dict[str, Tuple[float, Tuple[int, ...]]] = {
+    "none": (0.0, ()),
+    "throttled": (0.05, (429,)),
+    "flaky": (0.02, (500, 502, 503)),
+    "outage": (0.5, (503,)),
+}
+
+_Z99 = 2.326  # standard normal 99th percentile
+_TOKEN = re.compile(r"\w+")
+
+
+class InjectedError(Exception):
+    """A simulated request failure; `status` drives the retry decision like an HTTP error."""
+    
+    def __init__(self, op: str, status: int):
+        self.status = status
+        super().__init__(f"{status} injected {op} failure")
+
+
+class LatencyProfile:
+    """Per-operation request latency: log-normal from (p50, p99), or empirical samples."""
+    
+    def __init__(
+        self,
+        percentiles: Dict[str, Tuple[float, float]],
+        samples: Optional[Dict[str, List[float]]] = None
+    ):
+        """
+        Initialize profile.
+        
+        Args:
+            percentiles: Operation → (p50 ms, p99 ms); missing operations take no time.
+            samples: Operation → recorded latencies in ms, drawn uniformly
+                     (takes precedence over percentiles).
+        """
+        self.percentiles = percentiles
+        self.samples = {op: values for op, values in (samples or {}).items() if values}
+    
+    @classmethod
+    def named(cls, name: str) -> "LatencyProfile":
+        """
+        Profile from LATENCY_PROFILES.
+        
+        Raises:
+            ValueError: On an unknown profile name.
+        """
+        if name not in LATENCY_PROFILES:
+            raise ValueError(f"Unknown latency profile '{name}' (expected one of {', '.join(LATENCY_PROFILES)})")
+        return cls(LATENCY_PROFILES[name])
+    
+    def sample(self, op: str, rng: random.Random) -> float:
+        """Draw one latency for `op`, in seconds."""
+        if op in self.samples:
+            return rng.choice(self.samples[op]) / 1000
+        
+        p50, p99 = self.percentiles.get(op, (0.0, 0.0))
+        if p50 <= 0:
+            return 0.0
+        sigma = math.log(max(p99, p50) / p50) / _Z99
+        return rng.lognormvariate(math.log(p50), sigma) / 1000
+
+
+def _terms(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class FakeVectorStore:
+    """In-process VectorStore with simulated latency and error injection."""
+    
+    DELETE_BATCH_SIZE = 100
+    UPDATE_BATCH_SIZE = 50
+    
+    def __init__(
+        self,
+        latency: Union[str, LatencyProfile] = "serverless",
+        errors: str = "none",
+        seed: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        error_statuses: Optional[Sequence[int]] = None,
+        return_text: bool = True,
+        batch_size: int = 96,
+        max_concurrency: int = 4,
+        records_per_second: float = 0,
+        requests_per_second: float = 0,
+        max_retries: int = 3
+    ):
+        """
+        Initialize fake store.
+        
+        Args:
+            latency: LATENCY_PROFILES name or a LatencyProfile.
+            errors: ERROR_PROFILES name.
+            seed: Seed for latency and error draws (None = nondeterministic).
+            error_rate: Overrides the error profile's failure rate.
+            error_statuses: Overrides the error profile's status codes.
+            return_text: Include 'chunk_text' in hits (False mirrors PineconeManager
+                with the local chunk text store).
+            batch_size: Batch size for upserts.
+            max_concurrency: Write batches in flight at once.
+            records_per_second: Shared record rate limit for writes (0 = unlimited).
+            requests_per_second: Shared request rate limit for writes (0 = unlimited).
+            max_retries: Retries of a write batch after a transient failure.
+        
+        Raises:
+            ValueError: On an unknown latency or error profile.
+        """
+        if errors not in ERROR_PROFILES:
+            raise ValueError(f"Unknown error profile '{errors}' (expected one of {', '.join(ERROR_PROFILES)})")
+        
+        self.latency = latency if isinstance(latency, LatencyProfile) else LatencyProfile.named(latency)
+        profile_rate, profile_statuses = ERROR_PROFILES[errors]
+        self.error_rate = profile_rate if error_rate is None else error_rate
+        self.error_statuses = tuple(error_statuses or profile_statuses or (503,))
+        self.batch_size = batch_size
+        self.return_text = return_text
+        
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._namespaces: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.requests: Counter = Counter()
+        self.injected_errors: Counter = Counter()
+        self.executor = BatchExecutor(
+            max_workers=max_concurrency,
+            records_per_second=records_per_second,
+            requests_per_second=requests_per_second,
+            max_retries=max_retries
+        )
+    
+    # ── Simulated requests ───────────────────────────────────────────────
+    
+    def _draw(self, op: str) -> Tuple[float, Optional[int]]:
+        """Latency (seconds) and injected status (None = success) of one request."""
+        with self._rng_lock:
+            self.requests[op] += 1
+            delay = self.latency.sample(op, self._rng)
+            if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                self.injected_errors[op] += 1
+                return delay, self._rng.choice(self.error_statuses)
+            return delay, None
+    
+    def _request(self, op: str) -> None:
+        delay, status = self._draw(op)
+        time.sleep(delay)
+        if status is not None:
+            raise InjectedError(op, status)
+    
+    async def _arequest(self, op: str) -> None:
+        delay, status = self._draw(op)
+        await asyncio.sleep(delay)
+        if status is not None:
+            raise InjectedError(op, status)
+    
+    # ── Storage ──────────────────────────────────────────────────────────
+    
+    def preload(self, namespace: str, records: List[Dict[str, Any]]) -> None:
+        """Store Pinecone-style records ('_id', 'chunk_text', metadata) without latency or errors."""
+        with self._lock:
+            stored = self._namespaces.setdefault(namespace, {})
+            for record in records:
+                stored[record["_id"]] = dict(record)
+    
+    def _upsert(self, namespace: str, chunks: List[ChunkRecord]) -> None:
+        self._request("upsert")
+        self.preload(namespace, [chunk.to_pinecone_record() for chunk in chunks])
+    
+    def _delete(self, namespace: str, chunk_ids: List[str]) -> None:
+        self._request("delete")
+        with self._lock:
+            stored = self._namespaces.get(namespace, {})
+            for chunk_id in chunk_ids:
+                stored.pop(chunk_id, None)
+    
+    def _update(self, namespace: str, updates: List[Dict[str, Any]]) -> None:
+        for update in updates:
+            self._request("update")
+            with self._lock:
+                record = self._namespaces.get(namespace, {}).get(update["id"])
+                if record is not None:
+                    record.update({key: value for key, value in update.items() if key != "id"})
+    
+    # ── Writes ───────────────────────────────────────────────────────────
+    
+    def ensure_namespace_exists(self, namespace: str) -> None:
+        """Namespaces are created on first write, as in Pinecone."""
+        logger.info(f"Using namespace: {namespace}")
+    
+    def execute_batches(
+        self,
+        namespace: str,
+        upserts: Optional[List[ChunkRecord]] = None,
+        deletes: Optional[List[str]] = None,
+        updates: Optional[List[Dict[str, Any]]] = None,
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Send upserts, deletes and metadata updates as concurrent batches (see PineconeManager.execute_batches())."""
+        tasks = []
+        for batch in self._batches(upserts or [], self.batch_size):
+            tasks.append({
+                "op": "upsert",
+                "fn": lambda batch=batch: self._upsert(namespace, batch),
+                "ids": [chunk.chunk_id for chunk in batch],
+                "size": len(batch)
+            })
+        for batch in self._batches(deletes or [], self.DELETE_BATCH_SIZE):
+            tasks.append({
+                "op": "delete",
+                "fn": lambda batch=batch: self._delete(namespace, batch),
+                "ids": batch,
+                "size": len(batch)
+            })
+        for batch in self._batches(updates or [], self.UPDATE_BATCH_SIZE):
+            tasks.append({
+                "op": "update",
+                "fn": lambda batch=batch: self._update(namespace, batch),
+                "ids": [update["id"] for update in batch],
+                "size": len(batch),
+                "requests": len(batch)
+            })
+        
+        start = time.perf_counter()
+        report = summarize(self.executor.run(tasks, on_success), time.perf_counter() - start)
+        if tasks:
+            logger.info(
+                f"Namespace '{namespace}' (fake): +{report['upsert']} -{report['delete']} ~{report['update']} "
+                f"in {report['batches']} batches, {report['elapsed_seconds']:.2f}s "
+                f"({report['retries']} retries, {report['failed_batches']} failed)"
+            )
+        return report
+    
+    @staticmethod
+    def _batches(items: list, size: int) -> List[list]:
+        return [items[i:i + size] for i in range(0, len(items), size)]
+    
+    def upsert_chunks(self, chunks: List[ChunkRecord], namespace: str) -> int:
+        """Upsert chunks; returns the number upserted (raises RuntimeError if a batch fails)."""
+        report = self.execute_batches(namespace, upserts=chunks)
+        raise_on_failure(report, "upserting chunks")
+        return report["upsert"]
+    
+    def delete_chunks(self, chunk_ids: List[str], namespace: str) -> int:
+        """Delete chunks by ID; returns the number deleted (raises RuntimeError if a batch fails)."""
+        if not chunk_ids:
+            return 0
+        report = self.execute_batches(namespace, deletes=chunk_ids)
+        raise_on_failure(report, "deleting chunks")
+        return report["delete"]
+    
+    def update_chunk_metadata(self, updates: List[Dict[str, Any]], namespace: str) -> int:
+        """Set metadata fields of existing chunks; returns the number updated (raises RuntimeError if a batch fails)."""
+        if not updates:
+            return 0
+        report = self.execute_batches(namespace, updates=updates)
+        raise_on_failure(report, "updating chunk metadata")
+        return report["update"]
+    
+    # ── Reads ────────────────────────────────────────────────────────────
+    
+    def _hit(self, record: Dict[str, Any], score: float) -> Dict[str, Any]:
+        return {
+            "id": record["_id"],
+            "score": round(score, 6),
+            "chunk_text": record.get("chunk_text", "") if self.return_text else "",
+            "chunk_hash": record.get("chunk_hash"),
+            "source": record.get("source", ""),
+            "page_number": record.get("page_number", 0),
+            "content_type": record.get("content_type", ""),
+            "version": record.get("version", 1),
+            "date": record.get("date", ""),
+            "table_index": record.get("table_index", None),
+        }
+    
+    def _rank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]]
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top records by query-term overlap (cosine over term sets), ties by ID."""
+        query_terms = set(_terms(query))
+        with self._lock:
+            records = [r for r in self._namespaces.get(namespace, {}).values() if matches(r, metadata_filter)]
+        
+        scored = []
+        for record in records:
+            terms = set(_terms(record.get("chunk_text", "")))
+            overlap = len(query_terms & terms)
+            if overlap:
+                scored.append((overlap / math.sqrt(len(query_terms) * len(terms)), record["_id"], record))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, record) for score, _, record in scored[:top_k]]
+    
+    def _score(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return [self._hit(record, score) for score, record in self._rank(query, namespace, top_k, metadata_filter)]
+    
+    def _rescore(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int,
+        top_n: int,
+        metadata_filter: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Rerank the top_k candidates by share of query terms covered (stable on first-stage order)."""
+        query_terms = set(_terms(query)) or {""}
+        rescored = [
+            (len(query_terms & set(_terms(record.get("chunk_text", "")))) / len(query_terms), record)
+            for _, record in self._rank(query, namespace, top_k, metadata_filter)
+        ]
+        rescored.sort(key=lambda item: -item[0])
+        return [self._hit(record, score) for score, record in rescored[:top_n]]
+    
+    def search(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search a namespace (see PineconeManager.search())."""
+        self._request("search")
+        return self._score(query, namespace, top_k, metadata_filter)
+    
+    async def asearch(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search without blocking the event loop."""
+        await self._arequest("search")
+        return self._score(query, namespace, top_k, metadata_filter)
+    
+    def rerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search and rerank in a single request (see Reranker.rerank())."""
+        self._request("rerank")
+        return self._rescore(query, namespace, top_k, top_n, metadata_filter)
+    
+    async def arerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search and rerank without blocking the event loop."""
+        await self._arequest("rerank")
+        return self._rescore(query, namespace, top_k, top_n, metadata_filter)
+    
+    @staticmethod
+    def _rescore_documents(query: str, candidates: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        """Rerank caller-supplied candidates like _rescore() (candidates without text are skipped)."""
+        query_terms = set(_terms(query)) or {""}
+        rescored = []
+        for candidate in candidates:
+            if candidate.get("chunk_text"):
+                hit = dict(candidate, retrieval_score=candidate.get("score"))
+                hit["score"] = round(len(query_terms & set(_terms(hit["chunk_text"]))) / len(query_terms), 6)
+                rescored.append(hit)
+        rescored.sort(key=lambda hit: -hit["score"])
+        return rescored[:top_n]
+    
+    def rerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Rerank already-retrieved candidates (see Reranker.rerank_documents())."""
+        if not candidates:
+            return []
+        self._request("rerank_documents")
+        return self._rescore_documents(query, candidates, top_n)
+    
+    async def arerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Rerank already-retrieved candidates without blocking the event loop."""
+        if not candidates:
+            return []
+        await self._arequest("rerank_documents")
+        return self._rescore_documents(query, candidates, top_n)
+    
+    def fetch_records(self, chunk_ids: List[str], namespace: str) -> List[Dict[str, Any]]:
+        """Fetch stored records by ID; unknown IDs are omitted."""
+        if not chunk_ids:
+            return []
+        self._request("fetch")
+        with self._lock:
+            stored = self._namespaces.get(namespace, {})
+            return [dict(stored[chunk_id]) for chunk_id in chunk_ids if chunk_id in stored]
+    
+    def _stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: {"vector_count": len(records)} for name, records in self._namespaces.items()}
+        return {
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Vector counts per namespace, shaped like Pinecone's index stats."""
+        self._request("stats")
+        return self._stats()
+    
+    async def aget_stats(self) -> Dict[str, Any]:
+        """Index statistics without blocking the event loop."""
+        await self._arequest("stats")
+        return self._stats()
+    
+    async def aclose(self) -> None:
+        """Nothing to close (no network clients)."""
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of latencies in milliseconds."""
+    ordered = sorted(latencies_ms)
+    
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 1)
+    
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 1)}
+
+
+if __name__ == "__main__":
+    from app.vectorstore.base import VectorStore
+    
+    print("=== Fake Vector Store Test ===\n")
+    
+    def make_chunks(count: int) -> List[ChunkRecord]:
+        topics = ["revenue growth", "supplier risk", "staff costs", "market forecast", "debt covenants"]
+        chunks = []
+        for i in range(count):
+            chunk = ChunkRecord(f"Section {i} discusses {topics[i % 5]} for the quarter.", page_number=i // 10 + 1)
+            chunk.chunk_id, chunk.source, chunk.version = f"doc_v1_chunk{i:04d}", f"report{i % 2}.pdf", 1
+            chunk.date = "2024-05-01T00:00:00"
+            chunks.append(chunk)
+        return chunks
+    
+    store = FakeVectorStore(latency="instant", seed=1)
+    assert isinstance(store, VectorStore)
+    print("✅ FakeVectorStore implements VectorStore")
+    
+    # Functional behaviour: writes, search with filters, rerank, fetch, stats
+    chunks = make_chunks(200)
+    assert store.upsert_chunks(chunks, "alice") == 200
+    assert store.delete_chunks([c.chunk_id for c in chunks[:10]], "alice") == 10
+    assert store.update_chunk_metadata([{"id": chunks[10].chunk_id, "page_number": 99}], "alice") == 1
+    hits = store.search("supplier risk", "alice", top_k=5, metadata_filter={"source": {"$eq": "report1.pdf"}})
+    assert len(hits) == 5 and all("supplier risk" in h["chunk_text"] and h["source"] == "report1.pdf" for h in hits)
+    reranked = store.rerank("revenue growth quarter", "alice", top_k=20, top_n=3)
+    assert len(reranked) == 3 and reranked[0]["score"] == 1.0
+    candidates = store.search("revenue growth quarter", "alice", top_k=20)
+    requests_before = store.requests["search"]
+    reranked_docs = store.rerank_documents("revenue growth quarter", candidates, top_n=3)
+    assert [hit["id"] for hit in reranked_docs] == [hit["id"] for hit in reranked]
+    assert store.requests["search"] == requests_before and "retrieval_score" in reranked_docs[0]
+    assert store.fetch_records([chunks[10].chunk_id, "missing"], "alice")[0]["page_number"] == 99
+    assert store.get_stats()["namespaces"]["alice"]["vector_count"] == 190
+    print("✅ Upsert/delete/update, filtered search, rerank, rerank of retrieved candidates, fetch and stats")
+    
+    # Ingestion write throughput under serverless latency: 1 vs 8 batches in flight
+    for workers in (1, 8):
+        timed = FakeVectorStore(latency="serverless", seed=2, max_concurrency=workers)
+        report = timed.execute_batches("bench", upserts=make_chunks(960))
+        print(f"✅ Upsert 960 chunks, {workers} in flight: {report['elapsed_seconds']:.2f}s "
+              f"({960 / report['elapsed_seconds']:.0f} chunks/s)")
+    
+    # Error injection: throttling is retried by the executor, nothing is lost
+    throttled = FakeVectorStore(latency="instant", errors="throttled", error_rate=0.3, seed=3)
+    throttled.executor.backoff_base = 0.01
+    report = throttled.execute_batches("alice", upserts=make_chunks(960))
+    assert report["upsert"] == 960 and report["retries"] == throttled.injected_errors["upsert"] > 0
+    print(f"✅ Injected {throttled.injected_errors['upsert']} × 429 on upserts → "
+          f"{report['retries']} retries, {report['failed_batches']} failed batches")
+    
+    # Reproducible tail latency: the same seed yields the same latency sequence
+    def measure(seed: int) -> List[float]:
+        timed = FakeVectorStore(latency="serverless", seed=seed)
+        timed.preload("alice", [c.to_pinecone_record() for c in chunks])
+        return [timed.latency.sample("search", timed._rng) * 1000 for _ in range(2000)]
+    
+    first, second = measure(4), measure(4)
+    assert first == second
+    summary = latency_summary(first)
+    p50, p99 = LATENCY_PROFILES["serverless"]["search"]
+    assert abs(summary["p50"] - p50) / p50 < 0.1 and abs(summary["p99"] - p99) / p99 < 0.3
+    print(f"✅ Search latency (seed 4, 2000 draws): {summary} vs profile p50={p50}, p99={p99}")
+    
+    # Concurrent async searches overlap instead of queueing
+    async def concurrent_searches(count: int) -> float:
+        timed = FakeVectorStore(latency="serverless", seed=5)
+        start = time.perf_counter()
+        await asyncio.gather(*(timed.asearch("revenue", "alice") for _ in range(count)))
+        return time.perf_counter() - start
+    
+    elapsed = asyncio.run(concurrent_searches(100))
+    assert elapsed < 2.0, elapsed
+    print(f"✅ 100 concurrent asearch calls in {elapsed:.2f}s")
+    
+    print("\n✅ All tests passed!")
@@ -5,14 +5,25 @@ Features:
 - Index creation with integrated embedding
 - Namespace management (username-based)
 - Batch upsert with metadata
-- Retrieval with namespace isolation
+- Concurrent, rate-limited upsert/delete/update batches with retries (BatchExecutor)
+- Retrieval with namespace isolation and server-side metadata filters
+- Integrated search + rerank, and reranking of already-retrieved candidates
+  (Reranker, sharing this manager's client and index handles)
+- Async retrieval (asyncio index client) for the API's request path
+
+Implements the VectorStore interface (see base.py).
 """
 
 import time
+import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 from pinecone import Pinecone
 
+from app.ingestion.chunk_record import ChunkRecord
+from app.vectorstore.batch_executor import BatchExecutor, raise_on_failure, summarize
+from app.vectorstore.reranker import Reranker
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,7 +37,13 @@ class PineconeManager:
         cloud: str,
         region: str,
         embedding_model: str,
-        batch_size: int = 96
+        rerank_model: str = "bge-reranker-v2-m3",
+        return_text: bool = True,
+        batch_size: int = 96,
+        max_concurrency: int = 4,
+        records_per_second: float = 0,
+        requests_per_second: float = 0,
+        max_retries: int = 3
     ):
         """
         Initialize Pinecone manager.
@@ -37,7 +54,14 @@ class PineconeManager:
             cloud: Cloud provider (e.g., 'aws').
             region: Cloud region (e.g., 'us-east-1').
             embedding_model: Embedding model name.
+            rerank_model: Reranking model name (see rerank()).
+            return_text: Request 'chunk_text' with search hits; False when the
+                text is hydrated from the local ChunkTextStore instead.
             batch_size: Batch size for upserts.
+            max_concurrency: Write batches in flight at once (shared by all callers).
+            records_per_second: Shared record rate limit for writes (0 = unlimited).
+            requests_per_second: Shared request rate limit for writes (0 = unlimited).
+            max_retries: Retries of a write batch after a transient failure.
         """
         self.api_key = api_key
         self.index_name = index_name
@@ -45,9 +69,27 @@ class PineconeManager:
         self.region = region
         self.embedding_model = embedding_model
         self.batch_size = batch_size
+        self.search_fields = self.SEARCH_FIELDS if return_text else self.SEARCH_FIELDS[1:]
         
         self._pc = Pinecone(api_key=api_key)
         self._index = None
+        self._async_index = None
+        self._async_lock: Optional[asyncio.Lock] = None
+        self.executor = BatchExecutor(
+            max_workers=max_concurrency,
+            records_per_second=records_per_second,
+            requests_per_second=requests_per_second,
+            max_retries=max_retries
+        )
+        self.reranker = Reranker(
+            api_key,
+            index_name,
+            rerank_model,
+            return_text=return_text,
+            client=self._pc,
+            get_index=self._get_or_create_index,
+            get_async_index=self._get_async_index
+        )
     
     def _get_or_create_index(self):
         """Get or create the Pinecone index with integrated embedding."""
@@ -89,6 +131,32 @@ class PineconeManager:
         self._index = self._pc.Index(self.index_name)
         return self._index
     
+    async def _get_async_index(self):
+        """
+        Get the asyncio index client (created on first use, in the running event loop).
+        
+        The one-time index lookup runs on a worker thread so the event loop never blocks.
+        """
+        if self._async_index is not None:
+            return self._async_index
+        
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        
+        async with self._async_lock:
+            if self._async_index is None:
+                await asyncio.to_thread(self._get_or_create_index)
+                description = await asyncio.to_thread(self._pc.describe_index, self.index_name)
+                self._async_index = self._pc.IndexAsyncio(host=description.host)
+        return self._async_index
+    
+    async def aclose(self) -> None:
+        """Close the asyncio index clients (their HTTP sessions)."""
+        if self._async_index is not None:
+            await self._async_index.close()
+            self._async_index = None
+        await self.reranker.aclose()
+    
     def ensure_namespace_exists(self, namespace: str) -> None:
         """
         Ensure namespace exists in Pinecone.
@@ -100,68 +168,159 @@ class PineconeManager:
         # Pinecone creates namespaces automatically, but we log for tracking
         logger.info(f"Using namespace: {namespace}")
     
+    DELETE_BATCH_SIZE = 100
+    UPDATE_BATCH_SIZE = 50
+    
+    def execute_batches(
+        self,
+        namespace: str,
+        upserts: Optional[List[ChunkRecord]] = None,
+        deletes: Optional[List[str]] = None,
+        updates: Optional[List[Dict[str, Any]]] = None,
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Send upserts, deletes and metadata updates as concurrent batches.
+        
+        All batches share the executor's worker pool and rate limits; transient
+        failures are retried with backoff. A failed batch does not stop the
+        others — check 'failed_batches' (or use the raising wrappers
+        upsert_chunks / delete_chunks / update_chunk_metadata).
+        
+        Args:
+            namespace: Namespace to write to.
+            upserts: ChunkRecords to upsert (batches of batch_size).
+            deletes: Chunk IDs to delete (batches of DELETE_BATCH_SIZE).
+            updates: Dictionaries with 'id' and the metadata fields to set
+                (batches of UPDATE_BATCH_SIZE, one request per chunk).
+            on_success: Called with each successful batch's result as soon as
+                it completes; result['ids'] holds the batch's chunk IDs.
+        
+        Returns:
+            Summary dictionary with records written per op ('upsert', 'delete',
+            'update'), 'batches', 'failed_batches', 'retries',
+            'throttled_seconds', 'elapsed_seconds', 'errors' and per-batch
+            'results' (op, index, ids, size, attempts, status, error, seconds).
+        """
+        index = self._get_or_create_index()
+        tasks = []
+        
+        # Records are built inside the task, so only in-flight batches hold their dicts
+        for chunk_batch in self._batches(upserts or [], self.batch_size):
+            tasks.append({
+                "op": "upsert",
+                "fn": lambda batch=chunk_batch: index.upsert_records(
+                    namespace, [chunk.to_pinecone_record() for chunk in batch]
+                ),
+                "ids": [chunk.chunk_id for chunk in chunk_batch],
+                "size": len(chunk_batch)
+            })
+        
+        for id_batch in self._batches(deletes or [], self.DELETE_BATCH_SIZE):
+            tasks.append({
+                "op": "delete",
+                "fn": lambda batch=id_batch: index.delete(ids=batch, namespace=namespace),
+                "ids": id_batch,
+                "size": len(id_batch)
+            })
+        
+        def send_updates(batch: List[Dict[str, Any]]) -> None:
+            for update in batch:
+                fields = {key: value for key, value in update.items() if key != "id"}
+                index.update(id=update["id"], set_metadata=fields, namespace=namespace)
+        
+        for update_batch in self._batches(updates or [], self.UPDATE_BATCH_SIZE):
+            tasks.append({
+                "op": "update",
+                "fn": lambda batch=update_batch: send_updates(batch),
+                "ids": [update["id"] for update in update_batch],
+                "size": len(update_batch),
+                "requests": len(update_batch)
+            })
+        
+        start = time.perf_counter()
+        report = summarize(self.executor.run(tasks, on_success), time.perf_counter() - start)
+        
+        for result in report["results"]:
+            logger.debug(
+                f"{result['op']} batch {result['index']}: {result['size']} records, "
+                f"{result['attempts']} attempt(s), {result['status']} in {result['seconds']:.2f}s"
+            )
+        if tasks:
+            logger.info(
+                f"Namespace '{namespace}': +{report['upsert']} -{report['delete']} ~{report['update']} "
+                f"in {report['batches']} batches, {report['elapsed_seconds']:.2f}s "
+                f"({report['retries']} retries, {report['failed_batches']} failed)"
+            )
+        return report
+    
+    @staticmethod
+    def _batches(items: list, size: int) -> List[list]:
+        return [items[i:i + size] for i in range(0, len(items), size)]
+    
     def upsert_chunks(
         self,
-        chunks: List[Dict[str, Any]],
+        chunks: List[ChunkRecord],
         namespace: str
     ) -> int:
         """
         Upsert chunks to Pinecone with metadata.
         
         Args:
-            chunks: List of chunk dictionaries with metadata.
+            chunks: List of ChunkRecords with metadata (see MetadataBuilder).
             namespace: Namespace for the chunks (typically username).
         
         Returns:
             Number of chunks upserted.
+        
+        Raises:
+            RuntimeError: If a batch still fails after retries.
         """
-        index = self._get_or_create_index()
         self.ensure_namespace_exists(namespace)
         
-        total = 0
+        # Upsert with integrated embedding
+        report = self.execute_batches(namespace, upserts=chunks)
+        raise_on_failure(report, "upserting chunks")
         
-        for i in range(0, len(chunks), self.batch_size):
-            batch = chunks[i:i + self.batch_size]
-            
-            # Prepare records for Pinecone
-            pinecone_records = []
-            
-            for chunk in batch:
-                record = {
-                    "_id": chunk["id"],
-                    "chunk_text": chunk["chunk_text"],
-                    "source": chunk["source"],
-                    "username": chunk["username"],
-                    "version": chunk["version"],
-                    "page_number": chunk["page_number"],
-                    "content_type": chunk["content_type"],
-                    "date": chunk["date"],
-                }
-                
-                # Add optional fields
-                if "table_index" in chunk:
-                    record["table_index"] = chunk["table_index"]
-                
-                pinecone_records.append(record)
-            
-            try:
-                # Upsert with integrated embedding
-                index.upsert_records(namespace, pinecone_records)
-                total += len(pinecone_records)
-                logger.info(f"Upserted batch {i // self.batch_size + 1}: {len(pinecone_records)} records")
-                
-            except Exception as e:
-                logger.error(f"Error upserting batch: {e}")
-                raise
-        
-        logger.info(f"✅ Total upserted: {total} chunks to namespace '{namespace}'")
-        return total
+        logger.info(f"✅ Total upserted: {report['upsert']} chunks to namespace '{namespace}'")
+        return report["upsert"]
+    
+    SEARCH_FIELDS = [
+        "chunk_text", "chunk_hash", "source", "page_number", "content_type", "version", "date", "table_index"
+    ]
+    
+    @staticmethod
+    def _query(query: str, top_k: int, metadata_filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        search_query = {"top_k": top_k, "inputs": {"text": query}}
+        if metadata_filter:
+            search_query["filter"] = metadata_filter
+        return search_query
+    
+    @staticmethod
+    def _to_hits(results) -> List[Dict[str, Any]]:
+        """Flatten a search response into result dictionaries."""
+        hits = []
+        for item in results.get("result", {}).get("hits", []):
+            hits.append({
+                "id": item.get("_id", ""),
+                "score": item.get("_score", 0.0),
+                "chunk_text": item.get("fields", {}).get("chunk_text", ""),
+                "chunk_hash": item.get("fields", {}).get("chunk_hash"),
+                "source": item.get("fields", {}).get("source", ""),
+                "page_number": item.get("fields", {}).get("page_number", 0),
+                "content_type": item.get("fields", {}).get("content_type", ""),
+                "version": item.get("fields", {}).get("version", 1),
+                "date": item.get("fields", {}).get("date", ""),
+                "table_index": item.get("fields", {}).get("table_index", None),
+            })
+        return hits
     
     def search(
         self,
         query: str,
         namespace: str,
-        top_k: int = 10
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant chunks in a namespace.
@@ -170,6 +329,7 @@ class PineconeManager:
             query: Search query.
             namespace: Namespace to search in.
             top_k: Number of results to return.
+            metadata_filter: Pinecone metadata filter (see search_filter.build_filter).
         
         Returns:
             List of search results with scores and metadata.
@@ -179,27 +339,47 @@ class PineconeManager:
         try:
             results = index.search(
                 namespace=namespace,
-                query={
-                    "top_k": top_k,
-                    "inputs": {"text": query},
-                },
-                fields=["chunk_text", "source", "page_number", "content_type", "version", "date", "table_index"],
+                query=self._query(query, top_k, metadata_filter),
+                fields=self.search_fields,
             )
             
-            hits = []
-            for item in results.get("result", {}).get("hits", []):
-                hits.append({
-                    "id": item.get("_id", ""),
-                    "score": item.get("_score", 0.0),
-                    "chunk_text": item.get("fields", {}).get("chunk_text", ""),
-                    "source": item.get("fields", {}).get("source", ""),
-                    "page_number": item.get("fields", {}).get("page_number", 0),
-                    "content_type": item.get("fields", {}).get("content_type", ""),
-                    "version": item.get("fields", {}).get("version", 1),
-                    "date": item.get("fields", {}).get("date", ""),
-                    "table_index": item.get("fields", {}).get("table_index", None),
-                })
+            hits = self._to_hits(results)
+            logger.info(f"Found {len(hits)} results for query in namespace '{namespace}'")
+            return hits
             
+        except Exception as e:
+            logger.error(f"Error searching: {e}")
+            raise
+    
+    async def asearch(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for relevant chunks without blocking the event loop (see search()).
+        
+        Args:
+            query: Search query.
+            namespace: Namespace to search in.
+            top_k: Number of results to return.
+            metadata_filter: Pinecone metadata filter (see search_filter.build_filter).
+        
+        Returns:
+            List of search results with scores and metadata.
+        """
+        index = await self._get_async_index()
+        
+        try:
+            results = await index.search(
+                namespace=namespace,
+                query=self._query(query, top_k, metadata_filter),
+                fields=self.search_fields,
+            )
+            
+            hits = self._to_hits(results)
             logger.info(f"Found {len(hits)} results for query in namespace '{namespace}'")
             return hits
             
@@ -207,6 +387,46 @@ class PineconeManager:
             logger.error(f"Error searching: {e}")
             raise
     
+    def rerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search and rerank in a single call (see Reranker.rerank())."""
+        return self.reranker.rerank(query, namespace, top_k, top_n, metadata_filter)
+    
+    async def arerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search and rerank without blocking the event loop (see Reranker.arerank())."""
+        return await self.reranker.arerank(query, namespace, top_k, top_n, metadata_filter)
+    
+    def rerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Rerank already-retrieved candidates, without a vector search (see Reranker.rerank_documents())."""
+        return self.reranker.rerank_documents(query, candidates, top_n)
+    
+    async def arerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Rerank already-retrieved candidates without blocking the event loop."""
+        return await self.reranker.arerank_documents(query, candidates, top_n)
+    
     def delete_chunks(
         self,
         chunk_ids: List[str],
@@ -221,29 +441,77 @@ class PineconeManager:
         
         Returns:
             Number of chunks deleted.
+        
+        Raises:
+            RuntimeError: If a batch still fails after retries.
         """
         if not chunk_ids:
             logger.info("No chunks to delete")
             return 0
         
+        report = self.execute_batches(namespace, deletes=chunk_ids)
+        raise_on_failure(report, "deleting chunks")
+        
+        logger.info(f"✅ Total deleted: {report['delete']} chunks from namespace '{namespace}'")
+        return report["delete"]
+    
+    def update_chunk_metadata(
+        self,
+        updates: List[Dict[str, Any]],
+        namespace: str
+    ) -> int:
+        """
+        Update metadata of existing chunks without re-embedding them.
+        
+        Used for chunks whose content is unchanged but which moved to another
+        page in a new document version.
+        
+        Args:
+            updates: List of dictionaries with 'id' and the fields to set
+                (e.g. {"id": "doc_v1_chunk004", "page_number": 7}).
+            namespace: Namespace containing the chunks.
+        
+        Returns:
+            Number of chunks updated.
+        
+        Raises:
+            RuntimeError: If a batch still fails after retries.
+        """
+        if not updates:
+            return 0
+        
+        report = self.execute_batches(namespace, updates=updates)
+        raise_on_failure(report, "updating chunk metadata")
+        
+        logger.info(f"✅ Updated metadata for {report['update']} chunks in namespace '{namespace}'")
+        return report["update"]
+    
+    def fetch_records(self, chunk_ids: List[str], namespace: str) -> List[Dict[str, Any]]:
+        """
+        Fetch stored records (text and metadata fields) by ID.
+        
+        Args:
+            chunk_ids: Chunk IDs (at most 1000 per call).
+            namespace: Namespace containing the chunks.
+        
+        Returns:
+            Records found, as {"_id": ..., "chunk_text": ..., "source": ..., ...};
+            unknown IDs are omitted.
+        """
+        if not chunk_ids:
+            return []
+        
         index = self._get_or_create_index()
         
         try:
-            # Delete in batches to avoid hitting API limits
-            batch_size = 100
-            total_deleted = 0
-            
-            for i in range(0, len(chunk_ids), batch_size):
-                batch = chunk_ids[i:i + batch_size]
-                index.delete(ids=batch, namespace=namespace)
-                total_deleted += len(batch)
-                logger.info(f"Deleted batch of {len(batch)} chunks from namespace '{namespace}'")
-            
-            logger.info(f"✅ Total deleted: {total_deleted} chunks from namespace '{namespace}'")
-            return total_deleted
-            
+            response = index.fetch(ids=chunk_ids, namespace=namespace)
+            return [
+                {"_id": chunk_id, **(vector.metadata or {})}
+                for chunk_id, vector in response.vectors.items()
+            ]
+        
         except Exception as e:
-            logger.error(f"Error deleting chunks: {e}")
+            logger.error(f"Error fetching records: {e}")
             raise
     
     def delete_namespace(self, namespace: str) -> None:
@@ -279,6 +547,17 @@ class PineconeManager:
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
             raise
+    
+    async def aget_stats(self) -> Dict[str, Any]:
+        """Get index statistics without blocking the event loop."""
+        index = await self._get_async_index()
+        
+        try:
+            return await index.describe_index_stats()
+        
+        except Exception as e:
+            logger.error(f"Error getting stats: {e}")
+            raise
 
 
 if __name__ == "__main__":
@@ -305,18 +584,13 @@ if __name__ == "__main__":
             )
             
             # Test upsert
-            test_chunks = [
-                {
-                    "id": "test_v1_chunk000",
-                    "chunk_text": "This is a test chunk about AI.",
-                    "source": "test.pdf",
-                    "username": "testuser",
-                    "version": 1,
-                    "page_number": 1,
-                    "content_type": "text",
-                    "date": "2024-01-01T00:00:00"
-                }
-            ]
+            test_chunk = ChunkRecord("This is a test chunk about AI.", page_number=1)
+            test_chunk.chunk_id = "test_v1_chunk000"
+            test_chunk.source = "test.pdf"
+            test_chunk.username = "testuser"
+            test_chunk.version = 1
+            test_chunk.date = "2024-01-01T00:00:00"
+            test_chunks = [test_chunk]
             
             count = manager.upsert_chunks(test_chunks, "testuser")
             print(f"✅ Upserted {count} chunks")
@@ -0,0 +1,451 @@
+"""
+Recording and Replay — capture a vector store's real responses, serve them offline.
+
+RecordingVectorStore wraps any VectorStore (normally PineconeManager) and
+appends one JSONL line per request:
+- Reads (search, rerank, rerank_documents, fetch, stats): request key, latency, and the response
+  or the error status
+- Writes: the latency of every upsert/delete/update batch
+
+ReplayVectorStore answers reads from such a file with the recorded response
+and latency (a request recorded several times replays its responses in turn)
+and simulates writes in memory with latencies drawn from the recorded batches.
+Benchmarks run against a replay see the same results and the same latency
+distribution as the recorded session, without network access.
+
+Recording file line format:
+    {"op": "search", "key": "3f2a…", "latency_ms": 48.1, "response": [...]}
+    {"op": "rerank", "key": "9c1e…", "latency_ms": 612.0, "status": 429, "error": "..."}
+    {"op": "upsert", "latency_ms": 204.7}
+"""
+
+import copy
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.ingestion.chunk_record import ChunkRecord
+from app.vectorstore.batch_executor import raise_on_failure
+from app.vectorstore.fake_store import LATENCY_PROFILES, FakeVectorStore, InjectedError, LatencyProfile
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(op: str, **params: Any) -> str:
+    """Stable key of a read request (operation and its parameters)."""
+    payload = json.dumps([op, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def _jsonable(value: Any) -> Any:
+    """Plain JSON form of a response (SDK response objects via to_dict())."""
+    return json.loads(json.dumps(value, default=lambda o: o.to_dict() if hasattr(o, "to_dict") else str(o)))
+
+
+class RecordingVectorStore:
+    """Delegates to another VectorStore and records every response and latency."""
+    
+    def __init__(self, store, path: str):
+        """
+        Initialize recorder.
+        
+        Args:
+            store: VectorStore to delegate to.
+            path: JSONL file to append to.
+        """
+        self.store = store
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+    
+    def _write(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+    
+    def _record(self, op: str, key: str, start: float, response: Any = None, error: Exception = None) -> None:
+        entry = {"op": op, "key": key, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        if error is None:
+            entry["response"] = _jsonable(response)
+        else:
+            entry["status"] = getattr(error, "status", None) or getattr(error, "status_code", None) or 500
+            entry["error"] = str(error)
+        self._write(entry)
+    
+    def _call(self, op: str, params: Dict[str, Any], fn: Callable[[], Any]) -> Any:
+        key, start = request_key(op, **params), time.perf_counter()
+        try:
+            response = fn()
+        except Exception as e:
+            self._record(op, key, start, error=e)
+            raise
+        self._record(op, key, start, response)
+        return response
+    
+    async def _acall(self, op: str, params: Dict[str, Any], fn: Callable[[], Awaitable[Any]]) -> Any:
+        key, start = request_key(op, **params), time.perf_counter()
+        try:
+            response = await fn()
+        except Exception as e:
+            self._record(op, key, start, error=e)
+            raise
+        self._record(op, key, start, response)
+        return response
+    
+    # ── Writes ───────────────────────────────────────────────────────────
+    
+    def ensure_namespace_exists(self, namespace: str) -> None:
+        self.store.ensure_namespace_exists(namespace)
+    
+    def execute_batches(
+        self,
+        namespace: str,
+        upserts: Optional[List[ChunkRecord]] = None,
+        deletes: Optional[List[str]] = None,
+        updates: Optional[List[Dict[str, Any]]] = None,
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Delegate, then record each batch's latency (excluding rate-limit waits)."""
+        report = self.store.execute_batches(namespace, upserts, deletes, updates, on_success)
+        for result in report["results"]:
+            if result["status"] == "ok" and result["attempts"] == 1:
+                latency = result["seconds"] - result["throttled_seconds"]
+                self._write({"op": result["op"], "latency_ms": round(latency * 1000, 2)})
+        return report
+    
+    def upsert_chunks(self, chunks: List[ChunkRecord], namespace: str) -> int:
+        report = self.execute_batches(namespace, upserts=chunks)
+        raise_on_failure(report, "upserting chunks")
+        return report["upsert"]
+    
+    def delete_chunks(self, chunk_ids: List[str], namespace: str) -> int:
+        if not chunk_ids:
+            return 0
+        report = self.execute_batches(namespace, deletes=chunk_ids)
+        raise_on_failure(report, "deleting chunks")
+        return report["delete"]
+    
+    def update_chunk_metadata(self, updates: List[Dict[str, Any]], namespace: str) -> int:
+        if not updates:
+            return 0
+        report = self.execute_batches(namespace, updates=updates)
+        raise_on_failure(report, "updating chunk metadata")
+        return report["update"]
+    
+    # ── Reads ────────────────────────────────────────────────────────────
+    
+    def fetch_records(self, chunk_ids: List[str], namespace: str) -> List[Dict[str, Any]]:
+        params = {"ids": chunk_ids, "namespace": namespace}
+        return self._call("fetch", params, lambda: self.store.fetch_records(chunk_ids, namespace))
+    
+    def search(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        params = {"query": query, "namespace": namespace, "top_k": top_k, "filter": metadata_filter}
+        return self._call("search", params, lambda: self.store.search(query, namespace, top_k, metadata_filter))
+    
+    async def asearch(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        params = {"query": query, "namespace": namespace, "top_k": top_k, "filter": metadata_filter}
+        return await self._acall("search", params, lambda: self.store.asearch(query, namespace, top_k, metadata_filter))
+    
+    def rerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        params = {"query": query, "namespace": namespace, "top_k": top_k, "top_n": top_n, "filter": metadata_filter}
+        return self._call(
+            "rerank", params, lambda: self.store.rerank(query, namespace, top_k, top_n, metadata_filter)
+        )
+    
+    async def arerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        params = {"query": query, "namespace": namespace, "top_k": top_k, "top_n": top_n, "filter": metadata_filter}
+        return await self._acall(
+            "rerank", params, lambda: self.store.arerank(query, namespace, top_k, top_n, metadata_filter)
+        )
+    
+    def rerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        params = {"query": query, "ids": [c["id"] for c in candidates], "top_n": top_n}
+        return self._call(
+            "rerank_documents", params, lambda: self.store.rerank_documents(query, candidates, top_n)
+        )
+    
+    async def arerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        params = {"query": query, "ids": [c["id"] for c in candidates], "top_n": top_n}
+        return await self._acall(
+            "rerank_documents", params, lambda: self.store.arerank_documents(query, candidates, top_n)
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return self._call("stats", {}, self.store.get_stats)
+    
+    async def aget_stats(self) -> Dict[str, Any]:
+        return await self._acall("stats", {}, self.store.aget_stats)
+    
+    async def aclose(self) -> None:
+        """Close the wrapped store and the recording file."""
+        await self.store.aclose()
+        with self._lock:
+            self._file.close()
+
+
+class ReplayVectorStore(FakeVectorStore):
+    """FakeVectorStore that answers reads from a recording, with the recorded latencies."""
+    
+    def __init__(self, path: str, latency: str = "serverless", strict: bool = True, **kwargs: Any):
+        """
+        Initialize replay store.
+        
+        Args:
+            path: JSONL recording written by RecordingVectorStore.
+            latency: Latency profile for operations missing from the recording.
+            strict: Raise LookupError for reads that were not recorded;
+                    otherwise answer them from the in-memory fake store.
+            **kwargs: Passed to FakeVectorStore (errors, seed, write settings).
+        
+        Raises:
+            FileNotFoundError: If the recording does not exist.
+        """
+        self.path = path
+        self.strict = strict
+        self._responses: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        samples: Dict[str, List[float]] = defaultdict(list)
+        
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                samples[entry["op"]].append(entry["latency_ms"])
+                if "key" in entry:
+                    self._responses[entry["key"]].append(entry)
+        
+        super().__init__(latency=LatencyProfile(LATENCY_PROFILES[latency], samples), **kwargs)
+        logger.info(
+            f"Loaded recording {path}: {sum(len(v) for v in self._responses.values())} responses, "
+            f"{sum(len(v) for v in samples.values())} latency samples"
+        )
+    
+    def _recorded(self, op: str, **params: Any) -> Optional[Dict[str, Any]]:
+        """Next recorded entry for this request (cycling), or None if not strict."""
+        key = request_key(op, **params)
+        with self._rng_lock:
+            entries = self._responses.get(key)
+            if entries:
+                self.requests[op] += 1
+                entry = entries[self._cursor[key] % len(entries)]
+                self._cursor[key] += 1
+                return entry
+        
+        if self.strict:
+            raise LookupError(f"No recorded {op} response for {params}")
+        return None
+    
+    @staticmethod
+    def _result(op: str, entry: Dict[str, Any]) -> Any:
+        if "status" in entry:
+            raise InjectedError(op, entry["status"])
+        return copy.deepcopy(entry["response"])
+    
+    def _play(self, op: str, entry: Dict[str, Any]) -> Any:
+        time.sleep(entry["latency_ms"] / 1000)
+        return self._result(op, entry)
+    
+    async def _aplay(self, op: str, entry: Dict[str, Any]) -> Any:
+        await asyncio.sleep(entry["latency_ms"] / 1000)
+        return self._result(op, entry)
+    
+    def fetch_records(self, chunk_ids: List[str], namespace: str) -> List[Dict[str, Any]]:
+        entry = self._recorded("fetch", ids=chunk_ids, namespace=namespace)
+        if entry is None:
+            return super().fetch_records(chunk_ids, namespace)
+        return self._play("fetch", entry)
+    
+    def search(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        entry = self._recorded("search", query=query, namespace=namespace, top_k=top_k, filter=metadata_filter)
+        if entry is None:
+            return super().search(query, namespace, top_k, metadata_filter)
+        return self._play("search", entry)
+    
+    async def asearch(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        entry = self._recorded("search", query=query, namespace=namespace, top_k=top_k, filter=metadata_filter)
+        if entry is None:
+            return await super().asearch(query, namespace, top_k, metadata_filter)
+        return await self._aplay("search", entry)
+    
+    def rerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        entry = self._recorded(
+            "rerank", query=query, namespace=namespace, top_k=top_k, top_n=top_n, filter=metadata_filter
+        )
+        if entry is None:
+            return super().rerank(query, namespace, top_k, top_n, metadata_filter)
+        return self._play("rerank", entry)
+    
+    async def arerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        entry = self._recorded(
+            "rerank", query=query, namespace=namespace, top_k=top_k, top_n=top_n, filter=metadata_filter
+        )
+        if entry is None:
+            return await super().arerank(query, namespace, top_k, top_n, metadata_filter)
+        return await self._aplay("rerank", entry)
+    
+    def rerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        entry = self._recorded("rerank_documents", query=query, ids=[c["id"] for c in candidates], top_n=top_n)
+        if entry is None:
+            return super().rerank_documents(query, candidates, top_n)
+        return self._play("rerank_documents", entry)
+    
+    async def arerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        entry = self._recorded("rerank_documents", query=query, ids=[c["id"] for c in candidates], top_n=top_n)
+        if entry is None:
+            return await super().arerank_documents(query, candidates, top_n)
+        return await self._aplay("rerank_documents", entry)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        entry = self._recorded("stats")
+        return super().get_stats() if entry is None else self._play("stats", entry)
+    
+    async def aget_stats(self) -> Dict[str, Any]:
+        entry = self._recorded("stats")
+        return await super().aget_stats() if entry is None else await self._aplay("stats", entry)
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from app.vectorstore.base import VectorStore
+    from app.vectorstore.fake_store import latency_summary
+    
+    print("=== Recording / Replay Test ===\n")
+    
+    path = os.path.join(tempfile.mkdtemp(), "recording.jsonl")
+    queries = [f"revenue growth {i % 10}" for i in range(60)]
+    
+    # "Live" session: a serverless-latency fake stands in for Pinecone
+    live = FakeVectorStore(latency="serverless", errors="flaky", error_rate=0.05, seed=11)
+    live.executor.backoff_base = 0.01
+    recorder = RecordingVectorStore(live, path)
+    assert isinstance(recorder, VectorStore)
+    
+    chunks = []
+    for i in range(300):
+        chunk = ChunkRecord(f"Note {i}: revenue growth {i % 10} in region {i % 7}.", page_number=i // 20 + 1)
+        chunk.chunk_id, chunk.source, chunk.version, chunk.date = f"doc_v1_chunk{i:04d}", "notes.pdf", 1, "2024-05-01T00:00:00"
+        chunks.append(chunk)
+    recorder.upsert_chunks(chunks, "alice")
+    
+    recorded, errors = [], 0
+    for query in queries:
+        try:
+            recorded.append(recorder.search(query, "alice", top_k=5))
+        except InjectedError:
+            recorded.append(None)
+            errors += 1
+    recorder.get_stats()
+    asyncio.run(recorder.aclose())
+    print(f"✅ Recorded {sum(1 for _ in open(path))} entries ({errors} failed searches)")
+    
+    # Replay: identical responses and errors, recorded latencies, no live store
+    replay = ReplayVectorStore(path, seed=11)
+    latencies, lines = [], [json.loads(line) for line in open(path)]
+    for query, expected in zip(queries, recorded):
+        start = time.perf_counter()
+        try:
+            assert replay.search(query, "alice", top_k=5) == expected
+        except InjectedError:
+            assert expected is None
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    recorded_latencies = [line["latency_ms"] for line in lines if line["op"] == "search"]
+    print(f"✅ Replayed {len(queries)} searches with identical results")
+    print(f"   recorded latency: {latency_summary(recorded_latencies)}")
+    print(f"   replayed latency: {latency_summary(latencies)}")
+    assert abs(latency_summary(latencies)["p50"] - latency_summary(recorded_latencies)["p50"]) < 5
+    assert replay.get_stats()["namespaces"]["alice"]["vector_count"] == 300
+    
+    try:
+        replay.search("never recorded", "alice")
+        raise AssertionError("unrecorded query was answered")
+    except LookupError as e:
+        print(f"✅ Strict replay rejects unrecorded reads: {str(e)[:60]}...")
+    
+    # Writes replay with the recorded batch latencies
+    start = time.perf_counter()
+    replay.upsert_chunks(chunks, "bob")
+    upsert_samples = replay.latency.samples["upsert"]
+    print(f"✅ Replayed upsert of {len(chunks)} chunks in {time.perf_counter() - start:.2f}s "
+          f"(from {len(upsert_samples)} recorded batch latencies)")
+    
+    print("\n✅ All tests passed!")
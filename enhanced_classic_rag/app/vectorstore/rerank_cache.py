@@ -0,0 +1,334 @@
+"""
+Rerank Cache — reranked results shared by every worker, invalidated per namespace.
+
+Reranking is the most expensive retrieval stage, and identical questions over
+an unchanged namespace were reranked again every time. Results are cached in
+the metadata database, so every uvicorn worker (and the CLI) shares them:
+
+    rerank_cache (
+        cache_key TEXT PRIMARY KEY,  -- SHA-256 of model, namespace, normalized query, request
+        namespace TEXT,
+        generation INTEGER,          -- namespace generation the result was computed at
+        value TEXT,                  -- JSON: hits, or the (id, score) ranking of candidates
+        created_at REAL,             -- epoch seconds
+        last_used REAL
+    )
+
+The request part of the key is top_k, top_n and the metadata filter of a
+search + rerank, or the candidate set (IDs and chunk hashes) and top_n of a
+rerank of already-retrieved candidates. Queries are normalized (NFKC,
+case-folded, whitespace collapsed) before hashing.
+
+Invalidation: every write to a namespace's vectors bumps its generation
+(SQLiteManager.bump_namespace_generation) and an entry only answers lookups
+at the generation it was computed at. The generation is read before the
+rerank runs, so a result racing with a write is stored under the old one.
+Pinecone reads are eventually consistent, so results computed within
+`settle_seconds` of a write are returned but not cached.
+
+Entries beyond `max_entries` are evicted least recently used first, and
+entries older than `ttl_seconds` are ignored. A failing cache read or write
+is logged and treated as a miss; it never fails the query.
+"""
+
+import re
+import json
+import time
+import hashlib
+import logging
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOUCH_INTERVAL_SECONDS = 60  # last_used is rewritten at most this often per entry
+
+
+class RerankCache:
+    """Caches rerank results in SQLite, keyed by query, namespace, candidates and model."""
+    
+    def __init__(
+        self,
+        db_manager,
+        model: str,
+        max_entries: int = 10000,
+        ttl_seconds: float = 86400.0,
+        settle_seconds: float = 30.0
+    ):
+        """
+        Initialize cache and create its table if needed.
+        
+        Args:
+            db_manager: SQLiteManager of the metadata database (holds the
+                namespace generations).
+            model: Rerank model; part of every key.
+            max_entries: Entries kept; the least recently used are evicted beyond it.
+            ttl_seconds: Age after which an entry is no longer used.
+            settle_seconds: Results computed this soon after a write to their
+                namespace are not cached.
+        """
+        self.db_manager = db_manager
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.settle_seconds = settle_seconds
+        
+        self.hits = 0
+        self.misses = 0
+        self.ensure_schema()
+    
+    def ensure_schema(self) -> None:
+        """Create the rerank_cache table."""
+        with self.db_manager.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rerank_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    generation INTEGER NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rerank_cache_last_used ON rerank_cache(last_used)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rerank_cache_namespace ON rerank_cache(namespace, generation)")
+    
+    # ── Keys ─────────────────────────────────────────────────────────────
+    
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """NFKC, case-folded, with whitespace runs collapsed."""
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().casefold()
+    
+    @staticmethod
+    def candidate_set(candidates: List[Dict[str, Any]]) -> List[Tuple[str, Optional[str]]]:
+        """Order-independent identity of a candidate list: sorted (id, chunk_hash) pairs."""
+        return sorted({(candidate["id"], candidate.get("chunk_hash")) for candidate in candidates}, key=str)
+    
+    def key(self, namespace: str, query: str, **request: Any) -> str:
+        """
+        Cache key of a rerank.
+        
+        Args:
+            namespace: Namespace (username) the candidates come from.
+            query: Query as entered (normalized here).
+            **request: Remaining parameters that change the result (top_k,
+                top_n, metadata filter, candidate set).
+        """
+        payload = json.dumps(
+            [self.model, namespace, self.normalize_query(query), request],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    # ── Lookups ──────────────────────────────────────────────────────────
+    
+    def lookup(self, namespace: str, key: str) -> Tuple[Optional[Any], Dict[str, Any]]:
+        """
+        Cached result of a key at the namespace's current generation.
+        
+        Returns:
+            (value or None on a miss, namespace state to pass to put()).
+        """
+        now = time.time()
+        try:
+            with self.db_manager.transaction() as conn:
+                state = self.db_manager.get_namespace_generation(namespace)
+                row = conn.execute(
+                    "SELECT generation, value, created_at, last_used FROM rerank_cache WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"Rerank cache lookup failed: {e}")
+            self.misses += 1
+            return None, {"generation": None, "updated_at": None}
+        
+        if row is None or row["generation"] != state["generation"] or now - row["created_at"] > self.ttl_seconds:
+            self.misses += 1
+            return None, state
+        
+        if now - row["last_used"] > TOUCH_INTERVAL_SECONDS:
+            try:
+                with self.db_manager.transaction() as conn:
+                    conn.execute("UPDATE rerank_cache SET last_used = ? WHERE cache_key = ?", (now, key))
+            except Exception as e:
+                logger.warning(f"Rerank cache touch failed: {e}")
+        
+        self.hits += 1
+        return json.loads(row["value"]), state
+    
+    def put(self, namespace: str, key: str, state: Dict[str, Any], value: Any) -> bool:
+        """
+        Cache a result computed at the namespace state returned by lookup().
+        
+        Returns:
+            True if stored (False while the namespace settles after a write, or on error).
+        """
+        if state["generation"] is None:
+            return False
+        if state["updated_at"] is not None:
+            written_at = datetime.fromisoformat(str(state["updated_at"]))
+            if (datetime.now() - written_at).total_seconds() < self.settle_seconds:
+                return False
+        
+        now = time.time()
+        try:
+            with self.db_manager.transaction(immediate=True) as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO rerank_cache
+                        (cache_key, namespace, generation, value, created_at, last_used)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (key, namespace, state["generation"], json.dumps(value, default=str), now, now))
+                conn.execute("""
+                    DELETE FROM rerank_cache WHERE cache_key IN (
+                        SELECT cache_key FROM rerank_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+        except Exception as e:
+            logger.warning(f"Rerank cache write failed: {e}")
+            return False
+        return True
+    
+    # ── Candidate rankings ───────────────────────────────────────────────
+    
+    @staticmethod
+    def ranking(hits: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        """Compact cache value of a candidate rerank: (id, rerank score) in rank order."""
+        return [(hit["id"], hit["score"]) for hit in hits]
+    
+    @staticmethod
+    def reorder(candidates: List[Dict[str, Any]], ranking: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """Candidates in a cached rank order, as Reranker.rerank_documents() returns them."""
+        by_id = {candidate["id"]: candidate for candidate in candidates}
+        hits = []
+        for chunk_id, score in ranking:
+            hit = dict(by_id[chunk_id])
+            hit["retrieval_score"] = hit.get("score")
+            hit["score"] = score
+            hits.append(hit)
+        return hits
+    
+    # ── Maintenance ──────────────────────────────────────────────────────
+    
+    def invalidate(self, namespace: str) -> int:
+        """
+        Bump a namespace's generation after a write and drop its cached results.
+        
+        Returns:
+            The new generation.
+        """
+        with self.db_manager.transaction(immediate=True) as conn:
+            generation = self.db_manager.bump_namespace_generation(namespace)
+            conn.execute("DELETE FROM rerank_cache WHERE namespace = ? AND generation < ?", (namespace, generation))
+        return generation
+    
+    def clear(self, namespace: Optional[str] = None) -> int:
+        """Drop every cached result (of one namespace); returns the number removed."""
+        with self.db_manager.transaction() as conn:
+            if namespace:
+                cursor = conn.execute("DELETE FROM rerank_cache WHERE namespace = ?", (namespace,))
+            else:
+                cursor = conn.execute("DELETE FROM rerank_cache")
+            return cursor.rowcount
+    
+    def stats(self) -> Dict[str, Any]:
+        """Entries, their namespaces, and this process's hit rate."""
+        with self.db_manager.transaction() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS entries, COUNT(DISTINCT namespace) AS namespaces FROM rerank_cache"
+            ).fetchone()
+        
+        lookups = self.hits + self.misses
+        return {
+            "entries": row["entries"],
+            "namespaces": row["namespaces"],
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "model": self.model,
+        }
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from app.db.sqlite_manager import SQLiteManager
+    from app.vectorstore.fake_store import FakeVectorStore
+    
+    print("=== Rerank Cache Test ===\n")
+    
+    db_path = os.path.join(tempfile.mkdtemp(), "rerank_cache_test.db")
+    db = SQLiteManager(db_path)
+    cache = RerankCache(db, "bge-reranker-v2-m3", max_entries=5, settle_seconds=0)
+    store = FakeVectorStore(latency="instant")
+    
+    def rerank(query, namespace="alice", top_k=10, top_n=3):
+        """Search + rerank through the cache, as the pipeline does."""
+        key = cache.key(namespace, query, top_k=top_k, top_n=top_n, filter=None)
+        hits, state = cache.lookup(namespace, key)
+        if hits is None:
+            hits = store.rerank(query, namespace, top_k, top_n)
+            cache.put(namespace, key, state, hits)
+        return hits
+    
+    from app.ingestion.chunk_record import ChunkRecord
+    chunks = []
+    for i in range(20):
+        chunk = ChunkRecord(f"Quarterly revenue section {i} about growth and retention", 1 + i // 5, "text", i)
+        chunk.chunk_hash, chunk.chunk_id, chunk.source, chunk.username = f"h{i}", f"report_v1_chunk{i}", "report.pdf", "alice"
+        chunk.version, chunk.date = 1, datetime.now().isoformat()
+        chunks.append(chunk)
+    store.upsert_chunks(chunks, "alice")
+    cache.invalidate("alice")
+    
+    first = rerank("Revenue  growth?")
+    second = rerank("revenue growth?")
+    assert first == second and store.requests["rerank"] == 1 and cache.hits == 1
+    print(f"✅ Normalized repeat query served from the cache ({store.requests['rerank']} rerank request)")
+    
+    # Another worker process sees the same entry
+    other = RerankCache(SQLiteManager(db_path), "bge-reranker-v2-m3", max_entries=5, settle_seconds=0)
+    assert other.lookup("alice", cache.key("alice", "REVENUE growth?", top_k=10, top_n=3, filter=None))[0] == first
+    print("✅ Entry shared with a second process")
+    
+    # A write to the namespace invalidates it
+    store.upsert_chunks(chunks[:1], "alice")
+    cache.invalidate("alice")
+    rerank("revenue growth?")
+    assert store.requests["rerank"] == 2
+    print("✅ Namespace write → generation bumped → reranked again")
+    
+    # A rerank racing with a write is not served at the new generation
+    key = cache.key("alice", "retention", top_k=10, top_n=3, filter=None)
+    _, state = cache.lookup("alice", key)
+    cache.invalidate("alice")
+    cache.put("alice", key, state, ["stale"])
+    assert cache.lookup("alice", key)[0] is None
+    print("✅ Result computed before a concurrent write is not served after it")
+    
+    # Candidate reranks are keyed by the candidate set, not its order
+    candidates = store.search("growth", "alice", top_k=8)
+    key = cache.key("alice", "growth", candidates=cache.candidate_set(candidates), top_n=3)
+    assert key == cache.key("alice", "growth", candidates=cache.candidate_set(candidates[::-1]), top_n=3)
+    hits = store.rerank_documents("growth", candidates, top_n=3)
+    _, state = cache.lookup("alice", key)
+    cache.put("alice", key, state, cache.ranking(hits))
+    assert cache.reorder(candidates, cache.lookup("alice", key)[0]) == hits
+    print("✅ Candidate rerank cached as a ranking and rebuilt from the candidates")
+    
+    # Bounded, least recently used evicted
+    for i in range(10):
+        rerank(f"question {i}")
+    assert cache.stats()["entries"] == 5
+    
+    # Settling: no caching right after a write
+    settling = RerankCache(db, "bge-reranker-v2-m3", settle_seconds=60)
+    key = settling.key("alice", "fresh", top_n=3)
+    _, state = settling.lookup("alice", key)
+    assert not settling.put("alice", key, state, [])
+    print(f"✅ Bounded at {cache.max_entries} entries; nothing cached while a namespace settles")
+    
+    print(f"\nStats: {cache.stats()}")
+    print("\n✅ All tests passed!")
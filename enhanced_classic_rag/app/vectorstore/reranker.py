@@ -3,12 +3,18 @@ Reranker — uses Pinecone's hosted reranker to improve result relevance.
 
 Features:
 - Integrated search + rerank in single call
+- Rerank-documents mode: reranks candidates the caller already retrieved
+  (e.g. hybrid fusion results) with the standalone rerank inference, without
+  a second vector search or query embedding
 - Configurable reranking model
 - Top-N selection after reranking
+- Server-side metadata filters on the candidate set
+- Async variant (asyncio index client) for the API's request path
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from pinecone import Pinecone
 
 logger = logging.getLogger(__name__)
@@ -21,7 +27,11 @@ class Reranker:
         self,
         api_key: str,
         index_name: str,
-        rerank_model: str = "bge-reranker-v2-m3"
+        rerank_model: str = "bge-reranker-v2-m3",
+        return_text: bool = True,
+        client: Optional[Pinecone] = None,
+        get_index: Optional[Callable[[], Any]] = None,
+        get_async_index: Optional[Callable[[], Awaitable[Any]]] = None
     ):
         """
         Initialize reranker.
@@ -30,26 +40,108 @@ class Reranker:
             api_key: Pinecone API key.
             index_name: Name of the Pinecone index.
             rerank_model: Reranking model name.
+            return_text: Return 'chunk_text' with the hits (reranking reads it
+                server-side either way); False when it is hydrated locally.
+            client: Existing Pinecone client to share (e.g. PineconeManager's).
+            get_index: Returns a shared index handle (e.g. PineconeManager's)
+                instead of one owned by the reranker.
+            get_async_index: Coroutine function returning a shared asyncio index client.
         """
         self.api_key = api_key
         self.index_name = index_name
         self.rerank_model = rerank_model
+        self.fields = self.FIELDS if return_text else self.FIELDS[1:]
         
-        self._pc = Pinecone(api_key=api_key)
+        self._pc = client if client is not None else Pinecone(api_key=api_key)
+        self._index_provider = get_index
+        self._async_index_provider = get_async_index
         self._index = None
+        self._async_index = None
+        self._async_lock: Optional[asyncio.Lock] = None
     
     def _get_index(self):
-        """Get the Pinecone index."""
+        """Get the Pinecone index (the shared handle, if one was given)."""
+        if self._index_provider is not None:
+            return self._index_provider()
         if self._index is None:
             self._index = self._pc.Index(self.index_name)
         return self._index
     
+    async def _get_async_index(self):
+        """Get the asyncio index client (host lookup runs on a worker thread once)."""
+        if self._async_index_provider is not None:
+            return await self._async_index_provider()
+        if self._async_index is not None:
+            return self._async_index
+        
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        
+        async with self._async_lock:
+            if self._async_index is None:
+                description = await asyncio.to_thread(self._pc.describe_index, self.index_name)
+                self._async_index = self._pc.IndexAsyncio(host=description.host)
+        return self._async_index
+    
+    async def aclose(self) -> None:
+        """Close the asyncio index client the reranker owns (a shared one is closed by its owner)."""
+        if self._async_index is not None:
+            await self._async_index.close()
+            self._async_index = None
+    
+    FIELDS = ["chunk_text", "chunk_hash", "source", "page_number", "content_type", "version", "date"]
+    MAX_DOCUMENTS = 100  # documents per standalone rerank request (bge-reranker-v2-m3 limit)
+    
+    def _search_args(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int,
+        top_n: int,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        search_query = {
+            "top_k": top_k,
+            "inputs": {"text": query},
+        }
+        if metadata_filter:
+            search_query["filter"] = metadata_filter
+        return {
+            "namespace": namespace,
+            "query": search_query,
+            "rerank": {
+                "model": self.rerank_model,
+                "top_n": top_n,
+                "rank_fields": ["chunk_text"],
+            },
+            "fields": self.fields,
+        }
+    
+    @staticmethod
+    def _to_hits(results) -> List[Dict[str, Any]]:
+        """Flatten a search response into result dictionaries."""
+        hits = []
+        for item in results.get("result", {}).get("hits", []):
+            hits.append({
+                "id": item.get("_id", ""),
+                "score": item.get("_score", 0.0),
+                "chunk_text": item.get("fields", {}).get("chunk_text", ""),
+                "chunk_hash": item.get("fields", {}).get("chunk_hash"),
+                "source": item.get("fields", {}).get("source", ""),
+                "page_number": item.get("fields", {}).get("page_number", 0),
+                "content_type": item.get("fields", {}).get("content_type", ""),
+                "version": item.get("fields", {}).get("version", 1),
+                "date": item.get("fields", {}).get("date", ""),
+            })
+        return hits
+    
     def rerank(
         self,
         query: str,
         namespace: str,
         top_k: int = 10,
-        top_n: int = 5
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search and rerank results in a single call.
@@ -59,6 +151,8 @@ class Reranker:
             namespace: Namespace to search in.
             top_k: Number of initial candidates to retrieve.
             top_n: Number of top results to return after reranking.
+            metadata_filter: Pinecone metadata filter applied to the candidates
+                (see search_filter.build_filter).
         
         Returns:
             List of reranked results with scores and metadata.
@@ -66,32 +160,46 @@ class Reranker:
         index = self._get_index()
         
         try:
-            results = index.search(
-                namespace=namespace,
-                query={
-                    "top_k": top_k,
-                    "inputs": {"text": query},
-                },
-                rerank={
-                    "model": self.rerank_model,
-                    "top_n": top_n,
-                    "rank_fields": ["chunk_text"],
-                },
-                fields=["chunk_text", "source", "page_number", "content_type", "version", "date"],
+            results = index.search(**self._search_args(query, namespace, top_k, top_n, metadata_filter))
+            hits = self._to_hits(results)
+            
+            logger.info(
+                f"Reranked {len(hits)} results (from {top_k} candidates) "
+                f"for query in namespace '{namespace}'"
             )
+            return hits
             
-            hits = []
-            for item in results.get("result", {}).get("hits", []):
-                hits.append({
-                    "id": item.get("_id", ""),
-                    "score": item.get("_score", 0.0),
-                    "chunk_text": item.get("fields", {}).get("chunk_text", ""),
-                    "source": item.get("fields", {}).get("source", ""),
-                    "page_number": item.get("fields", {}).get("page_number", 0),
-                    "content_type": item.get("fields", {}).get("content_type", ""),
-                    "version": item.get("fields", {}).get("version", 1),
-                    "date": item.get("fields", {}).get("date", ""),
-                })
+        except Exception as e:
+            logger.error(f"Error reranking: {e}")
+            raise
+    
+    async def arerank(
+        self,
+        query: str,
+        namespace: str,
+        top_k: int = 10,
+        top_n: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search and rerank without blocking the event loop (see rerank()).
+        
+        Args:
+            query: Search query.
+            namespace: Namespace to search in.
+            top_k: Number of initial candidates to retrieve.
+            top_n: Number of top results to return after reranking.
+            metadata_filter: Pinecone metadata filter applied to the candidates
+                (see search_filter.build_filter).
+        
+        Returns:
+            List of reranked results with scores and metadata.
+        """
+        index = await self._get_async_index()
+        
+        try:
+            results = await index.search(**self._search_args(query, namespace, top_k, top_n, metadata_filter))
+            hits = self._to_hits(results)
             
             logger.info(
                 f"Reranked {len(hits)} results (from {top_k} candidates) "
@@ -102,6 +210,84 @@ class Reranker:
         except Exception as e:
             logger.error(f"Error reranking: {e}")
             raise
+    
+    def _documents(self, candidates: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+        """Candidates that carry text (at most MAX_DOCUMENTS) and their rerank documents."""
+        usable = [candidate for candidate in candidates if candidate.get("chunk_text")]
+        if len(usable) < len(candidates):
+            logger.warning(f"Skipping {len(candidates) - len(usable)} rerank candidates without text")
+        if len(usable) > self.MAX_DOCUMENTS:
+            logger.warning(f"Reranking the first {self.MAX_DOCUMENTS} of {len(usable)} candidates")
+            usable = usable[:self.MAX_DOCUMENTS]
+        return usable, [{"id": candidate["id"], "chunk_text": candidate["chunk_text"]} for candidate in usable]
+    
+    @staticmethod
+    def _reordered(candidates: List[Dict[str, Any]], result) -> List[Dict[str, Any]]:
+        """Candidates in rerank order, 'score' replaced by the rerank score ('retrieval_score' keeps the old one)."""
+        hits = []
+        for row in result.data:
+            hit = dict(candidates[row.index])
+            hit["retrieval_score"] = hit.get("score")
+            hit["score"] = row.score
+            hits.append(hit)
+        return hits
+    
+    def rerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank already-retrieved candidates with the standalone rerank inference.
+        
+        Unlike rerank(), no vector search runs and the query is not embedded:
+        only the candidates' texts are scored.
+        
+        Args:
+            query: Query to rank the candidates against.
+            candidates: Hits with 'id' and hydrated 'chunk_text' (e.g. hybrid
+                fusion results); candidates without text are skipped.
+            top_n: Number of top results to return.
+        
+        Returns:
+            The top_n candidates in rerank order, with the rerank 'score'.
+        """
+        usable, documents = self._documents(candidates)
+        if not documents:
+            return []
+        
+        try:
+            result = self._pc.inference.rerank(
+                model=self.rerank_model,
+                query=query,
+                documents=documents,
+                rank_fields=["chunk_text"],
+                top_n=min(top_n, len(documents)),
+                return_documents=False
+            )
+            hits = self._reordered(usable, result)
+            
+            logger.info(f"Reranked {len(hits)} of {len(documents)} retrieved candidates")
+            return hits
+        
+        except Exception as e:
+            logger.error(f"Error reranking documents: {e}")
+            raise
+    
+    async def arerank_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank already-retrieved candidates without blocking the event loop.
+        
+        The shared client's inference call runs on a worker thread, so no
+        second (asyncio) Pinecone client is created.
+        """
+        return await asyncio.to_thread(self.rerank_documents, query, candidates, top_n)
 
 
 if __name__ == "__main__":
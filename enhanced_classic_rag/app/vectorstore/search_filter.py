@@ -0,0 +1,403 @@
+"""
+Search Filter — builds Pinecone metadata filters for search and rerank.
+
+Restricts a query server-side instead of over-fetching and filtering on the
+client, so top_k can stay small and fewer read units are used:
+- source: one document (filename) or a list of documents
+- content_type: 'text' or 'table'
+- page range: inclusive page numbers
+- version: documents whose active version is this one
+- date range: documents whose active version was uploaded in the range
+  (inclusive; a plain date covers the whole day)
+- latest only: only chunks of each document's processed, active version
+
+Source, content type and page are chunk metadata. Version and date are not
+matched on chunk metadata: unchanged chunks keep the version and date they
+were embedded with (a new version only re-pages moved chunks, so an edit
+costs no update request per unchanged chunk). resolve_filter() answers them
+from the metadata database instead and turns the selected documents into a
+source condition. The same condition excludes chunks of an ingestion that
+has not committed yet (already upserted, version above the active one).
+
+The condition lists filenames, either the documents to keep ($in) or, when
+that is shorter, the ones to drop ($nin); at most MAX_FILTER_VALUES, so the
+filter stays within Pinecone's filter size limit.
+
+matches() evaluates a filter against one record's metadata, with Pinecone's
+semantics, for stores that filter in process (FakeVectorStore).
+"""
+
+from datetime import datetime, time as dt_time
+from typing import Any, Dict, List, Optional, Union
+
+CONTENT_TYPES = ("text", "table")
+MAX_FILTER_VALUES = 1000  # filenames in one document condition
+
+_OPERATORS = {
+    "$eq": lambda value, arg: value == arg,
+    "$ne": lambda value, arg: value != arg,
+    "$in": lambda value, arg: value in arg,
+    "$nin": lambda value, arg: value not in arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+}
+
+
+def to_timestamp(value: Union[str, datetime], end_of_day: bool = False) -> int:
+    """
+    Convert an ISO date/datetime to epoch seconds (the 'timestamp' metadata field).
+    
+    Args:
+        value: ISO date ('2024-05-01') or datetime ('2024-05-01T13:00:00'), or a datetime.
+        end_of_day: Map a plain date to 23:59:59 instead of 00:00:00 (inclusive upper bound).
+    
+    Raises:
+        ValueError: If the string is not an ISO date/datetime.
+    """
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date '{value}' (expected ISO format, e.g. 2024-05-01)")
+    
+    if end_of_day and len(value) == 10:
+        parsed = datetime.combine(parsed.date(), dt_time.max)
+    return int(parsed.timestamp())
+
+
+def build_filter(
+    source: Optional[Union[str, List[str]]] = None,
+    content_type: Optional[str] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    documents: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Build a Pinecone metadata filter; None when no criterion is given.
+    
+    Args:
+        source: Filename, or list of filenames.
+        content_type: 'text' or 'table'.
+        page_from: First page (inclusive).
+        page_to: Last page (inclusive).
+        documents: Document condition from document_condition() (version,
+            date and latest-version criteria; see resolve_filter).
+    
+    Returns:
+        Filter such as {"$and": [{"source": {"$eq": "report.pdf"}},
+        {"page_number": {"$gte": 3, "$lte": 7}}]}, or None.
+    
+    Raises:
+        ValueError: On an unknown content type or an empty page range.
+    """
+    conditions = []
+    
+    sources = _sources(source)
+    if sources:
+        if len(sources) > MAX_FILTER_VALUES:
+            raise ValueError(f"Too many sources ({len(sources)}; at most {MAX_FILTER_VALUES})")
+        if len(sources) == 1:
+            conditions.append({"source": {"$eq": sources[0]}})
+        else:
+            conditions.append({"source": {"$in": sources}})
+    
+    if content_type:
+        if content_type not in CONTENT_TYPES:
+            raise ValueError(f"Unknown content_type '{content_type}' (expected one of {', '.join(CONTENT_TYPES)})")
+        conditions.append({"content_type": {"$eq": content_type}})
+    
+    pages = {}
+    if page_from is not None:
+        pages["$gte"] = int(page_from)
+    if page_to is not None:
+        pages["$lte"] = int(page_to)
+    if pages:
+        if pages.get("$gte", 0) > pages.get("$lte", float("inf")):
+            raise ValueError(f"Empty page range: {page_from} > {page_to}")
+        conditions.append({"page_number": pages})
+    
+    if documents:
+        conditions.extend(documents.get("$and", [documents]))
+    
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def _sources(source: Optional[Union[str, List[str]]]) -> List[str]:
+    if not source:
+        return []
+    return [name.strip() for name in ([source] if isinstance(source, str) else source)]
+
+
+def select_documents(
+    states: Dict[str, Dict[str, Any]],
+    version: Optional[int] = None,
+    date_from: Optional[Union[str, datetime]] = None,
+    date_to: Optional[Union[str, datetime]] = None
+) -> List[str]:
+    """
+    Processed documents whose active version matches the version and upload-date criteria.
+    
+    Args:
+        states: Filename → state, as returned by SQLiteManager.get_version_states.
+        version: Active version.
+        date_from: Earliest upload date of the active version (inclusive).
+        date_to: Latest upload date (inclusive; a plain date covers the whole day).
+    
+    Raises:
+        ValueError: On a malformed date or an empty date range.
+    """
+    low = to_timestamp(date_from) if date_from else None
+    high = to_timestamp(date_to, end_of_day=True) if date_to else None
+    if low is not None and high is not None and low > high:
+        raise ValueError(f"Empty date range: {date_from} > {date_to}")
+    
+    selected = []
+    for filename, state in sorted(states.items()):
+        if state["version"] is None:
+            continue
+        if version is not None and state["version"] != int(version):
+            continue
+        if low is not None or high is not None:
+            uploaded = to_timestamp(str(state["uploaded_at"]))
+            if (low is not None and uploaded < low) or (high is not None and uploaded > high):
+                continue
+        selected.append(filename)
+    return selected
+
+
+def document_condition(
+    states: Dict[str, Dict[str, Any]],
+    selected: List[str],
+    max_values: int = MAX_FILTER_VALUES
+) -> Optional[Dict[str, Any]]:
+    """
+    Condition matching the active-version chunks of the selected documents.
+    
+    Uses whichever of two forms lists fewer filenames: keep the selected
+    documents ($in), or drop the other known documents ($nin). Documents
+    with an ingestion in flight also get a version bound, which drops the
+    chunks that ingestion already upserted.
+    
+    Args:
+        states: Filename → state (SQLiteManager.get_version_states).
+        selected: Filenames to keep (see select_documents).
+        max_values: Most filenames the condition may list.
+    
+    Returns:
+        The condition, or None if it would match every chunk anyway.
+    
+    Raises:
+        ValueError: If no document is selected, or either form exceeds max_values.
+    """
+    if not selected:
+        raise ValueError("No processed document matches the version/date filter")
+    
+    keep = set(selected)
+    in_flight = [
+        {"source": {"$eq": name}, "version": {"$lte": states[name]["version"]}}
+        for name in selected if states[name]["pending"]
+    ]
+    settled = [name for name in selected if not states[name]["pending"]]
+    dropped = sorted(name for name in states if name not in keep)
+    
+    if len(selected) <= len(dropped) + len(in_flight):
+        if len(selected) > max_values:
+            raise ValueError(
+                f"Filter selects {len(selected)} documents (at most {max_values}); narrow it by source or date"
+            )
+        alternatives = ([{"source": {"$in": settled}}] if settled else []) + in_flight
+        return alternatives[0] if len(alternatives) == 1 else {"$or": alternatives}
+    
+    if len(dropped) + len(in_flight) > max_values:
+        raise ValueError(
+            f"Filter excludes {len(dropped)} documents (at most {max_values}); narrow it by source or date"
+        )
+    conditions = [{"source": {"$nin": dropped}}] if dropped else []
+    conditions += [
+        {"$or": [{"source": {"$ne": bound["source"]["$eq"]}}, {"version": bound["version"]}]}
+        for bound in in_flight
+    ]
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def resolve_filter(
+    db_manager,
+    username: str,
+    source: Optional[Union[str, List[str]]] = None,
+    version: Optional[int] = None,
+    content_type: Optional[str] = None,
+    date_from: Optional[Union[str, datetime]] = None,
+    date_to: Optional[Union[str, datetime]] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    latest_only: bool = False,
+    max_values: int = MAX_FILTER_VALUES
+) -> Optional[Dict[str, Any]]:
+    """
+    Build a search filter, answering version, date and latest-version criteria from SQLite.
+    
+    Blocking (reads the metadata database); call it off the event loop.
+    
+    Args:
+        db_manager: SQLiteManager of the metadata database.
+        username: Namespace the filter is for.
+        source, content_type, page_from, page_to: Metadata criteria (see build_filter).
+        version, date_from, date_to: Criteria on each document's active version
+            (see select_documents).
+        latest_only: Only chunks of processed, active versions.
+        max_values: Most filenames the document condition may list.
+    
+    Returns:
+        Pinecone metadata filter, or None.
+    
+    Raises:
+        ValueError: On invalid criteria, or if the document condition cannot be expressed.
+    """
+    documents = None
+    if latest_only or version is not None or date_from or date_to:
+        states = db_manager.get_version_states(username, _sources(source) or None)
+        selected = select_documents(states, version, date_from, date_to)
+        documents = document_condition(states, selected, max_values)
+    return build_filter(source, content_type, page_from, page_to, documents=documents)
+
+
+def describe_filter(metadata_filter: Optional[Dict[str, Any]]) -> str:
+    """Short human-readable form of a filter for logs and CLI output."""
+    if not metadata_filter:
+        return "none"
+    
+    parts = []
+    for condition in metadata_filter.get("$and", [metadata_filter]):
+        for field, ops in condition.items():
+            if field == "$or":
+                parts.append("(" + " | ".join(describe_filter(sub) for sub in ops) + ")")
+            else:
+                parts.append(f"{field} " + " ".join(f"{op[1:]} {value}" for op, value in ops.items()))
+    return ", ".join(parts)
+
+
+def matches(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Whether a record's metadata satisfies a Pinecone metadata filter.
+    
+    Supports $and / $or and the field operators $eq, $ne, $in, $nin, $gt,
+    $gte, $lt and $lte; a bare value means $eq.
+    
+    Raises:
+        ValueError: On an unsupported operator.
+    """
+    if not metadata_filter:
+        return True
+    
+    for field, condition in metadata_filter.items():
+        if field == "$and":
+            if not all(matches(metadata, sub) for sub in condition):
+                return False
+        elif field == "$or":
+            if not any(matches(metadata, sub) for sub in condition):
+                return False
+        else:
+            ops = condition if isinstance(condition, dict) else {"$eq": condition}
+            for op, arg in ops.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f"Unsupported filter operator '{op}'")
+                if not _OPERATORS[op](metadata.get(field), arg):
+                    return False
+    return True
+
+
+if __name__ == "__main__":
+    print("=== Search Filter Test ===\n")
+    
+    assert build_filter() is None
+    
+    single = build_filter(source="report.pdf")
+    assert single == build_filter(source=["report.pdf"]) == {"source": {"$eq": "report.pdf"}}
+    print(f"✅ Single criterion: {single}")
+    
+    combined = build_filter(source=["a.pdf", "b.pdf"], content_type="table", page_from=3, page_to=7)
+    assert [list(condition)[0] for condition in combined["$and"]] == ["source", "content_type", "page_number"]
+    assert to_timestamp("2024-05-01T12:00:00") == to_timestamp("2024-05-01") + 12 * 3600
+    print(f"✅ Combined: {describe_filter(combined)}")
+    
+    # Version states as returned by SQLiteManager.get_version_states
+    class FakeDB:
+        def __init__(self, states):
+            self.states = states
+        
+        def get_version_states(self, username, filenames=None):
+            return {name: state for name, state in self.states.items() if not filenames or name in filenames}
+    
+    db = FakeDB({
+        "a.pdf": {"version": 3, "uploaded_at": "2024-05-31 18:00:00", "pending": False},
+        "b.pdf": {"version": 2, "uploaded_at": "2024-04-02 09:00:00", "pending": True},   # v3 in flight
+        "c.pdf": {"version": 1, "uploaded_at": "2024-05-02 10:00:00", "pending": False},
+        "new.pdf": {"version": None, "uploaded_at": None, "pending": True},           # first version in flight
+    })
+    
+    for bad in (
+        {"content_type": "image"},
+        {"date_from": "yesterday"},
+        {"page_from": 9, "page_to": 2},
+        {"date_from": "2024-06-01", "date_to": "2024-05-01"},
+        {"version": 7},
+    ):
+        try:
+            resolve_filter(db, "alice", **bad)
+            raise AssertionError(f"accepted {bad}")
+        except ValueError as e:
+            print(f"✅ Rejected {bad}: {e}")
+    
+    # Version and date select documents from SQLite; unchanged chunks keep their old stamps
+    may = resolve_filter(db, "alice", date_from="2024-05-01", date_to="2024-05-31")
+    assert may == {"source": {"$in": ["a.pdf", "c.pdf"]}}  # whole last day included
+    unchanged = {"source": "a.pdf", "version": 1, "content_type": "text", "page_number": 2}
+    assert matches(unchanged, may) and matches(unchanged, resolve_filter(db, "alice", version=3))
+    assert not matches(dict(unchanged, source="b.pdf"), may)
+    print(f"✅ Date range from SQLite: {describe_filter(may)}")
+    
+    # Latest only: nothing to exclude but in-flight chunks
+    latest = resolve_filter(db, "alice", latest_only=True, content_type="text")
+    assert matches(unchanged, latest) and matches(dict(unchanged, source="b.pdf", version=2), latest)
+    assert not matches(dict(unchanged, source="b.pdf", version=3), latest)
+    assert not matches(dict(unchanged, source="new.pdf"), latest)
+    assert resolve_filter(FakeDB({"a.pdf": db.states["a.pdf"]}), "alice", latest_only=True) is None
+    print(f"✅ Latest only: {describe_filter(latest)}")
+    
+    # Heavy tenants: the shorter form is used, and both forms are bounded
+    many = FakeDB({
+        f"doc{i:05d}.pdf": {"version": 1 + i % 2, "uploaded_at": "2024-05-01 00:00:00", "pending": False}
+        for i in range(5000)
+    })
+    assert resolve_filter(many, "alice", latest_only=True) is None
+    assert resolve_filter(many, "alice", version=1, max_values=5000)["source"]["$in"][:2] == ["doc00000.pdf", "doc00002.pdf"]
+    try:
+        resolve_filter(many, "alice", version=1)
+        raise AssertionError("listed 2500 filenames")
+    except ValueError as e:
+        print(f"✅ Bounded filter size: {e}")
+    many.states["doc00001.pdf"]["version"] = 3
+    assert resolve_filter(many, "alice", version=3) == {"source": {"$in": ["doc00001.pdf"]}}
+    assert resolve_filter(many, "alice", version=1, source=["doc00000.pdf", "doc00001.pdf"]) == {
+        "$and": [{"source": {"$in": ["doc00000.pdf", "doc00001.pdf"]}}, {"source": {"$in": ["doc00000.pdf"]}}]
+    }
+    
+    # Client-side evaluation agrees with the filters built above
+    record = {"source": "b.pdf", "version": 2, "content_type": "table", "page_number": 7}
+    assert matches(record, combined) and matches(record, None)
+    assert not matches(dict(record, page_number=8), combined)
+    assert not matches(dict(record, source="c.pdf"), combined)
+    assert matches(record, {"$or": [{"source": "x.pdf"}, {"version": {"$gte": 2}}]})
+    print("✅ matches() evaluates filters client-side")
+    
+    print("\n✅ All tests passed!")
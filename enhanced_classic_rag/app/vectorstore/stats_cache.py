@@ -0,0 +1,191 @@
+"""
+Stats Cache — vector index statistics refreshed in the background.
+
+`describe_index_stats` is a billable round trip. Health probes from a load
+balancer and frontend reruns used to trigger one per request; now a single
+asyncio task refreshes the statistics every `ttl_seconds` and requests read
+the cached snapshot:
+
+- GET /stats          → the last snapshot, with its age
+- GET /health/ready   → ready while the last refresh succeeded and is no
+                        older than `max_staleness_seconds`
+- GET /health/live    → no I/O at all (see api.py)
+
+A failed refresh keeps the previous statistics but marks connectivity as
+lost, so readiness turns false without the probe itself calling the index.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StatsCache:
+    """Caches the result of an async stats call and refreshes it periodically."""
+    
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl_seconds: float = 60.0,
+        max_staleness_seconds: float = 180.0,
+        timeout_seconds: float = 10.0
+    ):
+        """
+        Initialize cache.
+        
+        Args:
+            fetch: Coroutine function returning the statistics (e.g. VectorStore.aget_stats).
+            ttl_seconds: Seconds between background refreshes.
+            max_staleness_seconds: Age of the last successful refresh beyond
+                                   which the service is reported not ready.
+            timeout_seconds: Time limit of one refresh.
+        """
+        self.fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self.timeout_seconds = timeout_seconds
+        
+        self.stats: Optional[Dict[str, Any]] = None
+        self.refreshed_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.refreshes = 0
+        self.failures = 0
+        self._refreshed_monotonic: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    async def refresh(self) -> bool:
+        """
+        Fetch the statistics once; concurrent callers share the same fetch.
+        
+        Returns:
+            True if the fetch succeeded.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        started = time.monotonic()
+        async with self._lock:
+            if self._refreshed_monotonic is not None and self._refreshed_monotonic >= started:
+                return self.last_error is None  # refreshed while this caller waited
+            
+            self.refreshes += 1
+            try:
+                stats = await asyncio.wait_for(self.fetch(), timeout=self.timeout_seconds)
+                # Index stats may hold SDK objects; keep a JSON-safe copy
+                self.stats = json.loads(json.dumps(stats, default=str))
+                self.refreshed_at = datetime.now()
+                self.last_error = None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Stats refresh failed: {self.last_error}")
+            self._refreshed_monotonic = time.monotonic()
+            return self.last_error is None
+    
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the last successful refresh (None before the first one)."""
+        if self.refreshed_at is None:
+            return None
+        return (datetime.now() - self.refreshed_at).total_seconds()
+    
+    def is_ready(self) -> bool:
+        """Connected: the last refresh succeeded and is recent enough."""
+        age = self.age_seconds()
+        return self.last_error is None and age is not None and age <= self.max_staleness_seconds
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """The cached statistics and their freshness."""
+        age = self.age_seconds()
+        return {
+            "stats": self.stats,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "ttl_seconds": self.ttl_seconds,
+            "stale": age is None or age > self.ttl_seconds,
+            "last_error": self.last_error,
+        }
+    
+    async def get(self) -> Dict[str, Any]:
+        """The snapshot, fetched first if nothing was cached yet."""
+        if self.refreshed_at is None and self.last_error is None:
+            await self.refresh()
+        return self.snapshot()
+    
+    async def _loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.ttl_seconds)
+    
+    def start(self) -> None:
+        """Start the background refresh task on the running event loop (first refresh now)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+            logger.info(f"Index stats refreshed every {self.ttl_seconds:g}s")
+    
+    async def stop(self) -> None:
+        """Cancel the background refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+if __name__ == "__main__":
+    from app.vectorstore.fake_store import FakeVectorStore
+    
+    print("=== Stats Cache Test ===\n")
+    
+    async def main():
+        store = FakeVectorStore(latency="instant")
+        calls = 0
+        failing = False
+        
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            if failing:
+                raise ConnectionError("index unreachable")
+            return await store.aget_stats()
+        
+        cache = StatsCache(fetch, ttl_seconds=0.2, max_staleness_seconds=0.5)
+        assert not cache.is_ready()
+        
+        # Concurrent first reads share one fetch
+        snapshots = await asyncio.gather(*(cache.get() for _ in range(50)))
+        assert calls == 1 and all(s["stats"] == snapshots[0]["stats"] for s in snapshots)
+        assert cache.is_ready()
+        print(f"✅ 50 concurrent reads → {calls} fetch")
+        
+        # Background refresh: one fetch per TTL, however many reads
+        cache.start()
+        for _ in range(100):
+            await cache.get()
+            cache.is_ready()
+            await asyncio.sleep(0.01)
+        assert 3 <= calls <= 12, calls
+        print(f"✅ 100 reads over ~1s with a 0.2s TTL → {calls} fetches")
+        
+        # A failed refresh keeps the last stats but reports not ready
+        failing = True
+        await cache.refresh()
+        snapshot = cache.snapshot()
+        assert not cache.is_ready() and snapshot["stats"] is not None and "unreachable" in snapshot["last_error"]
+        print(f"✅ Failed refresh → not ready, cached stats kept ({snapshot['last_error']})")
+        
+        failing = False
+        await cache.refresh()
+        assert cache.is_ready()
+        await cache.stop()
+        print("✅ Recovered on the next refresh; background task stopped")
+    
+    asyncio.run(main())
+    print("\n✅ All tests passed!")
@@ -11,6 +11,7 @@ Features:
 """
 
 import os
+import time
 import base64
 import requests
 import streamlit as st
@@ -40,6 +41,8 @@ if 'current_question' not in st.session_state:
     st.session_state['current_question'] = ""
 if 'user_documents' not in st.session_state:
     st.session_state['user_documents'] = []
+if 'documents_etag' not in st.session_state:
+    st.session_state['documents_etag'] = None
 if 'last_upload_info' not in st.session_state:
     st.session_state['last_upload_info'] = None
 
@@ -205,11 +208,18 @@ st.markdown("""
 # ============================
 
 def fetch_user_documents(username: str) -> list:
-    """Fetch user's documents from API."""
+    """Fetch user's documents from API (skips the download if the list is unchanged)."""
+    headers = {}
+    if st.session_state['documents_etag'] and st.session_state['user_documents']:
+        headers['If-None-Match'] = st.session_state['documents_etag']
+    
     try:
-        response = requests.get(f"{API_BASE}/documents/{username}", timeout=5)
+        response = requests.get(f"{API_BASE}/documents/{username}", headers=headers, timeout=5)
+        if response.status_code == 304:
+            return st.session_state['user_documents']
         if response.ok:
             data = response.json()
+            st.session_state['documents_etag'] = response.headers.get('ETag')
             return data.get('documents', [])
     except Exception as e:
         st.error(f"Error fetching documents: {str(e)}")
@@ -218,6 +228,10 @@ def fetch_user_documents(username: str) -> list:
 
 def format_update_info(info: Dict[str, Any]) -> str:
     """Format upload/update information for display."""
+    filter_stats = info.get('filter_stats') or {}
+    filtered = filter_stats.get('dropped_chunks', 0) + filter_stats.get('merged_chunks', 0)
+    filtered_line = f"\n            - **Filtered:** 🧹 {filtered} low-value chunks" if filtered else ""
+    
     if info['status'] == 'duplicate':
         return f"⚠️ **Duplicate Document** - Same content already exists (Version {info.get('version', 'N/A')})"
     elif info['status'] == 'success':
@@ -230,7 +244,8 @@ def format_update_info(info: Dict[str, Any]) -> str:
             - **Changes:**
               - ➕ Added: {info['chunks_added']} chunks
               - ➖ Deleted: {info['chunks_deleted']} chunks
-              - ✓ Unchanged: {info['unchanged_chunks']} chunks
+              - 🔀 Moved: {info.get('chunks_updated', 0)} chunks (metadata only)
+              - ✓ Unchanged: {info['unchanged_chunks']} chunks{filtered_line}
             """
         else:
             # New upload
@@ -239,7 +254,7 @@ def format_update_info(info: Dict[str, Any]) -> str:
             - **Version:** {info.get('version', 1)}
             - **Total Chunks:** {info['total_chunks']}
             - **Text Chunks:** {info['text_chunks']}
-            - **Table Chunks:** {info['table_chunks']}
+            - **Table Chunks:** {info['table_chunks']}{filtered_line}
             """
     return ""
 
@@ -300,6 +315,7 @@ if st.sidebar.button("🔓 Sign Out", use_container_width=True):
     st.session_state['username'] = ""
     st.session_state['chat_history'] = []
     st.session_state['user_documents'] = []
+    st.session_state['documents_etag'] = None
     st.rerun()
 
 st.sidebar.markdown("---")
@@ -337,8 +353,21 @@ if uploaded_file:
                 file_handle.close()
                 os.remove(temp_path)  # Cleanup
                 
+                # Ingestion runs in the background: poll the job until it finishes
                 if response.ok:
-                    result = response.json()
+                    job = response.json()
+                    progress_bar = st.sidebar.progress(0.0, text="Queued...")
+                    while job['status'] in ('queued', 'running'):
+                        time.sleep(1)
+                        job = requests.get(f"{API_BASE}/jobs/{job['job_id']}", timeout=10).json()
+                        pages = f" ({job['pages_done']}/{job['pages_total']} pages)" if job['pages_total'] else ""
+                        progress_bar.progress(min(job['progress'], 1.0), text=f"{job['stage']}{pages}")
+                    progress_bar.empty()
+                
+                if response.ok and job['status'] == 'failed':
+                    st.sidebar.error(f"❌ Ingestion failed: {job['error']}")
+                elif response.ok:
+                    result = job['result']
                     st.session_state['last_upload_info'] = result
                     
                     # Show result
@@ -0,0 +1,123 @@
+"""
+Load test — /search latency with and without concurrent /chat traffic.
+
+Measures /search latency twice against a running API server:
+1. Baseline: /search requests only
+2. Under load: the same /search requests while N clients keep /chat calls
+   (retrieval + rerank + LLM generation) in flight
+
+With a non-blocking event loop the two distributions match; if any handler
+blocked the loop, every /search would wait behind the in-flight /chat calls.
+
+Usage:
+    python load_test.py <username> [base_url] [chat_clients] [search_requests]
+
+Example:
+    python main.py serve &
+    python load_test.py alice http://localhost:8000 8 200
+"""
+
+import sys
+import time
+import threading
+import statistics
+from typing import Dict, List
+
+import requests
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of latencies in milliseconds."""
+    ordered = sorted(latencies)
+    
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    
+    return {
+        "p50": statistics.median(ordered),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+def run_searches(base_url: str, username: str, count: int) -> List[float]:
+    """Issue `count` sequential /search requests; return latencies in ms."""
+    latencies = []
+    with requests.Session() as session:
+        for i in range(count):
+            start = time.perf_counter()
+            response = session.post(
+                f"{base_url}/search",
+                json={"query": f"revenue growth {i % 10}", "username": username, "top_k": 5},
+                timeout=60
+            )
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def chat_client(base_url: str, username: str, stop: threading.Event, completed: List[float]) -> None:
+    """Keep one /chat request in flight until `stop` is set."""
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                session.post(
+                    f"{base_url}/chat",
+                    json={"question": "Summarize the key findings", "username": username, "use_reranker": True},
+                    timeout=120
+                )
+                completed.append((time.perf_counter() - start) * 1000)
+            except requests.RequestException:
+                pass
+
+
+def main(username: str, base_url: str, chat_clients: int, search_requests: int) -> None:
+    print(f"\n⏱️  Load test: {base_url} (user: {username})")
+    print(f"   {search_requests} /search requests, {chat_clients} concurrent /chat clients")
+    print("=" * 60)
+    
+    run_searches(base_url, username, 5)  # warm up connections and async clients
+    
+    baseline = percentiles(run_searches(base_url, username, search_requests))
+    
+    stop = threading.Event()
+    chat_latencies: List[float] = []
+    clients = [
+        threading.Thread(target=chat_client, args=(base_url, username, stop, chat_latencies), daemon=True)
+        for _ in range(chat_clients)
+    ]
+    for client in clients:
+        client.start()
+    time.sleep(1.0)  # let the /chat calls reach the LLM
+    
+    try:
+        loaded = percentiles(run_searches(base_url, username, search_requests))
+    finally:
+        stop.set()
+        for client in clients:
+            client.join(timeout=120)
+    
+    print(f"{'':22s}{'p50':>9s}{'p95':>9s}{'p99':>9s}{'max':>9s}  (ms)")
+    for label, stats in (("/search baseline", baseline), ("/search under /chat", loaded)):
+        print(f"{label:22s}" + "".join(f"{stats[key]:9.1f}" for key in ("p50", "p95", "p99", "max")))
+    if chat_latencies:
+        print(f"{'/chat':22s}" + "".join(f"{percentiles(chat_latencies)[key]:9.1f}" for key in ("p50", "p95", "p99", "max")))
+    
+    ratio = loaded["p99"] / baseline["p99"] if baseline["p99"] else float("inf")
+    print(f"\n/search p99 under /chat load: {ratio:.2f}x baseline ({len(chat_latencies)} chats completed)")
+    print("✅ Flat" if ratio < 1.5 else "⚠️  /search latency grows with /chat load")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    
+    main(
+        username=sys.argv[1],
+        base_url=sys.argv[2].rstrip("/") if len(sys.argv) > 2 else "http://localhost:8000",
+        chat_clients=int(sys.argv[3]) if len(sys.argv) > 3 else 8,
+        search_requests=int(sys.argv[4]) if len(sys.argv) > 4 else 200
+    )
@@ -8,11 +8,44 @@ Usage:
     # Ingest a document
     python main.py ingest <file_path> <username>
     
-    # Search documents
-    python main.py search "<query>" <username>
+    # Search documents (optional server-side metadata filters)
+    python main.py search "<query>" <username> [--top-k N] [--source FILE ...] [--version N]
+        [--content-type text|table] [--date-from DATE] [--date-to DATE] [--page-from N] [--page-to N]
+        [--latest]
     
-    # Ask a question (full RAG)
-    python main.py ask "<question>" <username>
+    # Ask a question (full RAG; same filters, plus --top-n N, --no-rerank and --window N)
+    python main.py ask "<question>" <username> [options]
+    
+    # --hybrid on search/ask fuses dense and lexical (FTS5 BM25) retrieval
+    python main.py search "INV-2024-0042" <username> --hybrid
+    
+    # Index chunks ingested before the lexical index existed (text fetched from Pinecone)
+    python main.py lexical-backfill [username]
+    
+    # Store the text of chunks ingested before the chunk text store (fetched from Pinecone)
+    python main.py text-backfill [username]
+    
+    # Re-upsert active chunks from the chunk text store (new embedding model; no PDF re-parsing)
+    python main.py reembed [username]
+    
+    # Show rerank cache statistics, or drop cached reranks (of one user)
+    python main.py rerank-cache [clear [username]]
+    
+    # Recall@k / latency of dense vs. lexical vs. hybrid on a labelled query set
+    python main.py benchmark-retrieval <username> <queries.jsonl> [--top-k N]
+    
+    # Upgrade the metadata database schema in place
+    python main.py migrate-db [batch_size]
+    
+    # Purge expired metadata rows and reclaim database space
+    python main.py compact [retention_days]
+    
+    # Finish or roll back ingestions interrupted by a crash
+    python main.py recover [stale_after_hours]
+    
+    # Bulk-ingest a directory (one sub-directory per user) or a manifest
+    python main.py ingest-dir <directory> [username] [--workers N] [--processes] [--checkpoint FILE]
+    python main.py ingest-manifest <manifest.csv|.jsonl> [--workers N] [--processes] [--checkpoint FILE]
 """
 
 import sys
@@ -40,6 +73,7 @@ def serve():
     
     print(f"Database: {settings.SQLITE_DB_PATH}")
     print(f"Index: {settings.PINECONE_INDEX_NAME}")
+    print(f"Vector store: {settings.VECTOR_STORE}")
     print(f"Embedding: {settings.EMBEDDING_MODEL}")
     print(f"Reranker: {settings.RERANKER_MODEL}")
     print(f"Server: http://0.0.0.0:8000")
@@ -94,18 +128,62 @@ def ingest(file_path: str, username: str):
         sys.exit(1)
 
 
-def search(query: str, username: str, top_k: int = 10):
+def parse_query_options(command: str, username: str, options: list):
+    """Parse search/ask options into (args, metadata_filter); exits on invalid filters."""
+    import argparse
+    from app.core.config import settings
+    from app.db.sqlite_manager import SQLiteManager
+    from app.vectorstore.search_filter import resolve_filter
+    
+    parser = argparse.ArgumentParser(prog=f"main.py {command}")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--hybrid", action="store_true", help="Fuse dense and lexical (BM25) retrieval")
+    if command == "ask":
+        parser.add_argument("--top-n", type=int, default=5)
+        parser.add_argument("--no-rerank", action="store_true", help="Plain vector search instead of search + rerank")
+        parser.add_argument("--window", type=int, default=None, help="Neighbouring chunks added around each hit (0 = off)")
+    parser.add_argument("--source", action="append", default=None, help="Restrict to a filename (repeatable)")
+    parser.add_argument("--version", type=int, default=None, help="Active version of the document")
+    parser.add_argument("--content-type", choices=["text", "table"], default=None)
+    parser.add_argument("--date-from", default=None, help="Earliest upload date of the active version (ISO, inclusive)")
+    parser.add_argument("--date-to", default=None, help="Latest upload date of the active version (ISO, inclusive)")
+    parser.add_argument("--page-from", type=int, default=None)
+    parser.add_argument("--page-to", type=int, default=None)
+    parser.add_argument("--latest", action="store_true", help="Only the processed, active version of each document")
+    args = parser.parse_args(options)
+    
+    try:
+        metadata_filter = resolve_filter(
+            SQLiteManager(settings.SQLITE_DB_PATH),
+            username,
+            source=args.source,
+            version=args.version,
+            content_type=args.content_type,
+            date_from=args.date_from,
+            date_to=args.date_to,
+            page_from=args.page_from,
+            page_to=args.page_to,
+            latest_only=args.latest
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    return args, metadata_filter
+
+
+def search(query: str, username: str, top_k: int = 10, metadata_filter: dict = None, hybrid: bool = False):
     """Search documents."""
     from app.pipeline.processing_pipeline import ProcessingPipeline
+    from app.vectorstore.search_filter import describe_filter
     
     print(f"\n🔍 Query: {query}")
     print(f"👤 User: {username}")
-    print(f"📊 Top K: {top_k}")
+    print(f"📊 Top K: {top_k}{' (hybrid)' if hybrid else ''}")
+    print(f"🔎 Filter: {describe_filter(metadata_filter)}")
     print("=" * 60)
     
     try:
         pipeline = ProcessingPipeline()
-        results = pipeline.search_documents(query, username, top_k)
+        results = pipeline.search_documents(query, username, top_k, metadata_filter, hybrid=hybrid)
         
         print(f"\n✅ Found {len(results)} results:\n")
         
@@ -123,16 +201,25 @@ def search(query: str, username: str, top_k: int = 10):
         sys.exit(1)
 
 
-def ask(question: str, username: str, use_reranker: bool = True, top_k: int = 10, top_n: int = 5):
-    """Ask a question using full RAG pipeline."""
+def ask(
+    question: str,
+    username: str,
+    use_reranker: bool = True,
+    top_k: int = 10,
+    top_n: int = 5,
+    metadata_filter: dict = None,
+    hybrid: bool = False,
+    context_window: int = None
+):
+    """Ask a question using full RAG pipeline (hybrid candidates are reranked unless use_reranker is off)."""
     from app.pipeline.processing_pipeline import ProcessingPipeline
-    from app.vectorstore.reranker import Reranker
+    from app.vectorstore.search_filter import describe_filter
     from app.generation import Generator
-    from app.core.config import settings
     
     print(f"\n💬 Question: {question}")
     print(f"👤 User: {username}")
-    print(f"🔀 Reranker: {'enabled' if use_reranker else 'disabled'}")
+    print(f"🔀 Retrieval: {'hybrid' if hybrid else 'dense'}{' + rerank' if use_reranker else ''}")
+    print(f"🔎 Filter: {describe_filter(metadata_filter)}")
     print("=" * 60)
     
     try:
@@ -140,21 +227,25 @@ def ask(question: str, username: str, use_reranker: bool = True, top_k: int = 10
         
         # Retrieve or rerank
         if use_reranker:
-            reranker = Reranker(
-                api_key=settings.PINECONE_API_KEY,
-                index_name=settings.PINECONE_INDEX_NAME,
-                rerank_model=settings.RERANKER_MODEL
-            )
-            chunks = reranker.rerank(question, username.lower(), top_k, top_n)
-            print(f"\n✅ Retrieved and reranked {len(chunks)} chunks\n")
+            chunks = pipeline.search_reranked(question, username, top_k, top_n, metadata_filter, hybrid=hybrid)
+            print(f"\n✅ Retrieved and reranked {len(chunks)} chunks{' (dense + lexical fusion)' if hybrid else ''}\n")
+        elif hybrid:
+            chunks = pipeline.search_documents(question, username, top_k, metadata_filter, hybrid=True)[:top_n]
+            print(f"\n✅ Retrieved {len(chunks)} chunks (dense + lexical fusion)\n")
         else:
-            chunks = pipeline.search_documents(question, username, top_k)
+            chunks = pipeline.search_documents(question, username, top_k, metadata_filter)
             print(f"\n✅ Retrieved {len(chunks)} chunks\n")
         
         if not chunks:
             print("❌ No relevant information found")
             return
         
+        # Widen hits to their neighbouring chunks (local reads only)
+        chunks = pipeline.expand_context(chunks, username, context_window)
+        expanded = sum(len(chunk.get("chunk_ids", [])) for chunk in chunks)
+        if expanded:
+            print(f"📐 Context: {len(chunks)} entries covering {expanded} chunks\n")
+        
         # Generate answer
         generator = Generator()
         result = generator.generate_with_citations(question, chunks)
@@ -181,6 +272,292 @@ def ask(question: str, username: str, use_reranker: bool = True, top_k: int = 10
         sys.exit(1)
 
 
+def migrate_db(batch_size: int = 5000):
+    """Upgrade the metadata database schema in place (batched backfills)."""
+    from app.core.config import settings
+    from app.db import migrations
+    from app.db.sqlite_manager import SQLiteManager
+    
+    print(f"\n🗄️  Database: {settings.SQLITE_DB_PATH}")
+    print(f"📦 Batch size: {batch_size}")
+    print("=" * 60)
+    
+    def progress(done: int, total: int):
+        print(f"   Backfilled {done:,}/{total:,} rows", end="\r")
+    
+    try:
+        manager = SQLiteManager(settings.SQLITE_DB_PATH, auto_migrate=False)
+        result = migrations.migrate(manager, batch_size=batch_size, progress=progress)
+        manager.close()
+        
+        print()
+        for key, value in result.items():
+            print(f"{key:20s}: {value}")
+        print("\n✅ Database schema is up to date")
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def compact(retention_days: int = None):
+    """Purge expired duplicates/inactive chunks and reclaim database space."""
+    from app.core.config import settings
+    from app.db.compaction import Compactor
+    from app.db.sqlite_manager import SQLiteManager
+    
+    retention_days = settings.RETENTION_DAYS if retention_days is None else retention_days
+    
+    print(f"\n🗄️  Database: {settings.SQLITE_DB_PATH}")
+    print(f"🗓️  Retention: {retention_days} days")
+    print("=" * 60)
+    
+    try:
+        manager = SQLiteManager(settings.SQLITE_DB_PATH)
+        report = Compactor(manager, retention_days=retention_days).run()
+        manager.close()
+        
+        for key, value in report.items():
+            print(f"{key:20s}: {value}")
+        print(f"\n✅ Reclaimed {report['bytes_reclaimed'] / 1024 / 1024:.1f} MiB")
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def recover(stale_after_hours: float = None):
+    """Finish or roll back ingestions interrupted by a crash (run while the API is stopped)."""
+    from app.pipeline.processing_pipeline import ProcessingPipeline
+    
+    print("\n🩹 Recovering interrupted ingestions")
+    print("=" * 60)
+    
+    try:
+        pipeline = ProcessingPipeline()
+        report = pipeline.recover_incomplete_ingestions(stale_after_hours)
+        
+        for key, value in report.items():
+            print(f"{key:20s}: {value}")
+        
+        if report["errors"]:
+            print("\n⚠️  Some documents could not be recovered (see log)")
+            sys.exit(1)
+        print("\n✅ Recovery complete")
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def bulk_ingest(source: str, options: list, manifest: bool = False):
+    """Ingest many files with one warm pipeline (resumable with --checkpoint)."""
+    import argparse
+    from app.core.config import settings
+    from app.pipeline.bulk_ingest import BulkIngestor
+    
+    parser = argparse.ArgumentParser(prog=f"main.py {'ingest-manifest' if manifest else 'ingest-dir'}")
+    if not manifest:
+        parser.add_argument("username", nargs="?", default=None)
+    parser.add_argument("--workers", type=int, default=settings.BULK_INGEST_WORKERS)
+    parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    parser.add_argument("--checkpoint", default=None, help="JSON Lines file making the run resumable")
+    args = parser.parse_args(options)
+    
+    print(f"\n📚 Bulk ingest: {source}")
+    print(f"⚙️  Workers: {args.workers} {'processes' if args.processes else 'threads'}")
+    if args.checkpoint:
+        print(f"📍 Checkpoint: {args.checkpoint}")
+    print("=" * 60)
+    
+    def progress(done: int, total: int, record: dict):
+        status = record["result"].get("status")
+        print(f"   [{done}/{total}] {status:9s} {record['username']}: {Path(record['path']).name}")
+    
+    try:
+        if manifest:
+            entries = BulkIngestor.read_manifest(source)
+        else:
+            entries = BulkIngestor.scan_directory(source, args.username)
+        
+        ingestor = BulkIngestor(
+            workers=args.workers,
+            use_processes=args.processes,
+            checkpoint_path=args.checkpoint,
+            batch_size=settings.UPSERT_BATCH_SIZE
+        )
+        summary = ingestor.run(entries, progress=progress)
+        
+        print()
+        for key, value in summary.items():
+            if key != "errors_detail":
+                print(f"{key:24s}: {value}")
+        
+        if summary["errors"]:
+            print(f"\n⚠️  {summary['errors']} files failed (re-run with the same checkpoint to retry):")
+            for error in summary["errors_detail"]:
+                print(f"   {error['path']}: {error['message']}")
+            sys.exit(1)
+        print("\n✅ Bulk ingest complete")
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def lexical_backfill(username: str = None):
+    """Index active chunks missing from the lexical index (text fetched from Pinecone)."""
+    from app.pipeline.processing_pipeline import ProcessingPipeline
+    
+    print(f"\n🔤 Lexical backfill{f' for {username}' if username else ''}")
+    print("=" * 60)
+    
+    try:
+        pipeline = ProcessingPipeline()
+        if pipeline.lexical_index is None:
+            print("❌ Lexical index is disabled (LEXICAL_INDEX_ENABLED=false)")
+            sys.exit(1)
+        
+        report = pipeline.lexical_index.backfill(pipeline.vector_store, username.lower() if username else None)
+        
+        print(f"\n✅ Indexed {report['indexed']} of {report['missing']} missing chunks")
+        if report["not_found"]:
+            print(f"⚠️  {report['not_found']} chunks were not found in Pinecone")
+        print(f"   Lexical index size: {pipeline.lexical_index.count()} chunks")
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def text_backfill(username: str = None):
+    """Store the text of active chunks missing from the chunk text store (fetched from Pinecone)."""
+    from app.pipeline.processing_pipeline import ProcessingPipeline
+    
+    print(f"\n🗜️  Chunk text backfill{f' for {username}' if username else ''}")
+    print("=" * 60)
+    
+    try:
+        pipeline = ProcessingPipeline()
+        report = pipeline.text_backfill(username)
+        
+        print(f"\n✅ Stored {report['stored']} of {report['missing']} missing texts")
+        if report["not_found"]:
+            print(f"⚠️  {report['not_found']} chunks were not found in Pinecone")
+        stats = pipeline.text_store.stats()
+        print(f"   Chunk text store: {stats['texts']} texts, "
+              f"{stats['raw_bytes']:,} → {stats['stored_bytes']:,} bytes ({stats['ratio']}x, {stats['codec']})")
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def reembed(username: str = None):
+    """Re-upsert active chunks from the chunk text store, without re-parsing their PDFs."""
+    from app.pipeline.processing_pipeline import ProcessingPipeline
+    
+    print(f"\n🔁 Re-embedding{f' for {username}' if username else ' all users'}")
+    print("=" * 60)
+    
+    try:
+        pipeline = ProcessingPipeline()
+        report = pipeline.reembed(username)
+        
+        print(f"\n✅ Re-embedded {report['upserted']} of {report['chunks']} active chunks")
+        if report["skipped"]:
+            print(f"⚠️  {report['skipped']} chunks have no stored text (run text-backfill first)")
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def rerank_cache(action: str = None, username: str = None):
+    """Show rerank cache statistics, or clear cached reranks."""
+    from app.core.config import settings
+    from app.db.sqlite_manager import SQLiteManager
+    from app.vectorstore.rerank_cache import RerankCache
+    
+    print(f"\n🗃️  Rerank cache: {settings.SQLITE_DB_PATH}")
+    print("=" * 60)
+    
+    try:
+        manager = SQLiteManager(settings.SQLITE_DB_PATH)
+        cache = RerankCache(manager, settings.RERANKER_MODEL, max_entries=settings.RERANK_CACHE_MAX_ENTRIES)
+        
+        if action == "clear":
+            removed = cache.clear(username.lower() if username else None)
+            print(f"\n✅ Removed {removed} cached reranks{f' of {username}' if username else ''}")
+        elif action is not None:
+            print(f"❌ Unknown action: {action} (expected 'clear')")
+            sys.exit(1)
+        
+        stats = cache.stats()
+        print(f"   Entries: {stats['entries']} / {stats['max_entries']} across {stats['namespaces']} namespaces")
+        if not settings.RERANK_CACHE_ENABLED:
+            print("⚠️  RERANK_CACHE_ENABLED=false: the cache is not used")
+        manager.close()
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def benchmark_retrieval(username: str, queries_path: str, options: list):
+    """Compare dense, lexical and hybrid retrieval on a labelled query set (JSON Lines)."""
+    import argparse
+    import json
+    from app.pipeline.processing_pipeline import ProcessingPipeline
+    from app.retrieval.hybrid import benchmark, print_benchmark
+    
+    parser = argparse.ArgumentParser(prog="main.py benchmark-retrieval")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args(options)
+    
+    with open(queries_path, encoding="utf-8") as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    
+    print(f"\n📏 Retrieval benchmark: {len(queries)} queries for '{username}' (k={args.top_k})")
+    print("=" * 60)
+    
+    try:
+        pipeline = ProcessingPipeline()
+        namespace = username.lower()
+        retrievers = {
+            "dense": lambda q: pipeline.search_documents(q, namespace, args.top_k),
+            "lexical": lambda q: pipeline.lexical_index.search(q, namespace, args.top_k),
+            "hybrid": lambda q: pipeline.search_documents(q, namespace, args.top_k, hybrid=True),
+        }
+        if pipeline.lexical_index is None:
+            retrievers = {"dense": retrievers["dense"]}
+        
+        print()
+        print_benchmark(benchmark(retrievers, queries, k=args.top_k), args.top_k)
+    
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
 def show_help():
     """Show help message."""
     print("""
@@ -194,6 +571,21 @@ COMMANDS:
     ingest <file> <username>        Ingest a document
     search "<query>" <username>     Search documents
     ask "<question>" <username>     Ask a question (full RAG)
+                                    (filters: --source FILE --version N --content-type text|table
+                                     --date-from DATE --date-to DATE --page-from N --page-to N --latest;
+                                     --top-k N --hybrid, ask also --top-n N --no-rerank --window N)
+    lexical-backfill [username]     Index chunks that predate the lexical (FTS5) index
+    text-backfill [username]        Store the text of chunks that predate the chunk text store
+    reembed [username]              Re-upsert active chunks from stored text (no PDF re-parsing)
+    rerank-cache [clear [username]] Show rerank cache statistics, or drop cached reranks
+    benchmark-retrieval <username> <queries.jsonl>
+                                    Recall@k and latency: dense vs. lexical vs. hybrid
+    migrate-db [batch_size]         Upgrade the metadata database schema in place
+    compact [retention_days]        Purge expired rows and reclaim database space
+    recover [stale_after_hours]     Finish or roll back interrupted ingestions
+    ingest-dir <dir> [username]     Bulk-ingest PDFs (one sub-directory per user)
+    ingest-manifest <manifest>      Bulk-ingest files listed in a CSV/JSONL manifest
+                                    (options: --workers N --processes --checkpoint FILE)
 
 EXAMPLES:
     # Start server
@@ -205,8 +597,17 @@ EXAMPLES:
     # Search
     python main.py search "revenue growth" alice
     
+    # Search tables of one document, pages 3-7
+    python main.py search "revenue growth" alice --source report.pdf --content-type table --page-from 3 --page-to 7
+    
     # Ask a question
     python main.py ask "What was the revenue in Q4?" alice
+    
+    # Exact identifiers: fuse dense and lexical retrieval
+    python main.py search "INV-2024-0042" alice --hybrid
+    
+    # Bulk ingest, resumable
+    python main.py ingest-dir corpus/ --workers 8 --checkpoint ingest.ckpt
 
 For API documentation, start the server and visit:
     http://localhost:8000/docs
@@ -231,15 +632,53 @@ if __name__ == "__main__":
     
     elif command == "search":
         if len(sys.argv) < 4:
-            print("❌ Usage: python main.py search \"<query>\" <username>")
+            print("❌ Usage: python main.py search \"<query>\" <username> [options]")
             sys.exit(1)
-        search(sys.argv[2], sys.argv[3])
+        args, metadata_filter = parse_query_options(command, sys.argv[3], sys.argv[4:])
+        search(sys.argv[2], sys.argv[3], args.top_k, metadata_filter, hybrid=args.hybrid)
     
     elif command == "ask":
         if len(sys.argv) < 4:
-            print("❌ Usage: python main.py ask \"<question>\" <username>")
+            print("❌ Usage: python main.py ask \"<question>\" <username> [options]")
+            sys.exit(1)
+        args, metadata_filter = parse_query_options(command, sys.argv[3], sys.argv[4:])
+        ask(
+            sys.argv[2], sys.argv[3], not args.no_rerank, args.top_k, args.top_n, metadata_filter,
+            hybrid=args.hybrid, context_window=args.window
+        )
+    
+    elif command == "migrate-db":
+        migrate_db(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
+    
+    elif command == "compact":
+        compact(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    
+    elif command == "recover":
+        recover(float(sys.argv[2]) if len(sys.argv) > 2 else None)
+    
+    elif command == "lexical-backfill":
+        lexical_backfill(sys.argv[2] if len(sys.argv) > 2 else None)
+    
+    elif command == "text-backfill":
+        text_backfill(sys.argv[2] if len(sys.argv) > 2 else None)
+    
+    elif command == "reembed":
+        reembed(sys.argv[2] if len(sys.argv) > 2 else None)
+    
+    elif command == "rerank-cache":
+        rerank_cache(*sys.argv[2:4])
+    
+    elif command == "benchmark-retrieval":
+        if len(sys.argv) < 4:
+            print("❌ Usage: python main.py benchmark-retrieval <username> <queries.jsonl> [--top-k N]")
+            sys.exit(1)
+        benchmark_retrieval(sys.argv[2], sys.argv[3], sys.argv[4:])
+    
+    elif command in ("ingest-dir", "ingest-manifest"):
+        if len(sys.argv) < 3:
+            print(f"❌ Usage: python main.py {command} <{'directory' if command == 'ingest-dir' else 'manifest'}> [options]")
             sys.exit(1)
-        ask(sys.argv[2], sys.argv[3])
+        bulk_ingest(sys.argv[2], sys.argv[3:], manifest=command == "ingest-manifest")
     
     else:
         print(f"❌ Unknown command: {command}")